@@ -122,3 +122,77 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# SYNAPSE
+# Cache de resultados de análise (chave: conteúdo + regras + opções do parser)
+
+SYNAPSE_RESULT_CACHE_DIR = BASE_DIR / 'cache' / 'results'
+
+SYNAPSE_RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Cache colunar de eventos parseados (chave: conteúdo + tipo de origem + opções do parser)
+
+SYNAPSE_EVENT_CACHE_DIR = BASE_DIR / 'cache' / 'events'
+
+SYNAPSE_EVENT_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+
+# Orçamento médio de tempo por regra e evento (µs); regras mais lentas entram em quarentena
+
+SYNAPSE_RULE_BUDGET_US = 1000.0
+
+# Índice de busca textual (SQLite FTS5) das linhas dos arquivos importados
+
+SYNAPSE_SEARCH_INDEX_PATH = BASE_DIR / 'search' / 'log_lines.sqlite3'
+
+# Limite por arquivo enviado, já descompactado (uploads .gz/.zst)
+
+SYNAPSE_UPLOAD_MAX_BYTES = 512 * 1024 * 1024
+
+# Threads das análises em streaming (views ASGI) e processos padrão do `manage.py analyze`
+
+SYNAPSE_ANALYSIS_WORKERS = 4
+
+# Progresso das análises em lote (`manage.py analyze`), para retomar com --resume
+
+SYNAPSE_ANALYZE_STATE_DIR = BASE_DIR / 'cache' / 'analyze'
+
+# Retenção (`manage.py retention`): análises/achados com mais de N dias ou além de N achados,
+# arquivos com mais de N dias ou além de N bytes (0 = sem limite); o que sai é arquivado
+# em NDJSON compactado antes de ser excluído, em lotes de até ~BATCH_SECONDS por transação
+
+SYNAPSE_RETENTION_ANALYSIS_DAYS = 90
+
+SYNAPSE_RETENTION_MAX_FINDINGS = 0
+
+SYNAPSE_RETENTION_FILE_DAYS = 0
+
+SYNAPSE_RETENTION_MAX_FILE_BYTES = 0
+
+SYNAPSE_RETENTION_ARCHIVE_DIR = BASE_DIR / 'archive'
+
+SYNAPSE_RETENTION_BATCH_SIZE = 1000
+
+SYNAPSE_RETENTION_BATCH_SECONDS = 0.5
+
+SYNAPSE_RETENTION_PAUSE_SECONDS = 0.05
+
+# Ingestão contínua (POST /api/logs/ingest/): micro-lotes por tamanho ou tempo,
+# buffer limitado por processo (cheio -> 429) e segmentos de até N bytes
+
+SYNAPSE_INGEST_BATCH_LINES = 5000
+
+SYNAPSE_INGEST_FLUSH_SECONDS = 1.0
+
+SYNAPSE_INGEST_MAX_BUFFERED_LINES = 200_000
+
+SYNAPSE_INGEST_MAX_REQUEST_BYTES = 8 * 1024 * 1024
+
+SYNAPSE_INGEST_SEGMENT_BYTES = 64 * 1024 * 1024
+
+# Enriquecimento de IP: {nome: CSV de faixas} (ex.: {'asn': BASE_DIR / 'enrichment' / 'asn.csv'});
+# cada tabela vira o campo ip_<nome> dos achados. Carregadas uma vez por processo
+
+SYNAPSE_ENRICHMENT_TABLES = {}
+
+SYNAPSE_ENRICHMENT_CACHE_SIZE = 65536
@@ -1,3 +1,17 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Rule, Suppression
+
+
+@admin.register(Rule)
+class RuleAdmin(admin.ModelAdmin):
+    list_display = ('name', 'severity', 'sources', 'is_active', 'updated_at')
+    list_filter = ('severity', 'is_active')
+    search_fields = ('name', 'description', 'pattern')
+
+
+@admin.register(Suppression)
+class SuppressionAdmin(admin.ModelAdmin):
+    list_display = ('rule_name', 'cidr', 'path_pattern', 'user_agent_pattern', 'is_active', 'created_at')
+    list_filter = ('is_active', 'rule_name')
+    search_fields = ('rule_name', 'cidr', 'path_pattern', 'user_agent_pattern', 'comment')
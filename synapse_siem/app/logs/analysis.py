@@ -0,0 +1,115 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.utils.dateparse import parse_datetime
+
+from .models import LogFile, LogFinding
+
+
+# achados gravados por INSERT em lote
+FINDING_BATCH_SIZE = 500
+
+# arquivos suspeitos de estarem vazios conferidos por consulta
+EMPTY_CHECK_CHUNK = 500
+
+
+def select_log_files(selected_ids):
+    """
+    Arquivos a analisar (todos, se nenhum ID for informado).
+    Retorna (queryset, [{id, filename}], nomes dos arquivos sem conteúdo).
+    """
+    # arquivos com exclusão em andamento não entram, nem segmentos de ingestão ainda
+    # abertos: o texto deles só é gravado no fechamento (e já são analisados na ingestão)
+    log_files = LogFile.objects.filter(pending_delete=False).exclude(filepath__startswith='/ingest/', content_sha256='')
+    if selected_ids:
+        log_files = log_files.filter(id__in=selected_ids)
+    scanned_files = list(log_files.values('id', 'filename'))
+    empty_files = empty_file_names(log_files) if scanned_files else []
+    return log_files, scanned_files, empty_files
+
+
+def empty_file_names(log_files, limit=None):
+    """
+    Nomes dos arquivos sem conteúdo (vazio ou só espaços), até `limit`.
+    total_lines conta só linhas não vazias: o texto é conferido no banco apenas
+    para quem tem 0, sem percorrer o conteúdo de todos os arquivos.
+    """
+    candidates = list(log_files.filter(total_lines=0).values_list('id', flat=True))
+    names = []
+    for start in range(0, len(candidates), EMPTY_CHECK_CHUNK):
+        names.extend(
+            LogFile.objects.filter(
+                id__in=candidates[start:start + EMPTY_CHECK_CHUNK], content__regex=r'^\s*$'
+            ).values_list('filename', flat=True)
+        )
+        if limit is not None and len(names) >= limit:
+            return names[:limit]
+    return names
+
+
+@contextmanager
+def log_file_on_disk(log_file):
+    """Grava o conteúdo salvo num arquivo temporário para o analisador (removido ao sair)"""
+    with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.log', encoding='utf-8') as temp_file:
+        temp_file.write(log_file.content)
+        temp_path = temp_file.name
+    try:
+        yield temp_path
+    finally:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+
+
+def finding_record(finding_data, analysis, log_file):
+    """LogFinding (ainda não salvo) a partir de um achado do analisador"""
+    return LogFinding(
+        analysis=analysis,
+        log_file=log_file,
+        line_number=finding_data.get('line_number') or 0,
+        content=finding_data.get('raw_line', ''),
+        rule_name=finding_data.get('rule_id', 'Unknown'),
+        severity=finding_data.get('severity', 'low'),
+        description=finding_data.get('description', ''),
+        recommendation=finding_data.get('recommendation', ''),
+        timestamp=parse_datetime(finding_data['timestamp']) if finding_data.get('timestamp') else None,
+        enrichment=finding_data.get('enrichment') or {}
+    )
+
+
+def store_file_findings(analyzer, log_file, analysis):
+    """
+    Analisa um arquivo e grava os achados em lotes de FINDING_BATCH_SIZE à medida que
+    saem do analisador (sem acumular a lista do arquivo). Retorna a contagem por severidade.
+    """
+    by_severity = {}
+    pending = []
+
+    def flush():
+        LogFinding.objects.bulk_create(pending, batch_size=FINDING_BATCH_SIZE)
+        pending.clear()
+
+    with log_file_on_disk(log_file) as temp_path:
+        for finding_data in analyzer.iter_findings([temp_path]):
+            record = finding_record(finding_data, analysis, log_file)
+            by_severity[record.severity] = by_severity.get(record.severity, 0) + 1
+            pending.append(record)
+            if len(pending) >= FINDING_BATCH_SIZE:
+                flush()
+    if pending:
+        flush()
+    return by_severity
+
+
+def finding_payload(finding, filename):
+    return {
+        "id": finding.id,
+        "rule_name": finding.rule_name,
+        "severity": finding.severity,
+        "description": finding.description,
+        "recommendation": finding.recommendation,
+        "file": filename,
+        "line_number": finding.line_number,
+        "timestamp": finding.timestamp.isoformat() if finding.timestamp else None,
+        "enrichment": finding.enrichment
+    }
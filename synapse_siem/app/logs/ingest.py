@@ -0,0 +1,388 @@
+"""
+Ingestão contínua: linhas enviadas por shippers (HTTP, syslog) ficam num buffer
+limitado em memória e uma thread as analisa em micro-lotes (por tamanho ou tempo).
+
+Cada fluxo (origem + tipo) grava num "segmento": um LogFile cujos contadores,
+achados e linhas indexadas para a busca crescem a cada lote, com uma LogAnalysis
+própria (status `running` enquanto o segmento está aberto). O texto do segmento
+fica em memória e vai para `content` uma única vez, quando ele é fechado (ao passar
+de SYNAPSE_INGEST_SEGMENT_BYTES, ao encerrar o processo ou numa falha de gravação,
+quando a análise fica `failed`); reescrever o TextField a cada lote custaria o
+segmento inteiro por lote.
+"""
+import atexit
+import codecs
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from synapse_siem.backend.parsers import LINE_PARSERS, detect_line_type
+from .analysis import FINDING_BATCH_SIZE, finding_record
+from .models import LogAnalysis, LogFile, LogFinding
+from .ruleset import get_analyzer
+from .search import get_search_index
+from .uploads import CONTENT_ENCODINGS, DECOMPRESSORS, DecompressedTooLarge
+
+
+# tipos aceitos na ingestão (NDJSON é sempre jsonl)
+INGEST_SOURCE_TYPES = ('apache', 'syslog', 'plaintext', 'jsonl')
+
+SOURCE_NAME_REGEX = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,99}$')
+
+DEFAULT_SOURCE = 'ingest'
+
+NDJSON_CONTENT_TYPES = ('application/x-ndjson', 'application/jsonl', 'application/x-jsonlines')
+
+READ_CHUNK = 64 * 1024
+
+# um lote leva até este múltiplo de SYNAPSE_INGEST_BATCH_LINES do que se acumulou
+MAX_BATCHES_PER_FLUSH = 10
+
+# Retry-After sugerido aos shippers: entre 1 e RETRY_AFTER_MAX segundos
+RETRY_AFTER_MAX = 60
+
+
+class IngestError(Exception):
+    pass
+
+
+class IngestTooLarge(IngestError):
+    pass
+
+
+def read_ingest_body(request, max_bytes):
+    """Corpo da requisição em texto, lido em pedaços (gzip/zstd pelo Content-Encoding)"""
+    header = request.headers.get('Content-Encoding', '').strip().lower()
+    decompressor = None
+    if header and header != 'identity':
+        if header not in CONTENT_ENCODINGS:
+            raise IngestError(f"Content-Encoding não suportado: {header}")
+        # o descompressor para assim que a saída passa do limite, antes de decodificar
+        decompressor = DECOMPRESSORS[CONTENT_ENCODINGS[header]](max_output=max_bytes)
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    parts, size = [], 0
+    while True:
+        chunk = request.read(READ_CHUNK)
+        final = not chunk
+        if decompressor is not None:
+            try:
+                chunk = decompressor.decompress(chunk) if chunk else decompressor.finish()
+            except DecompressedTooLarge:
+                raise IngestTooLarge(f"lote excede o limite de {max_bytes // 1024} KiB")
+        size += len(chunk)
+        if size > max_bytes:
+            raise IngestTooLarge(f"lote excede o limite de {max_bytes // 1024} KiB")
+        parts.append(decoder.decode(chunk, final))
+        if final:
+            return "".join(parts)
+
+
+def text_entries(text, source_type=None):
+    """
+    Linhas cruas -> (tipo, [(linha, None)]); sem tipo informado, ele vem da
+    primeira linha não vazia, como na detecção de arquivos.
+    """
+    lines = [line for line in text.splitlines() if line.strip()]
+    if source_type is None:
+        source_type = detect_line_type(lines[0]) if lines else 'plaintext'
+    return source_type, [(line, None) for line in lines]
+
+
+def ndjson_entries(text):
+    """NDJSON -> ([(linha, objeto)], rejeitadas); só objetos JSON são aceitos"""
+    entries, rejected = [], 0
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            obj = json.loads(line)
+        except ValueError:
+            rejected += 1
+            continue
+        if not isinstance(obj, dict):
+            rejected += 1
+            continue
+        entries.append((line, obj))
+    return entries, rejected
+
+
+class _Segment:
+    def __init__(self, log_file_id, analysis_id, path):
+        self.log_file_id = log_file_id
+        self.analysis_id = analysis_id
+        self.path = path
+        self.lines = 0
+        self.size = 0
+        # texto dos lotes já gravados, levado ao banco no fechamento
+        self.parts = []
+        self.sha256 = hashlib.sha256()
+
+
+class IngestBuffer:
+    """
+    Buffer limitado (em linhas, somando todos os fluxos) entre quem recebe e a
+    thread de análise. offer() recusa o lote inteiro quando não cabe: quem chama
+    devolve backpressure ao shipper (HTTP 429, ou descarte contado no syslog); um
+    lote maior que o buffer inteiro nunca caberia e é recusado com IngestTooLarge.
+    As linhas só saem da conta do buffer depois de gravadas.
+    """
+
+    def __init__(self, batch_lines, flush_seconds, max_lines, segment_bytes):
+        self.batch_lines = batch_lines
+        self.flush_seconds = flush_seconds
+        self.max_lines = max_lines
+        self.segment_bytes = segment_bytes
+        self._cond = threading.Condition()
+        self._streams = {}  # (origem, tipo) -> [(linha, evento ou None)]
+        self._since = {}  # (origem, tipo) -> instante da linha mais antiga no buffer
+        self._segments = {}  # (origem, tipo) -> _Segment
+        self._buffered = 0
+        self._thread = None
+        self._stopping = False
+        self._rate = None  # linhas/s gravadas (média móvel)
+        self.accepted = 0
+        self.persisted = 0
+        self.rejected = 0
+        self.failed = 0
+        self.findings = 0
+        self.last_error = None
+
+    def offer(self, source, source_type, entries):
+        """Enfileira as linhas de um fluxo; False se o buffer não comporta o lote."""
+        if not entries:
+            return True
+        key = (source, source_type)
+        if len(entries) > self.max_lines:
+            with self._cond:
+                self.rejected += len(entries)
+            raise IngestTooLarge(
+                f"lote de {len(entries)} linhas excede o buffer de {self.max_lines} linhas; divida o envio"
+            )
+        with self._cond:
+            if self._stopping:
+                raise IngestError("ingestão encerrando")
+            if self._buffered + len(entries) > self.max_lines:
+                self.rejected += len(entries)
+                return False
+            self._streams.setdefault(key, []).extend(entries)
+            self._since.setdefault(key, time.monotonic())
+            self._buffered += len(entries)
+            self.accepted += len(entries)
+            # lote cheio, ou um prazo novo para a thread que pode estar dormindo sem prazo
+            self._cond.notify()
+            self._start()
+        return True
+
+    def retry_after(self):
+        """Segundos até o buffer esvaziar, pela vazão recente de gravação"""
+        with self._cond:
+            backlog = self._buffered
+        rate = self._rate or self.batch_lines / self.flush_seconds
+        return min(RETRY_AFTER_MAX, max(1, math.ceil(backlog / rate)))
+
+    def stats(self):
+        with self._cond:
+            return {
+                "buffered_lines": self._buffered,
+                "max_buffered_lines": self.max_lines,
+                "streams": [
+                    {"source": source, "source_type": source_type, "buffered_lines": len(entries)}
+                    for (source, source_type), entries in self._streams.items() if entries
+                ],
+                "open_segments": [
+                    {"source": source, "source_type": source_type, "file_id": segment.log_file_id,
+                     "analysis_id": segment.analysis_id, "lines": segment.lines, "size": segment.size}
+                    for (source, source_type), segment in self._segments.items()
+                ],
+                "accepted_lines": self.accepted,
+                "persisted_lines": self.persisted,
+                "rejected_lines": self.rejected,
+                "failed_lines": self.failed,
+                "findings": self.findings,
+                "lines_per_second": round(self._rate, 1) if self._rate else None,
+                "last_error": self.last_error,
+            }
+
+    def shutdown(self, timeout=None):
+        """Grava o que está no buffer e fecha os segmentos abertos."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        for key in list(self._segments):
+            try:
+                self._close_segment(key)
+            except Exception as e:
+                self.last_error = f"Erro fechando segmento {key[0]}: {str(e)}"
+        close_old_connections()
+
+    def _start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='synapse-ingest', daemon=True)
+            self._thread.start()
+
+    def _ready(self, now):
+        """Fluxos prontos (lote cheio, prazo vencido ou encerrando) e o próximo prazo"""
+        ready, deadline = [], None
+        for key, entries in self._streams.items():
+            if not entries:
+                continue
+            due = self._since[key] + self.flush_seconds
+            if self._stopping or len(entries) >= self.batch_lines or due <= now:
+                ready.append(key)
+            elif deadline is None or due < deadline:
+                deadline = due
+        return ready, deadline
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    ready, deadline = self._ready(time.monotonic())
+                    if ready or self._stopping:
+                        break
+                    self._cond.wait(None if deadline is None else max(0.0, deadline - time.monotonic()))
+                if not ready and self._stopping:
+                    return
+                batches = []
+                for key in ready:
+                    # com backlog, lotes maiores amortizam a gravação (uma transação por lote)
+                    entries = self._streams[key]
+                    take = self.batch_lines * MAX_BATCHES_PER_FLUSH
+                    batch, self._streams[key] = entries[:take], entries[take:]
+                    if self._streams[key]:
+                        self._since[key] = time.monotonic()
+                    else:
+                        del self._streams[key]
+                        del self._since[key]
+                    batches.append((key, batch))
+            close_old_connections()
+            for key, batch in batches:
+                started = time.monotonic()
+                try:
+                    self._persist(key, batch)
+                    self.persisted += len(batch)
+                except Exception as e:
+                    self.failed += len(batch)
+                    self.last_error = f"Erro gravando lote de {key[0]} ({key[1]}): {str(e)}"
+                    # segmento possivelmente inconsistente: fecha com o que já foi gravado,
+                    # análise `failed`, e o próximo lote abre outro
+                    try:
+                        self._close_segment(key, status='failed')
+                    except Exception as close_error:
+                        self.last_error += f"; segmento não fechado: {str(close_error)}"
+                elapsed = max(time.monotonic() - started, 1e-6)
+                rate = len(batch) / elapsed
+                self._rate = rate if self._rate is None else 0.8 * self._rate + 0.2 * rate
+                with self._cond:
+                    self._buffered -= len(batch)
+
+    def _segment(self, key):
+        segment = self._segments.get(key)
+        if segment is None:
+            source, _source_type = key
+            filename = f"{source}-{timezone.now():%Y%m%d-%H%M%S}-{os.getpid()}.log"
+            filepath = f"/ingest/{source}/{filename}"
+            with transaction.atomic():
+                log_file = LogFile.objects.create(
+                    filename=filename, filepath=filepath, content='', size_bytes=0, total_lines=0
+                )
+                analysis = LogAnalysis.objects.create(total_files=1, status='running')
+            segment = self._segments[key] = _Segment(log_file.id, analysis.id, filepath)
+        return segment
+
+    def _persist(self, key, batch):
+        """Analisa um micro-lote e grava linhas, achados e contadores numa transação"""
+        source_type = key[1]
+        segment = self._segment(key)
+        first_line = segment.lines + 1
+        parse_line = LINE_PARSERS.get(source_type)
+        events = (
+            (line_number, event)
+            for line_number, event in (
+                (first_line + i, event if event is not None else parse_line(line))
+                for i, (line, event) in enumerate(batch)
+            )
+            if event is not None
+        )
+        log_file = LogFile(id=segment.log_file_id)
+        analysis = LogAnalysis(id=segment.analysis_id)
+        records = [
+            finding_record(finding_data, analysis, log_file)
+            for finding_data in get_analyzer().iter_event_findings(events, segment.path, source_type)
+        ]
+        lines = [line for line, _event in batch]
+        text = "\n".join(lines) + "\n"
+        data = text.encode('utf-8')
+        size = len(data)
+        with transaction.atomic():
+            # só os contadores: o texto vai para `content` no fechamento do segmento
+            LogFile.objects.filter(id=segment.log_file_id).update(
+                size_bytes=F('size_bytes') + size,
+                total_lines=F('total_lines') + len(lines),
+                updated_at=timezone.now(),
+            )
+            LogFinding.objects.bulk_create(records, batch_size=FINDING_BATCH_SIZE)
+            if records:
+                LogAnalysis.objects.filter(id=segment.analysis_id).update(
+                    total_findings=F('total_findings') + len(records)
+                )
+        segment.lines += len(lines)
+        segment.size += size
+        segment.parts.append(text)
+        segment.sha256.update(data)
+        self.findings += len(records)
+        try:
+            get_search_index().add_lines(segment.log_file_id, first_line, lines)
+        except Exception as e:
+            self.last_error = f"Linhas de {key[0]} não indexadas para busca: {str(e)}"
+        if segment.size >= self.segment_bytes:
+            self._close_segment(key)
+
+    def _close_segment(self, key, status='completed'):
+        """Grava o texto do segmento (uma vez só) e encerra a análise dele"""
+        segment = self._segments.pop(key, None)
+        if segment is None:
+            return
+        content = "".join(segment.parts)
+        segment.parts = []
+        with transaction.atomic():
+            LogFile.objects.filter(id=segment.log_file_id).update(
+                content=content,
+                content_sha256=segment.sha256.hexdigest(),
+                updated_at=timezone.now(),
+            )
+            LogAnalysis.objects.filter(id=segment.analysis_id).update(
+                status=status, completed_at=timezone.now()
+            )
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_ingest_buffer():
+    """Buffer de ingestão do processo (gravado e fechado na saída do interpretador)"""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = IngestBuffer(
+                batch_lines=settings.SYNAPSE_INGEST_BATCH_LINES,
+                flush_seconds=settings.SYNAPSE_INGEST_FLUSH_SECONDS,
+                max_lines=settings.SYNAPSE_INGEST_MAX_BUFFERED_LINES,
+                segment_bytes=settings.SYNAPSE_INGEST_SEGMENT_BYTES,
+            )
+            atexit.register(_buffer.shutdown, settings.SYNAPSE_INGEST_FLUSH_SECONDS * 10)
+        return _buffer
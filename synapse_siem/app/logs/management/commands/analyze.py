@@ -0,0 +1,288 @@
+import json
+import os
+import tempfile
+from concurrent.futures import FIRST_COMPLETED, BrokenExecutor, ProcessPoolExecutor, wait
+from datetime import datetime, time, timedelta
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from synapse_siem.app.logs.analysis import empty_file_names, store_file_findings
+from synapse_siem.app.logs.models import LogAnalysis, LogFile, LogFinding
+from synapse_siem.app.logs.ruleset import get_analyzer
+
+
+# IDs de arquivos lidos por vez ao montar a lista de trabalho
+ID_CHUNK_SIZE = 2000
+
+
+def _init_worker():
+    # processos criados por spawn precisam configurar o Django; por fork, é no-op
+    django.setup()
+
+
+def analyze_stored_file(analysis_id, file_id, discard_partial):
+    """
+    Executada em cada worker: analisa um LogFile e grava os achados em lotes.
+    Retorna (file_id, nome, contagem por severidade, erro ou None).
+    """
+    close_old_connections()
+    filename = str(file_id)
+    try:
+        log_file = LogFile.objects.only('id', 'filename', 'content').get(id=file_id)
+        filename = log_file.filename
+        if discard_partial:
+            # arquivo interrompido na execução anterior: descarta o que chegou a ser gravado
+            LogFinding.objects.filter(analysis_id=analysis_id, log_file_id=file_id).delete()
+        by_severity = store_file_findings(get_analyzer(), log_file, LogAnalysis(id=analysis_id))
+        return file_id, filename, by_severity, None
+    except Exception as e:
+        # o arquivo continua pendente: nada dele fica gravado nesta análise
+        try:
+            LogFinding.objects.filter(analysis_id=analysis_id, log_file_id=file_id).delete()
+        except Exception:
+            pass
+        return file_id, filename, {}, f"Erro em {filename}: {str(e)}"
+    finally:
+        close_old_connections()
+
+
+def _parse_moment(value, end_of_day=False):
+    """Data (AAAA-MM-DD) ou data/hora ISO 8601; data sem hora vale o dia inteiro."""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f"Data inválida: {value} (use AAAA-MM-DD ou ISO 8601)")
+        moment = datetime.combine(day + timedelta(days=1) if end_of_day else day, time.min)
+    elif end_of_day:
+        # o filtro é "antes de": inclui o próprio instante informado
+        moment += timedelta(microseconds=1)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+class Command(BaseCommand):
+    help = (
+        "Analisa arquivos já importados com o ruleset do banco, em processos paralelos, "
+        "gravando os achados em lotes; o progresso fica num arquivo de estado para retomar"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('file_ids', nargs='*', type=int, help="IDs dos arquivos (padrão: todos)")
+        parser.add_argument('--since', help="Só arquivos importados a partir desta data (AAAA-MM-DD ou ISO 8601)")
+        parser.add_argument('--until', help="Só arquivos importados até esta data (inclusive)")
+        parser.add_argument(
+            '--workers', type=int, default=settings.SYNAPSE_ANALYSIS_WORKERS,
+            help=f"Processos de análise (padrão: {settings.SYNAPSE_ANALYSIS_WORKERS}; 1 = no próprio processo)"
+        )
+        parser.add_argument(
+            '--resume', type=int, metavar='ANALYSIS_ID',
+            help="Retoma uma análise interrompida: pula os arquivos já concluídos"
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError("--workers deve ser pelo menos 1")
+        state_dir = str(settings.SYNAPSE_ANALYZE_STATE_DIR)
+        os.makedirs(state_dir, exist_ok=True)
+
+        resumed = bool(options['resume'])
+        if resumed:
+            if options['file_ids'] or options['since'] or options['until']:
+                raise CommandError("--resume usa os filtros da execução original; não informe outros")
+            analysis, state = self._load_state(state_dir, options['resume'])
+        else:
+            analysis, state = self._start(options)
+        state_path = self._state_path(state_dir, analysis.id)
+        done_path = self._done_path(state_dir, analysis.id)
+        done_ids = set(state['done'])
+
+        # a lista de trabalho é fixada no início (max_id): arquivos importados depois ficam de fora
+        pending = [
+            file_id
+            for file_id in self._queryset(state).values_list('id', flat=True).order_by('id').iterator(
+                chunk_size=ID_CHUNK_SIZE
+            )
+            if file_id not in done_ids
+        ]
+        total = len(state['done']) + len(pending)
+        self.stdout.write(
+            f"análise {analysis.id}: {len(pending)} arquivo(s) a analisar"
+            f" ({len(state['done'])} já concluído(s)); estado em {state_path}"
+        )
+
+        errors = []
+        interrupted = False
+        try:
+            # progresso só acrescentado: uma linha por arquivo concluído, sem reescrever o estado
+            with open(done_path, 'a', encoding='utf-8') as done_log:
+                results = self._run(analysis.id, pending, options['workers'], discard_partial=resumed)
+                for file_id, filename, by_severity, error in results:
+                    if error:
+                        errors.append(error)
+                        self.stderr.write(error)
+                        continue
+                    done_log.write(json.dumps([file_id, by_severity], ensure_ascii=False) + '\n')
+                    done_log.flush()
+                    state['done'].append(file_id)
+                    for severity, count in by_severity.items():
+                        state['by_severity'][severity] = state['by_severity'].get(severity, 0) + count
+                    self.stdout.write(
+                        f"[{len(state['done'])}/{total}] {filename} (id={file_id}): {sum(by_severity.values())} achado(s)"
+                    )
+        except KeyboardInterrupt:
+            interrupted = True
+        except BrokenExecutor as e:
+            # um worker morreu (ex.: falta de memória): os arquivos em andamento continuam pendentes
+            error = f"Processos de análise interrompidos: {e}"
+            errors.append(error)
+            self.stderr.write(error)
+
+        total_findings = sum(state['by_severity'].values())
+        LogAnalysis.objects.filter(id=analysis.id).update(
+            total_findings=total_findings,
+            status='completed' if not errors and not interrupted else 'failed',
+            completed_at=timezone.now(),
+        )
+        if interrupted or errors:
+            # arquivos com erro (ou não analisados) continuam pendentes no estado
+            raise CommandError(
+                f"análise {analysis.id} incompleta ({len(state['done'])}/{total} arquivos, "
+                f"{len(errors)} erro(s)); retome com --resume {analysis.id}"
+            )
+        os.unlink(state_path)
+        os.unlink(done_path)
+        self.stdout.write(self.style.SUCCESS(
+            f"análise {analysis.id} concluída: {total} arquivo(s), {total_findings} achado(s) "
+            f"{json.dumps(state['by_severity'], ensure_ascii=False)}"
+        ))
+
+    def _start(self, options):
+        state = {
+            'file_ids': options['file_ids'],
+            'since': _parse_moment(options['since']).isoformat() if options['since'] else None,
+            'until': _parse_moment(options['until'], end_of_day=True).isoformat() if options['until'] else None,
+        }
+        state['max_id'] = LogFile.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        queryset = self._queryset(state)
+        total = queryset.count()
+        if not total:
+            raise CommandError("Nenhum arquivo disponível para análise")
+        empty = empty_file_names(queryset, limit=10)
+        if empty:
+            raise CommandError(f"Arquivos sem conteúdo: {', '.join(empty)}. Faça novo upload.")
+        analysis = LogAnalysis.objects.create(total_files=total, status='running')
+        state['analysis_id'] = analysis.id
+        # o arquivo de estado guarda só os filtros, gravado uma vez; o progresso vai para o .done
+        self._save_state(self._state_path(str(settings.SYNAPSE_ANALYZE_STATE_DIR), analysis.id), state)
+        state['done'] = []
+        state['by_severity'] = {}
+        return analysis, state
+
+    def _load_state(self, state_dir, analysis_id):
+        try:
+            with open(self._state_path(state_dir, analysis_id), 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            raise CommandError(f"Sem estado para retomar a análise {analysis_id}")
+        state['done'], state['by_severity'] = self._load_done(self._done_path(state_dir, analysis_id))
+        analysis = LogAnalysis.objects.filter(id=analysis_id).first()
+        if analysis is None:
+            raise CommandError(f"Análise {analysis_id} não encontrada")
+        LogAnalysis.objects.filter(id=analysis_id).update(status='running', completed_at=None)
+        return analysis, state
+
+    @staticmethod
+    def _state_path(state_dir, analysis_id):
+        return os.path.join(state_dir, f"{analysis_id}.json")
+
+    @staticmethod
+    def _done_path(state_dir, analysis_id):
+        return os.path.join(state_dir, f"{analysis_id}.done")
+
+    @staticmethod
+    def _load_done(path):
+        """Arquivos concluídos e contagens por severidade, a partir do log de progresso."""
+        done, by_severity = [], {}
+        try:
+            with open(path, 'r+b') as f:
+                end = 0
+                for line in f:
+                    try:
+                        file_id, counts = json.loads(line)
+                    except ValueError:
+                        # linha cortada por uma interrupção: o arquivo segue pendente
+                        break
+                    if not line.endswith(b'\n'):
+                        break
+                    end += len(line)
+                    done.append(file_id)
+                    for severity, count in counts.items():
+                        by_severity[severity] = by_severity.get(severity, 0) + count
+                # descarta o resto cortado: a retomada acrescenta a partir de uma linha inteira
+                f.truncate(end)
+        except FileNotFoundError:
+            pass
+        return done, by_severity
+
+    @staticmethod
+    def _save_state(path, state):
+        # escrita atômica: uma interrupção no meio não corrompe o progresso
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.analyze.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    @staticmethod
+    def _queryset(state):
+        # segmentos de ingestão abertos ainda não têm o texto no banco
+        queryset = LogFile.objects.filter(id__lte=state['max_id'], pending_delete=False).exclude(
+            filepath__startswith='/ingest/', content_sha256=''
+        )
+        if state['file_ids']:
+            queryset = queryset.filter(id__in=state['file_ids'])
+        if state['since']:
+            queryset = queryset.filter(analyzed_at__gte=state['since'])
+        if state['until']:
+            queryset = queryset.filter(analyzed_at__lt=state['until'])
+        return queryset
+
+    def _run(self, analysis_id, file_ids, workers, discard_partial):
+        """Resultados por arquivo, na ordem em que terminam."""
+        if workers == 1 or len(file_ids) <= 1:
+            for file_id in file_ids:
+                yield analyze_stored_file(analysis_id, file_id, discard_partial)
+            return
+        # o ruleset é compilado antes do fork (herdado pelos workers) e as conexões
+        # com o banco não podem ser compartilhadas entre processos
+        get_analyzer()
+        connections.close_all()
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        try:
+            remaining = iter(file_ids)
+            running = set()
+            # no máximo 2 tarefas por worker na fila: a lista de futures não cresce com o total
+            for file_id in remaining:
+                running.add(executor.submit(analyze_stored_file, analysis_id, file_id, discard_partial))
+                if len(running) >= workers * 2:
+                    break
+            while running:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+                    file_id = next(remaining, None)
+                    if file_id is not None:
+                        running.add(executor.submit(analyze_stored_file, analysis_id, file_id, discard_partial))
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
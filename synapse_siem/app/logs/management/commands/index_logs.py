@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from synapse_siem.app.logs.models import LogFile
+from synapse_siem.app.logs.search import get_search_index
+
+
+class Command(BaseCommand):
+    help = "(Re)constrói o índice de busca textual dos arquivos importados"
+
+    def add_arguments(self, parser):
+        parser.add_argument('file_ids', nargs='*', type=int, help="IDs dos arquivos (padrão: todos)")
+
+    def handle(self, *args, **options):
+        index = get_search_index()
+        # segmentos de ingestão abertos: o texto ainda não está no banco, mas as linhas já
+        # foram indexadas lote a lote; reindexar apagaria essas linhas
+        log_files = (
+            LogFile.objects.filter(pending_delete=False)
+            .exclude(filepath__startswith='/ingest/', content_sha256='')
+            .only('id', 'filename', 'content')
+        )
+        if options['file_ids']:
+            log_files = log_files.filter(id__in=options['file_ids'])
+        total = 0
+        for log_file in log_files.iterator(chunk_size=1):
+            index.add_file(log_file.id, log_file.content)
+            total += 1
+            self.stdout.write(f"indexado: {log_file.filename} (id={log_file.id})")
+        self.stdout.write(self.style.SUCCESS(f"{total} arquivo(s) indexado(s)"))
@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from synapse_siem.app.logs.models import LogFile
+from synapse_siem.app.logs.retention import (
+    BatchDeleter, RetentionArchive, expired_analyses, expired_files, purge_analysis, purge_file
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Aplica a política de retenção: arquiva (NDJSON .gz) e exclui em lotes análises, achados "
+        "e arquivos antigos, e conclui exclusões de arquivos pendentes"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analysis-days', type=int, default=settings.SYNAPSE_RETENTION_ANALYSIS_DAYS,
+            help="Remove análises (e seus achados) iniciadas há mais de N dias (0 = sem limite)"
+        )
+        parser.add_argument(
+            '--max-findings', type=int, default=settings.SYNAPSE_RETENTION_MAX_FINDINGS,
+            help="Remove as análises mais antigas até restarem no máximo N achados (0 = sem limite)"
+        )
+        parser.add_argument(
+            '--file-days', type=int, default=settings.SYNAPSE_RETENTION_FILE_DAYS,
+            help="Remove arquivos importados há mais de N dias (0 = sem limite)"
+        )
+        parser.add_argument(
+            '--max-file-mb', type=int, default=settings.SYNAPSE_RETENTION_MAX_FILE_BYTES // (1024 * 1024),
+            help="Remove os arquivos mais antigos até o total caber em N MiB (0 = sem limite)"
+        )
+        parser.add_argument(
+            '--archive-dir', default=str(settings.SYNAPSE_RETENTION_ARCHIVE_DIR),
+            help="Diretório base dos arquivos de retenção; cada execução grava em <dir>/<run-id>/"
+        )
+        parser.add_argument('--no-archive', action='store_true', help="Exclui sem arquivar")
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.SYNAPSE_RETENTION_BATCH_SIZE,
+            help="Linhas por lote inicial (ajustado para cada transação durar até --batch-seconds)"
+        )
+        parser.add_argument(
+            '--batch-seconds', type=float, default=settings.SYNAPSE_RETENTION_BATCH_SECONDS,
+            help="Duração alvo de cada transação de exclusão"
+        )
+        parser.add_argument(
+            '--pause', type=float, default=settings.SYNAPSE_RETENTION_PAUSE_SECONDS,
+            help="Pausa entre lotes, em segundos, para não monopolizar o banco"
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Só mostra o que seria removido")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['batch_seconds'] <= 0:
+            raise CommandError("--batch-size e --batch-seconds devem ser positivos")
+        analyses = expired_analyses(options['analysis_days'], options['max_findings'])
+        files = expired_files(options['file_days'], options['max_file_mb'] * 1024 * 1024)
+        pending = list(LogFile.objects.filter(pending_delete=True).values_list('id', flat=True))
+        self.stdout.write(
+            f"a remover: {len(analyses)} análise(s), {len(files)} arquivo(s) por retenção, "
+            f"{len(pending)} exclusão(ões) pendente(s)"
+        )
+        if options['dry_run'] or not (analyses or files or pending):
+            return
+
+        archive = None
+        if not options['no_archive'] and (analyses or files):
+            archive = RetentionArchive(options['archive_dir'])
+        deleter = BatchDeleter(
+            archive=archive,
+            batch_size=options['batch_size'],
+            max_seconds=options['batch_seconds'],
+            pause=options['pause'],
+        )
+        try:
+            for analysis_id in analyses:
+                purge_analysis(deleter, analysis_id)
+            for file_id in files:
+                purge_file(deleter, file_id)
+            # pedidas pela API: sem arquivamento, como uma exclusão comum
+            for file_id in pending:
+                purge_file(deleter, file_id, archive=False)
+        finally:
+            if archive is not None:
+                archive.close()
+
+        deleted = deleter.deleted
+        self.stdout.write(self.style.SUCCESS(
+            f"removidos: {deleted['analyses']} análise(s), {deleted['findings']} achado(s), "
+            f"{deleted['files']} arquivo(s)"
+        ))
+        if archive is not None:
+            self.stdout.write(f"arquivados em {archive.directory}")
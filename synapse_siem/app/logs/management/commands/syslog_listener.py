@@ -0,0 +1,112 @@
+import asyncio
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from synapse_siem.app.logs.ingest import SOURCE_NAME_REGEX, IngestError, get_ingest_buffer
+from synapse_siem.backend.syslog_receiver import MAX_MESSAGE_BYTES, UDP_RCVBUF, SyslogReceiver
+
+
+class Command(BaseCommand):
+    help = "Recebe syslog (UDP e TCP, RFC 6587) e analisa as mensagens em micro-lotes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='0.0.0.0', help="Endereço de escuta (padrão: 0.0.0.0)")
+        parser.add_argument('--udp-port', type=int, default=5514, help="Porta UDP (0 desativa; padrão: 5514)")
+        parser.add_argument('--tcp-port', type=int, default=5514, help="Porta TCP (0 desativa; padrão: 5514)")
+        parser.add_argument('--source', default='syslog', help="Origem dos segmentos gravados (padrão: syslog)")
+        parser.add_argument(
+            '--queue-size', type=int, default=100_000,
+            help="Mensagens aguardando o buffer de ingestão; cheia, UDP descarta e TCP para de ler"
+        )
+        parser.add_argument(
+            '--max-message-bytes', type=int, default=MAX_MESSAGE_BYTES,
+            help=f"Maior mensagem aceita (padrão: {MAX_MESSAGE_BYTES})"
+        )
+        parser.add_argument(
+            '--udp-rcvbuf', type=int, default=UDP_RCVBUF,
+            help="Buffer do socket UDP no kernel, em bytes (Linux: limitado por net.core.rmem_max)"
+        )
+        parser.add_argument('--stats-interval', type=float, default=60.0, help="Segundos entre relatórios (0 desativa)")
+        parser.add_argument(
+            '--shutdown-timeout', type=float, default=30.0,
+            help="Prazo para gravar o que está em andamento ao encerrar (SIGINT/SIGTERM)"
+        )
+
+    def handle(self, *args, **options):
+        if not options['udp_port'] and not options['tcp_port']:
+            raise CommandError("Informe --udp-port e/ou --tcp-port")
+        source = options['source']
+        if not SOURCE_NAME_REGEX.match(source):
+            raise CommandError("Origem inválida: use letras, números, '.', '_' ou '-' (até 100 caracteres)")
+
+        buffer = get_ingest_buffer()
+
+        def sink(lines):
+            try:
+                return buffer.offer(source, 'syslog', [(line, None) for line in lines])
+            except IngestError:
+                return False
+
+        receiver = SyslogReceiver(
+            sink,
+            max_pending=options['queue_size'],
+            batch_size=settings.SYNAPSE_INGEST_BATCH_LINES,
+            max_message_bytes=options['max_message_bytes'],
+        )
+        try:
+            asyncio.run(self._serve(receiver, options))
+        except OSError as e:
+            raise CommandError(f"Não foi possível abrir as portas: {e}")
+        finally:
+            # grava os micro-lotes em andamento e fecha os segmentos abertos
+            buffer.shutdown(options['shutdown_timeout'])
+            self._report(receiver, buffer, final=True)
+
+    async def _serve(self, receiver, options):
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+
+        ports = []
+        if options['udp_port']:
+            ports.append(f"udp/{options['udp_port']}")
+        if options['tcp_port']:
+            ports.append(f"tcp/{options['tcp_port']}")
+        self.stdout.write(f"escutando syslog em {options['host']} ({', '.join(ports)}); origem '{options['source']}'")
+
+        stats_task = None
+        if options['stats_interval'] > 0:
+            stats_task = asyncio.create_task(self._periodic_report(receiver, options['stats_interval']))
+        try:
+            await receiver.serve(
+                options['host'], options['udp_port'], options['tcp_port'], stop,
+                shutdown_timeout=options['shutdown_timeout'], udp_rcvbuf=options['udp_rcvbuf'],
+            )
+        finally:
+            if stats_task is not None:
+                stats_task.cancel()
+
+    async def _periodic_report(self, receiver, interval):
+        buffer = get_ingest_buffer()
+        while True:
+            await asyncio.sleep(interval)
+            self._report(receiver, buffer)
+
+    def _report(self, receiver, buffer, final=False):
+        stats = receiver.stats()
+        ingest = buffer.stats()
+        line = (
+            f"recebidas={stats['received']} encaminhadas={stats['forwarded']} "
+            f"descartadas={stats['dropped']} erros_de_quadro={stats['framing_errors']} "
+            f"na_fila={stats['pending']} conexões={stats['connections']} "
+            f"gravadas={ingest['persisted_lines']} achados={ingest['findings']}"
+        )
+        if ingest['last_error']:
+            line += f" último_erro={ingest['last_error']!r}"
+        if final:
+            self.stdout.write(self.style.SUCCESS(f"encerrado: {line}"))
+        else:
+            self.stdout.write(line)
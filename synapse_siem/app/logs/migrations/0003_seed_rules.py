@@ -0,0 +1,37 @@
+import json
+from pathlib import Path
+
+from django.db import migrations
+
+
+RULES_JSON = Path(__file__).resolve().parents[3] / 'backend' / 'rules.json'
+
+
+def seed_rules(apps, schema_editor):
+    """Importa o rules.json para a tabela de regras (fonte da verdade do caminho web)"""
+    Rule = apps.get_model('logs', 'Rule')
+    if not RULES_JSON.exists():
+        return
+    with open(RULES_JSON, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    for item in data:
+        Rule.objects.get_or_create(
+            name=item['id'],
+            defaults={
+                'pattern': item['regex'],
+                'severity': item.get('severity', 'medium'),
+                'description': item['description'],
+                'recommendation': item.get('recommendation', ''),
+            },
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0002_logfile_content'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_rules, migrations.RunPython.noop),
+    ]
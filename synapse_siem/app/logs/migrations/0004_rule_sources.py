@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0003_seed_rules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rule',
+            name='sources',
+            field=models.CharField(blank=True, help_text='Tipos de origem separados por vírgula (apache, syslog, json, jsonl, csv, plaintext); vazio = todos', max_length=200),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0004_rule_sources'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='logfinding',
+            index=models.Index(fields=['timestamp'], name='log_finding_timesta_b60908_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='logfinding',
+            index=models.Index(fields=['analysis', 'timestamp'], name='log_finding_analysi_feef0c_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:00
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_hashes(apps, schema_editor):
+    """Calcula o hash dos arquivos já importados (em lotes, sem carregar tudo de uma vez)"""
+    LogFile = apps.get_model('logs', 'LogFile')
+    batch = []
+    for log_file in LogFile.objects.only('id', 'content').iterator(chunk_size=100):
+        log_file.content_sha256 = hashlib.sha256(log_file.content.encode('utf-8')).hexdigest()
+        batch.append(log_file)
+        if len(batch) >= 100:
+            LogFile.objects.bulk_update(batch, ['content_sha256'])
+            batch = []
+    if batch:
+        LogFile.objects.bulk_update(batch, ['content_sha256'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0005_finding_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logfile',
+            name='content_sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.RunPython(backfill_hashes, migrations.RunPython.noop),
+    ]
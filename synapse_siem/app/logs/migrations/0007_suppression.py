@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:06
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0006_logfile_content_sha256'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Suppression',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rule_name', models.CharField(blank=True, help_text='Regra suprimida; vazio = todas', max_length=100)),
+                ('cidr', models.CharField(blank=True, help_text='IP ou rede (ex.: 10.0.0.0/8, 2001:db8::/32)', max_length=64)),
+                ('path_pattern', models.CharField(blank=True, help_text='Regex aplicada ao path da requisição', max_length=500)),
+                ('user_agent_pattern', models.CharField(blank=True, help_text='Regex aplicada ao user agent', max_length=500)),
+                ('comment', models.TextField(blank=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'suppressions',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0007_suppression'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logfinding',
+            name='enrichment',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='rule',
+            name='where',
+            field=models.JSONField(blank=True, default=dict, help_text='Condições sobre o enriquecimento do IP, ex.: {"ip_zone": ["dmz"], "ip_country": ["BR"]}; vazio = sem condições'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-19 10:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0008_ip_enrichment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logfile',
+            name='pending_delete',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AddIndex(
+            model_name='loganalysis',
+            index=models.Index(fields=['started_at'], name='log_analyse_started_197ff3_idx'),
+        ),
+    ]
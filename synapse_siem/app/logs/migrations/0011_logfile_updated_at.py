@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-19 11:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logs', '0010_suppression_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logfile',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -1,15 +1,29 @@
+import ipaddress
+
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.utils import timezone
 
+from synapse_siem.backend.parsers import SOURCE_TYPES
+from synapse_siem.backend.regex_guard import CRITICAL, check_pattern
+from synapse_siem.backend.rules import parse_where
+
 
 class LogFile(models.Model):
     """Representa um arquivo de log analisado"""
     filename = models.CharField(max_length=255)
     filepath = models.TextField()
     content = models.TextField(blank=True)  # Conteúdo do arquivo
+    # SHA-256 do conteúdo (UTF-8): uploads repetidos são deduplicados por ele, não pelo nome
+    content_sha256 = models.CharField(max_length=64, blank=True, default='', db_index=True)
     size_bytes = models.BigIntegerField()
     analyzed_at = models.DateTimeField(default=timezone.now)
     total_lines = models.IntegerField(default=0)
+    # exclusão pedida e em andamento em segundo plano: some do catálogo, da busca e das análises
+    pending_delete = models.BooleanField(default=False, db_index=True)
+    # última alteração (upload, crescimento de segmento, exclusão pedida): versão do catálogo.
+    # update() não preenche auto_now: quem altera em massa passa updated_at=timezone.now()
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         db_table = 'log_files'
@@ -32,6 +46,10 @@ class LogAnalysis(models.Model):
     
     class Meta:
         db_table = 'log_analyses'
+        indexes = [
+            # retenção e histórico percorrem as análises por data
+            models.Index(fields=['started_at']),
+        ]
         
     def __str__(self):
         return f"Análise {self.id} - {self.started_at}"
@@ -55,6 +73,8 @@ class LogFinding(models.Model):
     description = models.TextField()
     recommendation = models.TextField(blank=True)
     timestamp = models.DateTimeField(null=True, blank=True)
+    # rótulos do IP de origem (ip_asn, ip_country, ip_zone...), quando há tabelas de enriquecimento
+    enrichment = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
@@ -63,6 +83,8 @@ class LogFinding(models.Model):
             models.Index(fields=['severity']),
             models.Index(fields=['rule_name']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['timestamp']),
+            models.Index(fields=['analysis', 'timestamp']),
         ]
         
     def __str__(self):
@@ -76,12 +98,78 @@ class Rule(models.Model):
     severity = models.CharField(max_length=10, choices=LogFinding.SEVERITY_CHOICES)
     description = models.TextField()
     recommendation = models.TextField(blank=True)
+    sources = models.CharField(
+        max_length=200, blank=True,
+        help_text="Tipos de origem separados por vírgula (apache, syslog, json, jsonl, csv, plaintext); vazio = todos"
+    )
+    where = models.JSONField(
+        default=dict, blank=True,
+        help_text='Condições sobre o enriquecimento do IP, ex.: {"ip_zone": ["dmz"], "ip_country": ["BR"]}; vazio = sem condições'
+    )
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'rules'
+    
+    def source_list(self):
+        return [s.strip().lower() for s in self.sources.split(',') if s.strip()]
+    
+    def clean(self):
+        """Rejeita regex inválida ou com formato de backtracking catastrófico"""
+        errors = {}
+        critical = [i.message for i in check_pattern(self.pattern) if i.level == CRITICAL]
+        if critical:
+            errors['pattern'] = "; ".join(critical)
+        unknown = [s for s in self.source_list() if s not in SOURCE_TYPES]
+        if unknown:
+            errors['sources'] = f"Tipos de origem desconhecidos: {', '.join(unknown)}"
+        try:
+            parse_where(self.where)
+        except ValueError as e:
+            errors['where'] = str(e)
+        if errors:
+            raise ValidationError(errors)
         
     def __str__(self):
         return self.name
+
+
+class Suppression(models.Model):
+    """Supressão de achados conhecidos (scanners internos, health checks, IPs confiáveis)"""
+    rule_name = models.CharField(max_length=100, blank=True, help_text="Regra suprimida; vazio = todas")
+    cidr = models.CharField(max_length=64, blank=True, help_text="IP ou rede (ex.: 10.0.0.0/8, 2001:db8::/32)")
+    path_pattern = models.CharField(max_length=500, blank=True, help_text="Regex aplicada ao path da requisição")
+    user_agent_pattern = models.CharField(max_length=500, blank=True, help_text="Regex aplicada ao user agent")
+    comment = models.TextField(blank=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'suppressions'
+
+    def clean(self):
+        """Rejeita CIDR ou regex inválidos e supressões sem nenhuma condição"""
+        errors = {}
+        if self.cidr:
+            try:
+                ipaddress.ip_network(self.cidr.strip(), strict=False)
+            except ValueError:
+                errors['cidr'] = f"IP ou rede inválidos: {self.cidr}"
+        for field in ('path_pattern', 'user_agent_pattern'):
+            pattern = getattr(self, field)
+            if not pattern:
+                continue
+            critical = [i.message for i in check_pattern(pattern) if i.level == CRITICAL]
+            if critical:
+                errors[field] = "; ".join(critical)
+        if not (self.cidr or self.path_pattern or self.user_agent_pattern):
+            errors['cidr'] = "Informe ao menos uma condição (CIDR, path ou user agent)"
+        if errors:
+            raise ValidationError(errors)
+
+    def __str__(self):
+        conditions = [c for c in (self.cidr, self.path_pattern, self.user_agent_pattern) if c]
+        return f"{self.rule_name or '*'}: {' '.join(conditions)}"
@@ -0,0 +1,198 @@
+"""
+Retenção: arquiva (NDJSON compactado com gzip) e exclui análises, achados e
+arquivos antigos, em lotes pequenos com transações curtas.
+
+Os achados vão antes dos registros que eles referenciam, então a exclusão final
+de uma análise ou arquivo não arrasta um CASCADE enorme; o tamanho do lote se
+ajusta para cada transação ficar abaixo de SYNAPSE_RETENTION_BATCH_SECONDS.
+"""
+import gzip
+import io
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from synapse_siem.backend.report import new_run_id
+from .models import LogAnalysis, LogFile, LogFinding
+from .search import get_search_index
+
+
+FINDING_FIELDS = (
+    'id', 'analysis_id', 'log_file_id', 'line_number', 'content', 'rule_name', 'severity',
+    'description', 'recommendation', 'timestamp', 'enrichment', 'created_at'
+)
+ANALYSIS_FIELDS = ('id', 'started_at', 'completed_at', 'total_files', 'total_findings', 'status')
+FILE_FIELDS = (
+    'id', 'filename', 'filepath', 'content_sha256', 'size_bytes', 'analyzed_at', 'total_lines', 'content'
+)
+
+# limites do ajuste automático do lote
+MIN_BATCH_SIZE = 50
+MAX_BATCH_SIZE = 20_000
+
+
+class RetentionArchive:
+    """Um arquivo `<tipo>.ndjson.gz` por tipo de registro, num diretório por execução."""
+
+    def __init__(self, base_dir):
+        self.directory = os.path.join(str(base_dir), new_run_id())
+        os.makedirs(self.directory, exist_ok=True)
+        self._files = {}
+
+    @property
+    def paths(self):
+        return [os.path.join(self.directory, f"{kind}.ndjson.gz") for kind in sorted(self._files)]
+
+    def write(self, kind, rows):
+        """Grava e sincroniza com o disco: só depois disso o lote pode ser excluído."""
+        handle = self._files.get(kind)
+        if handle is None:
+            raw = open(os.path.join(self.directory, f"{kind}.ndjson.gz"), 'wb')
+            text = io.TextIOWrapper(gzip.GzipFile(fileobj=raw, mode='wb'), encoding='utf-8')
+            handle = self._files[kind] = (raw, text)
+        raw, text = handle
+        for row in rows:
+            text.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False))
+            text.write('\n')
+        # flush do gzip em modo sync: o que já foi gravado é legível mesmo sem o close()
+        text.flush()
+        os.fsync(raw.fileno())
+
+    def close(self):
+        for raw, text in self._files.values():
+            text.close()
+            raw.close()
+
+
+class BatchDeleter:
+    """Exclui por lotes de IDs, com arquivamento opcional e lote ajustado ao tempo de cada transação."""
+
+    def __init__(self, archive=None, batch_size=None, max_seconds=None, pause=0.0):
+        self.archive = archive
+        self.batch_size = batch_size or settings.SYNAPSE_RETENTION_BATCH_SIZE
+        self.max_seconds = max_seconds or settings.SYNAPSE_RETENTION_BATCH_SECONDS
+        self.pause = pause
+        self.deleted = {'findings': 0, 'analyses': 0, 'files': 0}
+
+    def delete(self, kind, model, queryset, fields, archive=True):
+        while True:
+            ids = list(queryset.order_by('id').values_list('id', flat=True)[:self.batch_size])
+            if not ids:
+                return
+            if archive and self.archive is not None:
+                self.archive.write(kind, model.objects.filter(id__in=ids).order_by('id').values(*fields).iterator())
+            started = time.monotonic()
+            with transaction.atomic():
+                model.objects.filter(id__in=ids).delete()
+            elapsed = time.monotonic() - started
+            self.deleted[kind] += len(ids)
+            if elapsed > self.max_seconds:
+                self.batch_size = max(MIN_BATCH_SIZE, self.batch_size // 2)
+            elif elapsed < self.max_seconds / 4 and len(ids) == self.batch_size:
+                self.batch_size = min(MAX_BATCH_SIZE, self.batch_size * 2)
+            if self.pause:
+                # deixa outras escritas (ingestão, uploads) passarem entre os lotes
+                time.sleep(self.pause)
+
+
+def purge_analysis(deleter, analysis_id):
+    deleter.delete('findings', LogFinding, LogFinding.objects.filter(analysis_id=analysis_id), FINDING_FIELDS)
+    deleter.delete('analyses', LogAnalysis, LogAnalysis.objects.filter(id=analysis_id), ANALYSIS_FIELDS)
+
+
+def purge_file(deleter, file_id, archive=True):
+    # primeiro o índice de busca: o arquivo some das buscas antes de sumir do banco
+    get_search_index().remove_file(file_id)
+    deleter.delete(
+        'findings', LogFinding, LogFinding.objects.filter(log_file_id=file_id), FINDING_FIELDS, archive=archive
+    )
+    deleter.delete('files', LogFile, LogFile.objects.filter(id=file_id), FILE_FIELDS, archive=archive)
+
+
+def expired_analyses(days=None, max_findings=None):
+    """
+    IDs das análises a remover, das mais antigas para as mais novas: iniciadas há mais
+    de `days` dias e, se o total de achados passar de `max_findings`, as mais antigas
+    até voltar ao limite. Análises em execução nunca entram.
+    """
+    finished = LogAnalysis.objects.exclude(status='running').order_by('started_at', 'id')
+    expired = []
+    if days:
+        cutoff = timezone.now() - timedelta(days=days)
+        expired = list(finished.filter(started_at__lt=cutoff).values_list('id', flat=True))
+    if max_findings:
+        excess = LogFinding.objects.count() - max_findings
+        if excess > 0:
+            # total_findings é mantido por análise: dispensa contar achado por achado
+            excess -= sum(
+                LogAnalysis.objects.filter(id__in=expired).values_list('total_findings', flat=True)
+            ) if expired else 0
+            for analysis_id, total in finished.exclude(id__in=expired).values_list('id', 'total_findings'):
+                if excess <= 0:
+                    break
+                expired.append(analysis_id)
+                excess -= total
+    return expired
+
+
+def expired_files(days=None, max_bytes=None):
+    """
+    IDs dos arquivos a remover: importados há mais de `days` dias e, se o total passar
+    de `max_bytes`, os mais antigos até voltar ao limite. Segmentos de ingestão ainda
+    abertos (sem hash) ficam de fora.
+    """
+    files = (
+        LogFile.objects.filter(pending_delete=False)
+        .exclude(filepath__startswith='/ingest/', content_sha256='')
+        .order_by('analyzed_at', 'id')
+    )
+    expired = []
+    if days:
+        cutoff = timezone.now() - timedelta(days=days)
+        expired = list(files.filter(analyzed_at__lt=cutoff).values_list('id', flat=True))
+    if max_bytes:
+        total = LogFile.objects.filter(pending_delete=False).aggregate(total=Sum('size_bytes'))['total'] or 0
+        excess = total - max_bytes
+        if excess > 0:
+            excess -= (
+                LogFile.objects.filter(id__in=expired).aggregate(total=Sum('size_bytes'))['total'] or 0
+            ) if expired else 0
+            for file_id, size in files.exclude(id__in=expired).values_list('id', 'size_bytes'):
+                if excess <= 0:
+                    break
+                expired.append(file_id)
+                excess -= size
+    return expired
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _delete_pending_file(file_id):
+    close_old_connections()
+    try:
+        purge_file(BatchDeleter(pause=settings.SYNAPSE_RETENTION_PAUSE_SECONDS), file_id, archive=False)
+    except Exception:
+        # continua marcado como pendente: `manage.py retention` conclui a exclusão
+        pass
+    finally:
+        close_old_connections()
+
+
+def schedule_file_deletion(file_id):
+    """Exclui em segundo plano um arquivo já marcado com pending_delete (uma exclusão por vez)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='synapse-delete')
+    return _executor.submit(_delete_pending_file, file_id)
@@ -0,0 +1,132 @@
+import threading
+
+from django.conf import settings
+from django.db.models import Count, Max
+
+from synapse_siem.backend.analyzer import LogAnalyzer
+from synapse_siem.backend.cache import EventCache, ResultCache
+from synapse_siem.backend.enrichment import load_enrichment_tables
+from synapse_siem.backend.regex_guard import RuleBudget
+from synapse_siem.backend.rules import rules_from_records
+from synapse_siem.backend.suppressions import suppressions_from_records
+from .models import Rule, Suppression
+
+
+_lock = threading.Lock()
+_compiled = None  # (versão, LogAnalyzer)
+_result_cache = None
+_event_cache = None
+_enricher = None
+
+
+def get_result_cache():
+    """Cache de resultados compartilhado pelo processo (e com a CLI, via disco)"""
+    global _result_cache
+    if _result_cache is None:
+        _result_cache = ResultCache(
+            str(settings.SYNAPSE_RESULT_CACHE_DIR),
+            max_bytes=settings.SYNAPSE_RESULT_CACHE_MAX_BYTES,
+        )
+    return _result_cache
+
+
+def get_event_cache():
+    """Cache colunar de eventos parseados (sobrevive a mudanças de regras)"""
+    global _event_cache
+    if _event_cache is None:
+        _event_cache = EventCache(
+            str(settings.SYNAPSE_EVENT_CACHE_DIR),
+            max_bytes=settings.SYNAPSE_EVENT_CACHE_MAX_BYTES,
+        )
+    return _event_cache
+
+
+def get_enricher():
+    """
+    Tabelas de enriquecimento de IP (SYNAPSE_ENRICHMENT_TABLES), carregadas uma vez
+    por processo; None se não houver tabelas configuradas.
+    """
+    global _enricher
+    tables = settings.SYNAPSE_ENRICHMENT_TABLES
+    if not tables:
+        return None
+    if _enricher is None:
+        _enricher = load_enrichment_tables(
+            {name: str(path) for name, path in tables.items()},
+            cache_size=settings.SYNAPSE_ENRICHMENT_CACHE_SIZE,
+        )
+    return _enricher
+
+
+def current_version():
+    """
+    Versão atual do ruleset, derivada do banco (última alteração e quantidade de regras
+    e de supressões): todo processo enxerga a mesma versão, sem depender de um cache
+    compartilhado entre eles. Inclusões e edições mudam o updated_at; exclusões, a contagem.
+    """
+    rules = Rule.objects.aggregate(changed=Max('updated_at'), count=Count('id'))
+    suppressions = Suppression.objects.aggregate(changed=Max('updated_at'), count=Count('id'))
+    return rules['changed'], rules['count'], suppressions['changed'], suppressions['count']
+
+
+def compile_rules():
+    """Compila as regras ativas do banco (fonte da verdade do caminho web)"""
+    records = (
+        {
+            "id": rule["name"],
+            "description": rule["description"],
+            "severity": rule["severity"],
+            "regex": rule["pattern"],
+            "recommendation": rule["recommendation"] or "Sem recomendação.",
+            "sources": rule["sources"].split(','),
+            "where": rule["where"],
+        }
+        for rule in Rule.objects.filter(is_active=True).order_by('name').values(
+            'name', 'pattern', 'severity', 'description', 'recommendation', 'sources', 'where'
+        )
+    )
+    return rules_from_records(records)
+
+
+def compile_suppressions():
+    """Compila as supressões ativas do banco"""
+    records = (
+        {
+            "rule": item["rule_name"],
+            "cidr": item["cidr"],
+            "path": item["path_pattern"],
+            "user_agent": item["user_agent_pattern"],
+        }
+        for item in Suppression.objects.filter(is_active=True).order_by('id').values(
+            'rule_name', 'cidr', 'path_pattern', 'user_agent_pattern'
+        )
+    )
+    return suppressions_from_records(records)
+
+
+def get_analyzer():
+    """
+    Retorna um LogAnalyzer para uma análise, a partir do ruleset compilado do processo.
+
+    As regras só são recompiladas quando a versão muda (edição/exclusão de regra
+    ou supressão), então requisições seguidas não recompilam centenas de regex.
+    Cada chamada recebe sua própria cópia (`for_run`): quarentena, orçamento e
+    contadores de uma análise não vazam para as outras threads.
+    """
+    global _compiled
+    version = current_version()
+    compiled = _compiled
+    if compiled is None or compiled[0] != version:
+        with _lock:
+            if _compiled is None or _compiled[0] != version:
+                analyzer = LogAnalyzer(
+                    rules=compile_rules(),
+                    cache=get_result_cache(),
+                    event_cache=get_event_cache(),
+                    budget=RuleBudget(budget_us=settings.SYNAPSE_RULE_BUDGET_US),
+                    suppressions=compile_suppressions(),
+                    enricher=get_enricher(),
+                )
+                _compiled = (version, analyzer)
+            compiled = _compiled
+    return compiled[1].for_run()
@@ -0,0 +1,109 @@
+import json
+import os
+import sqlite3
+from contextlib import closing
+
+from django.conf import settings
+
+
+# rowid = file_id << LINE_BITS | line_number: a exclusão de um arquivo vira um
+# intervalo de rowid e o (arquivo, linha) do hit sai direto do rowid
+LINE_BITS = 32
+LINE_MASK = (1 << LINE_BITS) - 1
+
+SEARCH_MODES = ('term', 'phrase', 'prefix')
+
+INSERT_BATCH = 5000
+
+
+def _quote(token):
+    return '"' + token.replace('"', '""') + '"'
+
+
+def build_match(query, mode='term'):
+    """Monta a expressão MATCH do FTS5 sem expor a sintaxe de consulta ao usuário"""
+    tokens = query.split()
+    if not tokens:
+        raise ValueError("Consulta vazia")
+    if mode == 'phrase':
+        return _quote(' '.join(tokens))
+    if mode == 'prefix':
+        return ' '.join([_quote(t) for t in tokens[:-1]] + [_quote(tokens[-1]) + '*'])
+    if mode == 'term':
+        return ' '.join(_quote(t) for t in tokens)
+    raise ValueError(f"Modo de busca inválido: {mode}")
+
+
+class SearchIndex:
+    """Índice invertido (SQLite FTS5) das linhas dos arquivos importados"""
+    
+    def __init__(self, path=None):
+        self.path = str(path or settings.SYNAPSE_SEARCH_INDEX_PATH)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS log_lines USING fts5(line)")
+    
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+    
+    def add_file(self, file_id, content):
+        """Indexa as linhas de um arquivo (incremental: só o arquivo novo)"""
+        base = file_id << LINE_BITS
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM log_lines WHERE rowid BETWEEN ? AND ?", (base, base | LINE_MASK))
+            # só \n quebra linha, como no analisador (splitlines() também quebraria em \v, \f,
+            # \x1c-\x1e, \x85, \u2028...) e os números de linha batem com os dos achados
+            lines = (line[:-1] if line.endswith('\r') else line for line in content.split('\n'))
+            self._insert(conn, base, enumerate(lines, start=1))
+    
+    def add_lines(self, file_id, first_line, lines):
+        """Acrescenta linhas ao fim de um arquivo já indexado (segmentos de ingestão)"""
+        with closing(self._connect()) as conn, conn:
+            self._insert(conn, file_id << LINE_BITS, enumerate(lines, start=first_line))
+    
+    def _insert(self, conn, base, numbered_lines):
+        batch = []
+        for line_number, line in numbered_lines:
+            if not line.strip():
+                continue
+            batch.append((base | line_number, line))
+            if len(batch) >= INSERT_BATCH:
+                conn.executemany("INSERT INTO log_lines(rowid, line) VALUES (?, ?)", batch)
+                batch = []
+        if batch:
+            conn.executemany("INSERT INTO log_lines(rowid, line) VALUES (?, ?)", batch)
+    
+    def remove_file(self, file_id):
+        base = file_id << LINE_BITS
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM log_lines WHERE rowid BETWEEN ? AND ?", (base, base | LINE_MASK))
+    
+    def search(self, query, mode='term', offset=0, limit=50, exclude_files=()):
+        """
+        Retorna (total, [(file_id, line_number, line)]) do mais recente ao mais antigo,
+        sem as linhas dos arquivos em `exclude_files` (ex.: exclusão pendente)
+        """
+        match = build_match(query, mode)
+        where = "log_lines MATCH ?"
+        params = [match]
+        if exclude_files:
+            where += f" AND (rowid >> {LINE_BITS}) NOT IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps(sorted(exclude_files)))
+        with closing(self._connect()) as conn:
+            total = conn.execute(f"SELECT count(*) FROM log_lines WHERE {where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT rowid, line FROM log_lines WHERE {where} ORDER BY rowid DESC LIMIT ? OFFSET ?",
+                (*params, limit, offset),
+            ).fetchall()
+        return total, [(rowid >> LINE_BITS, rowid & LINE_MASK, line) for rowid, line in rows]
+
+
+_index = None
+
+
+def get_search_index():
+    global _index
+    if _index is None:
+        _index = SearchIndex()
+    return _index
@@ -0,0 +1,359 @@
+"""
+Views assíncronas (ASGI): análise com achados transmitidos enquanto o analisador
+os produz (server-sent events ou NDJSON) e upload sem ocupar o event loop.
+
+O trabalho pesado (varredura, descompactação, banco) roda num pool de threads;
+o event loop só repassa os eventos da fila para o cliente.
+"""
+import asyncio
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.uploadhandler import StopFutureHandlers
+from django.db import close_old_connections
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import parse_header_parameters
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from .analysis import (
+    FINDING_BATCH_SIZE, finding_payload, finding_record, log_file_on_disk, select_log_files
+)
+from .models import LogAnalysis, LogFinding
+from .ruleset import get_analyzer
+from .uploads import LogUploadHandler, import_received_files, upload_response
+
+
+# eventos aguardando o cliente; cheia, a varredura espera (backpressure)
+STREAM_QUEUE_SIZE = 256
+
+# achados pendentes são gravados e enviados ao menos a cada STREAM_FLUSH_SECONDS
+STREAM_FLUSH_SECONDS = 0.25
+
+# achados já encontrados aguardando a gravação; cheia, a varredura espera
+SCAN_QUEUE_SIZE = 1024
+
+# severidades enviadas na hora, sem esperar o lote
+URGENT_SEVERITIES = frozenset({'critical', 'high'})
+
+# comentário SSE enviado quando nada acontece, para proxies não fecharem a conexão
+KEEPALIVE_SECONDS = 15
+
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+_END = object()
+_SCAN_END = object()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Pool de threads das análises em streaming (SYNAPSE_ANALYSIS_WORKERS)"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'SYNAPSE_ANALYSIS_WORKERS', 4),
+                thread_name_prefix='synapse-analysis',
+            )
+        return _executor
+
+
+class StreamCancelled(Exception):
+    """O cliente desconectou: a análise em andamento é interrompida."""
+
+
+class _Channel:
+    """Fila limitada entre a thread de análise e o event loop da resposta."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=STREAM_QUEUE_SIZE)
+        self.cancelled = threading.Event()
+
+    def emit(self, event, data):
+        """Chamado pela thread de análise; bloqueia enquanto a fila está cheia."""
+        if self.cancelled.is_set():
+            raise StreamCancelled()
+        asyncio.run_coroutine_threadsafe(self.queue.put((event, data)), self.loop).result()
+
+    def close(self):
+        if not self.cancelled.is_set():
+            asyncio.run_coroutine_threadsafe(self.queue.put(_END), self.loop).result()
+
+    def cancel(self):
+        """Chamado no event loop quando a resposta termina antes da análise."""
+        self.cancelled.set()
+        # libera uma thread presa em put(); o próximo emit() vê o cancelamento
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+
+def _format_event(event, data, ndjson):
+    if ndjson:
+        return json.dumps({"event": event, **data}) + "\n"
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _scan_into(analyzer, path, found, stop):
+    """
+    Thread de varredura: repassa os achados para `found` e termina com _SCAN_END
+    (ou a exceção do analisador). Para no próximo achado depois de `stop`.
+    """
+    findings = analyzer.iter_findings([path])
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                found.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for finding_data in findings:
+            if not put(finding_data):
+                return
+        put(_SCAN_END)
+    except Exception as e:
+        put(e)
+    finally:
+        findings.close()
+
+
+def _stream_file(channel, analyzer, log_file, analysis, by_severity):
+    """
+    Varre um arquivo; achados vão para o banco e para o cliente em lotes pequenos.
+
+    A varredura roda numa thread própria e esta espera os achados com timeout: os
+    pendentes saem a cada STREAM_FLUSH_SECONDS mesmo quando um trecho longo do
+    arquivo não produz achado nenhum.
+    """
+    pending = []
+    last_flush = time.monotonic()
+
+    def flush():
+        records = LogFinding.objects.bulk_create(pending, batch_size=FINDING_BATCH_SIZE)
+        pending.clear()
+        for finding in records:
+            by_severity[finding.severity] = by_severity.get(finding.severity, 0) + 1
+            channel.emit("finding", finding_payload(finding, log_file.filename))
+
+    with log_file_on_disk(log_file) as temp_path:
+        found = queue.Queue(maxsize=SCAN_QUEUE_SIZE)
+        stop = threading.Event()
+        scanner = threading.Thread(
+            target=_scan_into, args=(analyzer, temp_path, found, stop), name='synapse-scan', daemon=True
+        )
+        scanner.start()
+        try:
+            while True:
+                timeout = None
+                if pending:
+                    timeout = max(0.0, last_flush + STREAM_FLUSH_SECONDS - time.monotonic())
+                try:
+                    item = found.get(timeout=timeout)
+                except queue.Empty:
+                    flush()
+                    last_flush = time.monotonic()
+                    continue
+                if item is _SCAN_END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                pending.append(finding_record(item, analysis, log_file))
+                if (
+                    len(pending) >= FINDING_BATCH_SIZE
+                    or item.get('severity') in URGENT_SEVERITIES
+                    or time.monotonic() - last_flush >= STREAM_FLUSH_SECONDS
+                ):
+                    flush()
+                    last_flush = time.monotonic()
+        finally:
+            # cancelamento ou erro: a varredura para no próximo achado
+            stop.set()
+        scanner.join()
+    if pending:
+        flush()
+
+
+def _run_analysis(channel, log_files, scanned_files):
+    """Executada no pool de threads: mesma análise do LogAnalysisView, em streaming."""
+    close_old_connections()
+    analysis = None
+    try:
+        analysis = LogAnalysis.objects.create(total_files=len(scanned_files), status='running')
+        channel.emit("analysis", {"analysis_id": analysis.id, "scanned_files": scanned_files})
+
+        analyzer = get_analyzer()
+        by_severity = {}
+        errors = []
+        for log_file in log_files.iterator(chunk_size=1):
+            before = sum(by_severity.values())
+            try:
+                _stream_file(channel, analyzer, log_file, analysis, by_severity)
+            except StreamCancelled:
+                raise
+            except Exception as e:
+                errors.append(f"Erro em {log_file.filename}: {str(e)}")
+            channel.emit("file", {
+                "file_id": log_file.id,
+                "filename": log_file.filename,
+                "findings": sum(by_severity.values()) - before
+            })
+
+        total_findings = sum(by_severity.values())
+        analysis.total_findings = total_findings
+        analysis.status = 'completed' if not errors else 'failed'
+        analysis.completed_at = timezone.now()
+        analysis.save()
+
+        done = {
+            "analysis_id": analysis.id,
+            "summary": {
+                "total_logs": len(scanned_files),
+                "total_findings": total_findings,
+                "by_severity": by_severity
+            },
+            "total_findings": total_findings
+        }
+        if errors:
+            done["warnings"] = errors
+        if analyzer.quarantined:
+            done["quarantined_rules"] = analyzer.quarantined
+        channel.emit("done", done)
+        channel.close()
+    except StreamCancelled:
+        if analysis is not None:
+            analysis.status = 'failed'
+            analysis.completed_at = timezone.now()
+            analysis.save(update_fields=['status', 'completed_at'])
+    except Exception as e:
+        if analysis is not None:
+            LogAnalysis.objects.filter(id=analysis.id).update(status='failed', completed_at=timezone.now())
+        try:
+            channel.emit("error", {"error": f"Erro na análise: {str(e)}"})
+            channel.close()
+        except StreamCancelled:
+            pass
+    finally:
+        close_old_connections()
+
+
+async def _analysis_events(log_files, scanned_files, ndjson):
+    # a fila é criada aqui: pertence ao loop que consome a resposta
+    loop = asyncio.get_running_loop()
+    channel = _Channel(loop)
+    loop.run_in_executor(get_executor(), _run_analysis, channel, log_files, scanned_files)
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(channel.queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if not ndjson:
+                    yield ": keepalive\n\n"
+                continue
+            if item is _END:
+                break
+            yield _format_event(*item, ndjson)
+    finally:
+        # cliente desconectou (ou a resposta terminou): a thread para no próximo evento
+        channel.cancel()
+
+
+def _wants_ndjson(request):
+    return (
+        request.GET.get('format') == 'ndjson'
+        or NDJSON_CONTENT_TYPE in request.headers.get('Accept', '')
+    )
+
+
+@csrf_exempt
+@require_POST
+async def stream_analysis(request):
+    """
+    Executa a análise e transmite os eventos enquanto ela roda:
+    `analysis` (ID e arquivos), `finding` (cada achado já gravado), `file` (fim de
+    um arquivo), `done` (resumo) ou `error`.
+    """
+    try:
+        body = json.loads(request.body or b'{}')
+        selected_ids = body.get('file_ids', []) if isinstance(body, dict) else []
+    except ValueError:
+        return JsonResponse({"error": "Corpo da requisição não é JSON válido"}, status=400)
+
+    try:
+        log_files, scanned_files, empty_files = await sync_to_async(select_log_files)(selected_ids)
+    except Exception as e:
+        return JsonResponse({"error": f"Erro na análise: {str(e)}"}, status=500)
+    if not scanned_files:
+        return JsonResponse({"error": "Nenhum arquivo disponível para análise"}, status=404)
+    if empty_files:
+        return JsonResponse(
+            {"error": f"Arquivos sem conteúdo: {', '.join(empty_files)}. Faça novo upload."}, status=400
+        )
+
+    ndjson = _wants_ndjson(request)
+    response = StreamingHttpResponse(
+        _analysis_events(log_files, scanned_files, ndjson),
+        content_type=NDJSON_CONTENT_TYPE if ndjson else 'text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # nginx: não acumular a resposta antes de repassar
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _received_files(request):
+    """Arquivos recebidos pelo LogUploadHandler (multipart ou corpo cru)"""
+    handler = LogUploadHandler(request)
+    if request.content_type.startswith('multipart/'):
+        request.upload_handlers = [handler]
+        files = request.FILES
+        return [f for field in files for f in files.getlist(field)]
+
+    # corpo cru: o mesmo handler, alimentado em pedaços (como o FileUploadParser faria)
+    _, params = parse_header_parameters(request.headers.get('Content-Disposition', ''))
+    content_length = int(request.headers.get('Content-Length') or 0)
+    if not content_length:
+        return []
+    try:
+        handler.new_file(None, params.get('filename'), request.content_type, content_length)
+    except StopFutureHandlers:
+        pass
+    received = 0
+    while True:
+        chunk = request.read(handler.chunk_size)
+        if not chunk:
+            break
+        handler.receive_data_chunk(chunk, received)
+        received += len(chunk)
+    return [handler.file_complete(received)]
+
+
+@csrf_exempt
+@require_POST
+async def stream_upload(request):
+    """Upload com o mesmo formato do LogUploadView, sem bloquear o event loop."""
+    if request.content_type.startswith('multipart/') and request.headers.get('Content-Encoding'):
+        return JsonResponse(
+            {"error": "Content-Encoding não é suportado em multipart; envie cada arquivo compactado (.gz/.zst)"},
+            status=415
+        )
+    try:
+        # descompactação e hash fora da thread das operações de banco
+        received = await sync_to_async(_received_files, thread_sensitive=False)(request)
+        if not received:
+            return JsonResponse({"error": "Nenhum arquivo enviado"}, status=400)
+        imported = await sync_to_async(import_received_files)(received)
+        response_data, response_status = upload_response(received, *imported)
+        return JsonResponse(response_data, status=response_status)
+    except Exception as e:
+        return JsonResponse({"error": f"Erro no upload: {str(e)}"}, status=500)
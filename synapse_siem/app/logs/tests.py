@@ -1,3 +1,1326 @@
-from django.test import TestCase
+import base64
+import datetime
+import gzip
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.core.files.uploadhandler import StopFutureHandlers
+from django.core.management import CommandError, call_command
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from synapse_siem.backend import analytics
+from synapse_siem.backend.analytics import TrafficAnalytics
+from synapse_siem.backend.analyzer import SCAN_MODES, LogAnalyzer
+from synapse_siem.backend.cache import EventCache, ResultCache
+from synapse_siem.backend.encoding import SNIFF_BYTES, sniff_encoding
+from synapse_siem.backend.enrichment import RangeTable, _flatten
+from synapse_siem.backend.report import ReportWriter, _atomic_open, build_report_model, make_run_directory, new_run_id
+from synapse_siem.backend.rules import rules_from_records
+from synapse_siem.backend.sketches import HyperLogLog, RuleSketches, SpaceSaving
+from synapse_siem.backend import utils
+from synapse_siem.backend.timestamps import TimestampNormalizer, bucket_start, to_iso
+from synapse_siem.backend.suppressions import EventAttributes, suppressions_from_records
+from synapse_siem.backend.syslog_receiver import FramingError, SyslogFramer
+from . import ingest, ruleset, search, streaming, uploads
+from .management.commands import analyze
+from .analysis import select_log_files
+from .models import LogAnalysis, LogFile, LogFinding, Suppression
+from .models import Rule as RuleModel
+from .retention import FINDING_FIELDS, BatchDeleter, RetentionArchive
+from .uploads import LogUploadHandler
+
+
+def _write(directory, name, data):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def _isolate_storage(test):
+    """Caches, índice de busca e estado em disco num diretório temporário do teste"""
+    tmp = tempfile.TemporaryDirectory()
+    test.addCleanup(tmp.cleanup)
+    override = override_settings(
+        SYNAPSE_RESULT_CACHE_DIR=os.path.join(tmp.name, 'results'),
+        SYNAPSE_EVENT_CACHE_DIR=os.path.join(tmp.name, 'events'),
+        SYNAPSE_SEARCH_INDEX_PATH=os.path.join(tmp.name, 'search', 'log_lines.sqlite3'),
+        SYNAPSE_ANALYZE_STATE_DIR=os.path.join(tmp.name, 'analyze'),
+        SYNAPSE_ENRICHMENT_TABLES={},
+    )
+    override.enable()
+    test.addCleanup(override.disable)
+    for module, name in (
+        (ruleset, '_compiled'), (ruleset, '_result_cache'), (ruleset, '_event_cache'), (search, '_index'),
+    ):
+        patcher = mock.patch.object(module, name, None)
+        patcher.start()
+        test.addCleanup(patcher.stop)
+    return tmp.name
+
+
+def _receive(data, name='upload.log', chunk_size=None):
+    """Passa `data` pelo LogUploadHandler em pedaços, como o parser multipart faria"""
+    handler = LogUploadHandler()
+    try:
+        handler.new_file('file', name, 'application/octet-stream', len(data))
+    except StopFutureHandlers:
+        pass
+    chunk_size = chunk_size or handler.chunk_size
+    for start in range(0, len(data), chunk_size):
+        handler.receive_data_chunk(data[start:start + chunk_size], start)
+    return handler.file_complete(len(data))
+
+
+@skipUnless(analytics.np is not None, "analytics de tráfego requer NumPy")
+class ReportEscapingTests(SimpleTestCase):
+    """Paths e IPs vêm do log (controlados por quem faz a requisição)"""
+
+    PAYLOAD = '/a<script>alert(1)</script>'
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        line = (
+            f'10.0.0.1 - - [10/Oct/2025:13:55:36 +0000] "GET {self.PAYLOAD} HTTP/1.1" '
+            '404 123 "-" "curl/8.0"\n'
+        )
+        path = _write(self.tmp.name, 'access.log', line.encode('ascii') * 12)
+        traffic = TrafficAnalytics()
+        rules = rules_from_records([
+            {"id": "XSS", "description": "XSS", "regex": "<script", "sources": ["apache"]}
+        ])
+        analyzer = LogAnalyzer(rules=rules, traffic=traffic)
+        findings = analyzer.analyze_files([path])
+        self.traffic = traffic.result()
+        self.assertEqual(self.traffic['error_ratio_by_path'][0]['path'], self.PAYLOAD)
+        writer = ReportWriter(self.tmp.name)
+        self.paths = writer.write_reports(findings, {'html', 'md'}, traffic=self.traffic)
+
+    def _read(self, suffix):
+        [path] = [p for p in self.paths if p.endswith(suffix)]
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+
+    def test_html_report_escapes_log_values(self):
+        html = self._read('.html')
+        self.assertNotIn('<script>alert(1)</script>', html)
+        self.assertIn('<code>/a&lt;script&gt;alert(1)&lt;/script&gt;</code>', html)
+
+    def test_markdown_traffic_table_keeps_values_in_code_spans(self):
+        md = self._read('.md')
+        self.assertIn(f'| `{self.PAYLOAD}` | 12 | 12 | 0 | 100.0% |', md)
+        self.assertIn('| `10.0.0.1` |', md)
+
+
+class EncodingSniffTests(SimpleTestCase):
+    """Arquivo ASCII no começo e com UTF-8 depois da amostra de detecção"""
+
+    LINE = 'acesso negado para usuário João'
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        filler = b'heartbeat ok from worker 01\n' * (2 * SNIFF_BYTES // 28)
+        self.assertGreater(len(filler), SNIFF_BYTES)
+        self.filler_lines = filler.count(b'\n')
+        self.data = filler + self.LINE.encode('utf-8') + b'\n'
+        self.path = _write(self.tmp.name, 'mixed.log', self.data)
+
+    def test_ascii_sample_is_sniffed_as_utf8(self):
+        self.assertEqual(sniff_encoding(self.path), 'utf-8')
+
+    def test_every_scan_mode_decodes_late_utf8(self):
+        for mode in SCAN_MODES:
+            with self.subTest(mode=mode):
+                findings = LogAnalyzer(scan_mode=mode).analyze_files([self.path])
+                lines = [f['raw_line'] for f in findings if f['rule_id'] == 'PERMISSION_DENIED']
+                self.assertEqual(len(lines), 1)
+                self.assertTrue(lines[0].endswith(self.LINE), lines[0])
+
+    def test_upload_keeps_utf8_after_first_chunk(self):
+        received = _receive(self.data)
+        self.assertIsNone(received.error)
+        self.assertEqual(received.source_encoding, 'utf-8')
+        self.assertTrue(received.content.endswith(self.LINE + '\n'))
+        self.assertEqual(received.total_lines, self.filler_lines + 1)
+
+    def test_upload_marks_invalid_bytes_instead_of_dropping_them(self):
+        data = b'x' * SNIFF_BYTES * 2 + b'\nusu\xe1rio Jo\xe3o\n'
+        received = _receive(data)
+        self.assertTrue(received.content.endswith('usu\ufffdrio Jo\ufffdo\n'))
+
+
+class LineNumberTests(SimpleTestCase):
+    """Todo modo de varredura (e o cache de eventos) dá o mesmo line_number ao achado"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _line_numbers(self, path, **kwargs):
+        findings = LogAnalyzer(**kwargs).analyze_files([path])
+        return sorted((f['rule_id'], f['line_number']) for f in findings)
+
+    def _assert_same_in_every_mode(self, path, expected):
+        for mode in SCAN_MODES:
+            with self.subTest(mode=mode):
+                self.assertEqual(self._line_numbers(path, scan_mode=mode), expected)
+        event_cache = EventCache(os.path.join(self.tmp.name, 'events'))
+        for run in ('frio', 'quente'):
+            with self.subTest(event_cache=run):
+                self.assertEqual(self._line_numbers(path, event_cache=event_cache), expected)
+
+    def test_plaintext_counts_blank_lines(self):
+        data = b'ok\n\nservice started\npermission denied for bob\n\nok\npermission denied for ana\n'
+        path = _write(self.tmp.name, 'app.log', data)
+        self._assert_same_in_every_mode(path, [('PERMISSION_DENIED', 4), ('PERMISSION_DENIED', 7)])
+
+    def test_line_context_patterns_match_as_in_line_scan(self):
+        # no buffer o lookbehind/lookahead veria o \n das linhas vizinhas
+        rules = rules_from_records([
+            {"id": "PIN_START", "description": "pin", "regex": r"(?<![^a-z])\d{4}"},
+            {"id": "PIN_END", "description": "pin", "regex": r"\d{4}(?![^a-z])"},
+            {"id": "WORD", "description": "word", "regex": r"\b\d{3}\b"},
+        ])
+        data = b'abc\n1234 ok\nok 5678\nx 123\n'
+        path = _write(self.tmp.name, 'app.log', data)
+        self.assertIsNone(LogAnalyzer(rules=rules).scan_dispatch['plaintext'])
+        for mode in SCAN_MODES:
+            with self.subTest(mode=mode):
+                self.assertEqual(
+                    self._line_numbers(path, rules=rules, scan_mode=mode),
+                    [('PIN_END', 3), ('PIN_START', 2), ('WORD', 4)],
+                )
+        # com literal obrigatório cada linha candidata é conferida sozinha: continua no buffer
+        rules = rules_from_records([{"id": "PIN", "description": "pin", "regex": r"(?<![^a-z])pin \d{4}"}])
+        path = _write(self.tmp.name, 'pin.log', b'abc\npin 1234\nxpin 5678\n')
+        self.assertIsNotNone(LogAnalyzer(rules=rules).scan_dispatch['plaintext'])
+        self.assertEqual(self._line_numbers(path, rules=rules, scan_mode='mmap'), [('PIN', 2), ('PIN', 3)])
+
+    def test_syslog_counts_lines_the_parser_skips(self):
+        data = (
+            b'Oct 11 22:14:15 host sshd[1]: Accepted password for ana\n'
+            b'linha que nao e syslog\n'
+            b'Oct 11 22:14:16 host sshd[1]: Failed password for root from 10.0.0.9 port 22\n'
+        )
+        path = _write(self.tmp.name, 'auth.log', data)
+        expected = self._line_numbers(path, scan_mode='text')
+        self.assertTrue(expected)
+        self.assertEqual({number for _, number in expected}, {3})
+        self._assert_same_in_every_mode(path, expected)
+
+
+class CompressedUploadTests(SimpleTestCase):
+    """Descompactação em streaming no LogUploadHandler"""
+
+    TEXT = ''.join(f'linha {i} do log com usuário João\n' for i in range(3000))
+
+    def _assert_received(self, received):
+        self.assertIsNone(received.error)
+        self.assertEqual(received.name, 'app.log')
+        self.assertEqual(received.content, self.TEXT)
+        self.assertEqual(received.total_lines, 3000)
+        self.assertEqual(received.sha256, hashlib.sha256(self.TEXT.encode('utf-8')).hexdigest())
+
+    def test_gzip_members_split_in_small_chunks(self):
+        # dois membros concatenados (`cat a.gz b.gz`) e pedaços que cortam cabeçalhos e rodapés
+        data = self.TEXT.encode('utf-8')
+        half = len(data) // 2
+        body = gzip.compress(data[:half]) + gzip.compress(data[half:])
+        received = _receive(body, name='app.log.gz', chunk_size=7)
+        self.assertEqual(received.compression, 'gzip')
+        self._assert_received(received)
+
+    def test_gzip_detected_by_magic_bytes(self):
+        received = _receive(gzip.compress(self.TEXT.encode('utf-8')), name='app.log')
+        self.assertEqual(received.compression, 'gzip')
+        self._assert_received(received)
+
+    def test_truncated_gzip_is_an_error(self):
+        body = gzip.compress(self.TEXT.encode('utf-8'))
+        received = _receive(body[:-10], name='app.log.gz')
+        self.assertIn('gzip incompleto', received.error)
+        self.assertEqual(received.content, '')
+        self.assertEqual(received.total_lines, 0)
+
+    def test_chunk_larger_than_output_limit_is_fully_decompressed(self):
+        # um único pedaço que descompacta em vários DECOMPRESS_CHUNK (saída via unconsumed_tail)
+        rng = random.Random(43)
+        text = ''.join(f'{rng.randrange(10 ** 6)} evento {i}\n' for i in range(200_000))
+        body = gzip.compress(text.encode('ascii'))
+        self.assertGreater(len(text), 3 * uploads.DECOMPRESS_CHUNK)
+        received = _receive(body, name='app.log.gz', chunk_size=len(body))
+        self.assertIsNone(received.error)
+        self.assertEqual(received.content, text)
+
+    def test_gzip_bomb_stops_at_limit(self):
+        bomb = gzip.compress(b'\0' * (64 * 1024 * 1024), compresslevel=9)
+        limit = 2 * 1024 * 1024
+        decompressor = uploads.DECOMPRESSORS['gzip'](max_output=limit)
+        with self.assertRaises(uploads.DecompressedTooLarge):
+            for start in range(0, len(bomb), 64 * 1024):
+                decompressor.decompress(bomb[start:start + 64 * 1024])
+        # no máximo um pedaço de saída além do limite chega a ser produzido
+        self.assertLessEqual(decompressor.total, limit + uploads.DECOMPRESS_CHUNK)
+        with override_settings(SYNAPSE_UPLOAD_MAX_BYTES=limit):
+            received = _receive(bomb, name='bomba.log.gz', chunk_size=len(bomb))
+        self.assertIn('limite de 2 MiB descompactado', received.error)
+        self.assertEqual(received.content, '')
+
+    @override_settings(SYNAPSE_INGEST_MAX_REQUEST_BYTES=64 * 1024)
+    def test_ingest_body_bomb_is_rejected(self):
+        bomb = gzip.compress(b'linha\n' * (2 * 1024 * 1024), compresslevel=9)
+        self.assertLess(len(bomb), 64 * 1024)
+        response = self.client.post(
+            '/api/logs/ingest/?source_type=plaintext', data=bomb,
+            content_type='text/plain', HTTP_CONTENT_ENCODING='gzip',
+        )
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('64 KiB', response.json()['error'])
+
+    @skipUnless(uploads.zstandard is not None, "upload zstd requer o pacote zstandard")
+    def test_zstd_split_in_small_chunks(self):
+        body = uploads.zstandard.ZstdCompressor().compress(self.TEXT.encode('utf-8'))
+        received = _receive(body, name='app.log.zst', chunk_size=5)
+        self.assertEqual(received.compression, 'zstd')
+        self._assert_received(received)
+
+
+class SyslogFramerTests(SimpleTestCase):
+    """Enquadramento TCP da RFC 6587 (octet-counting e terminado em LF)"""
+
+    MESSAGES = [
+        b'<34>1 2025-10-11T22:14:15Z host app - - - falha de login',
+        b'<13>Oct 11 22:14:15 host app: mensagem com 12 34 digitos',
+        b'<13>Oct 11 22:14:16 host app: linha\ninterna',
+    ]
+    STREAM = (
+        b'%d %s' % (len(MESSAGES[0]), MESSAGES[0])
+        + MESSAGES[1] + b'\r\n'
+        + b'%d %s' % (len(MESSAGES[2]), MESSAGES[2])
+        + b'\n<13>Oct 11 22:14:17 host app: sem LF no fim'
+    )
+
+    def _frame(self, chunk_size):
+        framer = SyslogFramer()
+        messages = []
+        for start in range(0, len(self.STREAM), chunk_size):
+            messages += framer.feed(self.STREAM[start:start + chunk_size])
+        return messages + framer.finish()
+
+    def test_frames_are_the_same_for_any_chunking(self):
+        expected = [
+            self.MESSAGES[0], self.MESSAGES[1] + b'\r', self.MESSAGES[2],
+            b'<13>Oct 11 22:14:17 host app: sem LF no fim',
+        ]
+        for chunk_size in (1, 2, 5, 64, len(self.STREAM)):
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self._frame(chunk_size), expected)
+
+    def test_invalid_or_oversized_length_is_rejected(self):
+        with self.assertRaises(FramingError):
+            SyslogFramer().feed(b'12x <13>Oct 11 22:14:15 host app: x\n')
+        with self.assertRaises(FramingError):
+            SyslogFramer().feed(b'12345678901 <13>')
+        with self.assertRaises(FramingError):
+            SyslogFramer(max_message_bytes=10).feed(b'11 ')
+        with self.assertRaises(FramingError):
+            SyslogFramer(max_message_bytes=10).feed(b'<13>mensagem longa sem fim de linha')
+
+    def test_incomplete_octet_counted_frame_waits_for_more_data(self):
+        framer = SyslogFramer()
+        self.assertEqual(framer.feed(b'10 <13>ab'), [])
+        self.assertEqual(framer.feed(b'cdef'), [b'<13>abcdef'])
+        # quadro octet-counting cortado no fim da conexão é descartado
+        self.assertEqual(framer.feed(b'10 <13>'), [])
+        self.assertEqual(framer.finish(), [])
+
+
+class FlattenTests(SimpleTestCase):
+    """Varredura de intervalos do enriquecimento contra força bruta"""
+
+    def test_innermost_range_wins(self):
+        rng = random.Random(41)
+        for _ in range(200):
+            blocks = set()
+            while len(blocks) < rng.randint(1, 12):
+                prefix = rng.randint(0, 8)
+                size = 1 << (8 - prefix)
+                first = rng.randrange(0, 256, size)
+                blocks.add((first, first + size - 1))
+            ranges = [(first, last, f'{first}-{last}') for first, last in blocks]
+            starts, ends, labels = _flatten(ranges)
+            self.assertEqual(starts, sorted(starts))
+            self.assertTrue(all(a <= b for a, b in zip(starts, ends)))
+            self.assertTrue(all(end < start for end, start in zip(ends, starts[1:])))
+            table = RangeTable((4, first, last, label) for first, last, label in ranges)
+            for value in range(256):
+                inside = [r for r in ranges if r[0] <= value <= r[1]]
+                expected = min(inside, key=lambda r: r[1] - r[0])[2] if inside else None
+                self.assertEqual(table.lookup((4, value)), expected, (ranges, value))
+
+    def test_adjacent_segments_with_same_label_are_merged(self):
+        self.assertEqual(_flatten([(0, 9, 'a'), (10, 19, 'a'), (20, 29, 'b')]), ([0, 20], [19, 29], ['a', 'b']))
+
+
+class SuppressionTests(SimpleTestCase):
+    def setUp(self):
+        self.suppressions = suppressions_from_records([
+            {"cidr": "10.0.0.0/8", "comment": "rede interna"},
+            {"rule": "SQLI", "cidr": "192.0.2.7"},
+            {"rule": "XSS", "path": "^/health", "user_agent": "kube-probe"},
+            {"cidr": "2001:db8::/32", "path": "^/api"},
+            {"cidr": "não é rede"},
+            {"path": "("},
+            {"rule": "XSS"},
+        ])
+
+    def _suppresses(self, rule_id, **event):
+        return self.suppressions.suppresses(rule_id, EventAttributes(event))
+
+    def test_invalid_records_are_ignored(self):
+        self.assertEqual(len(self.suppressions), 4)
+
+    def test_network_only_applies_to_every_rule(self):
+        self.assertTrue(self._suppresses('SQLI', ip='10.1.2.3'))
+        self.assertTrue(self._suppresses('XSS', ip='::ffff:10.1.2.3'))
+        # sem campo de IP não há rede: o IP do texto pode ser o de destino
+        self.assertFalse(self._suppresses('XSS', message='conexão de 8.8.8.8 para 10.9.9.9 negada'))
+        self.assertFalse(self._suppresses('XSS', message='login de 10.9.9.9 negado'))
+        self.assertTrue(self._suppresses('XSS', src_ip='10.9.9.9', message='login de 8.8.8.8'))
+        self.assertFalse(self._suppresses('XSS', ip='11.0.0.1'))
+
+    def test_rule_scoped_network(self):
+        self.assertTrue(self._suppresses('SQLI', ip='192.0.2.7'))
+        self.assertFalse(self._suppresses('XSS', ip='192.0.2.7'))
+        self.assertFalse(self._suppresses('SQLI', ip='192.0.2.8'))
+
+    def test_every_condition_must_match(self):
+        self.assertTrue(self._suppresses('XSS', path='/healthz', ua='kube-probe/1.29'))
+        self.assertFalse(self._suppresses('XSS', path='/healthz', ua='curl/8.0'))
+        self.assertFalse(self._suppresses('XSS', path='/healthz'))
+        self.assertFalse(self._suppresses('SQLI', path='/healthz', ua='kube-probe/1.29'))
+        self.assertTrue(self._suppresses('SQLI', ip='2001:db8::1', path='/API/v1'))
+        self.assertFalse(self._suppresses('SQLI', ip='2001:db9::1', path='/api/v1'))
+
+    def test_analyzer_drops_and_counts_suppressed_findings(self):
+        rules = rules_from_records([{"id": "DENIED", "description": "d", "regex": "denied"}])
+        analyzer = LogAnalyzer(rules=rules, suppressions=self.suppressions)
+        findings = analyzer._apply_rules({'ip': '10.0.0.5', 'message': 'interno: access denied'}, 'a.log')
+        findings += analyzer._apply_rules({'ip': '8.8.8.8', 'message': 'externo: access denied'}, 'a.log')
+        self.assertEqual([f['raw_line'] for f in findings], ['externo: access denied'])
+        self.assertEqual(analyzer.suppressed, {'DENIED': 1})
+
+
+class RetentionBatchTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        log_file = LogFile.objects.create(filename='a.log', filepath='/tmp/a.log', size_bytes=1)
+        self.analysis = LogAnalysis.objects.create(status='completed')
+        LogFinding.objects.bulk_create(
+            LogFinding(
+                analysis=self.analysis, log_file=log_file, line_number=i, content=f'linha {i}',
+                rule_name='R', severity='low', description='d',
+            )
+            for i in range(1, 131)
+        )
+
+    def test_batches_archive_then_delete_everything(self):
+        archive = RetentionArchive(self.tmp.name)
+        deleter = BatchDeleter(archive=archive, batch_size=50, max_seconds=3600)
+        queryset = LogFinding.objects.filter(analysis=self.analysis)
+        expected_ids = list(queryset.order_by('id').values_list('id', flat=True))
+        deleter.delete('findings', LogFinding, queryset, FINDING_FIELDS)
+        archive.close()
+        self.assertFalse(LogFinding.objects.exists())
+        self.assertEqual(deleter.deleted['findings'], 130)
+        # lotes cheios e rápidos dobram: 50 -> 100 (e o segundo lote, com 80, não dobra)
+        self.assertEqual(deleter.batch_size, 100)
+        [path] = archive.paths
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual([row['id'] for row in rows], expected_ids)
+        self.assertEqual(rows[0]['content'], 'linha 1')
+
+    def test_slow_batches_shrink_but_not_below_the_minimum(self):
+        deleter = BatchDeleter(batch_size=80, max_seconds=1e-9)
+        deleter.delete('findings', LogFinding, LogFinding.objects.all(), FINDING_FIELDS, archive=False)
+        self.assertFalse(LogFinding.objects.exists())
+        self.assertEqual(deleter.batch_size, 50)
+
+
+class FileCatalogTests(TestCase):
+    """Catálogo paginado só com metadados e GET condicional pelo estado do banco"""
+
+    URL = '/api/logs/files/'
+
+    def setUp(self):
+        self.files = [
+            LogFile.objects.create(
+                filename=f'app{i}.log', filepath=f'/logs/app{i}.log', content='x\n' * i,
+                size_bytes=2 * i, total_lines=i,
+            )
+            for i in range(1, 6)
+        ]
+
+    def test_pages_list_only_metadata(self):
+        response = self.client.get(self.URL, {'page': 2, 'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['total_files'], data['total_pages'], data['page']), (5, 3, 2))
+        self.assertTrue(data['has_next'] and data['has_previous'])
+        self.assertEqual(set(data['files'][0]), {'id', 'filename', 'size', 'uploaded_at', 'total_lines'})
+        self.assertIn('Last-Modified', response)
+
+    def _etag(self):
+        response = self.client.get(self.URL)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        return etag
+
+    def test_segment_growth_written_elsewhere_changes_the_etag(self):
+        etag = self._etag()
+        # como o syslog_listener faz em outro processo: update() direto no banco
+        LogFile.objects.filter(id=self.files[0].id).update(
+            size_bytes=1000, total_lines=500, updated_at=timezone.now()
+        )
+        response = self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        [entry] = [f for f in response.json()['files'] if f['id'] == self.files[0].id]
+        self.assertEqual((entry['size'], entry['total_lines']), (1000, 500))
+
+    def test_deletes_change_the_etag(self):
+        etag = self._etag()
+        with mock.patch('synapse_siem.app.logs.views.schedule_file_deletion') as schedule:
+            self.assertEqual(self.client.delete(f'{self.URL}{self.files[1].id}/').status_code, 202)
+        schedule.assert_called_once_with(self.files[1].id)
+        response = self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_files'], 4)
+        etag = response['ETag']
+        # exclusão definitiva (retenção, outro worker) de um arquivo já visível
+        LogFile.objects.filter(id=self.files[2].id).delete()
+        self.assertEqual(self.client.get(self.URL, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_if_modified_since_alone_does_not_hide_deletes(self):
+        last_modified = self.client.get(self.URL)['Last-Modified']
+        LogFile.objects.filter(id=self.files[-1].id).delete()
+        self.assertEqual(self.client.get(self.URL, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+
+
+class ResultCacheTests(SimpleTestCase):
+    """Resultados memorizados por conteúdo, ruleset e opções do parser"""
+
+    LOG = b'ok\npermission denied for bob\nok\nfailed password for root\n'
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache = ResultCache(os.path.join(self.tmp.name, 'results'))
+        self.path = _write(self.tmp.name, 'a.log', self.LOG)
+
+    def test_same_content_elsewhere_is_served_from_cache(self):
+        first = LogAnalyzer(cache=self.cache).analyze_files([self.path])
+        self.assertEqual(len(first), 2)
+        copy = _write(self.tmp.name, 'copia.log', self.LOG)
+        analyzer = LogAnalyzer(cache=self.cache)
+        second = analyzer.analyze_files([copy])
+        self.assertEqual(analyzer.cache_hits, 1)
+        self.assertEqual({f['source_file'] for f in second}, {copy})
+        self.assertEqual(
+            [{**f, 'source_file': None} for f in second], [{**f, 'source_file': None} for f in first]
+        )
+
+    def test_ruleset_and_options_are_part_of_the_key(self):
+        LogAnalyzer(cache=self.cache).analyze_files([self.path])
+        rules = rules_from_records([{"id": "OK", "description": "d", "regex": "^ok$"}])
+        analyzer = LogAnalyzer(rules=rules, cache=self.cache)
+        self.assertEqual(len(analyzer.analyze_files([self.path])), 2)
+        self.assertEqual(analyzer.cache_hits, 0)
+        analyzer = LogAnalyzer(cache=self.cache)
+        self.assertEqual(len(analyzer.analyze_files([self.path], max_lines=2)), 1)
+        self.assertEqual(analyzer.cache_hits, 0)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = ResultCache(os.path.join(self.tmp.name, 'lru'), max_bytes=3 * 84)
+        entry = [{'rule_id': 'R', 'raw_line': 'x' * 50}]  # 84 bytes em JSON
+        for key in ('aa1', 'bb2', 'cc3'):
+            cache.put(key, entry)
+        self.assertIsNotNone(cache.get('aa1'))  # aa1 passa a ser a mais recente
+        cache.put('dd4', entry)
+        self.assertIsNone(cache.get('bb2'))
+        self.assertEqual([cache.get(key) for key in ('aa1', 'cc3', 'dd4')], [entry] * 3)
+
+
+class DatabaseRulesetTests(TestCase):
+    """Ruleset do caminho web: compilado do banco e recompilado só quando a versão muda"""
+
+    def setUp(self):
+        _isolate_storage(self)
+        RuleModel.objects.all().delete()
+        self.rule = RuleModel.objects.create(
+            name='DENIED', pattern='denied', severity='high', description='d', sources='syslog,plaintext'
+        )
+
+    def _rule_ids(self, analyzer):
+        return [rule.id for rule in analyzer.active_rules]
+
+    def test_compiled_once_per_version_with_a_copy_per_run(self):
+        first = ruleset.get_analyzer()
+        compiled = ruleset._compiled[1]
+        second = ruleset.get_analyzer()
+        self.assertIs(ruleset._compiled[1], compiled)
+        self.assertIsNot(first, second)
+        self.assertEqual(self._rule_ids(first), ['DENIED'])
+        self.assertEqual(first.dispatch['apache'], [])
+        # quarentena e contadores de uma execução não vazam para as outras
+        first._quarantine({'DENIED': 'lenta'})
+        first.cache_hits = 7
+        self.assertEqual(self._rule_ids(ruleset.get_analyzer()), ['DENIED'])
+        self.assertEqual((compiled.quarantined, compiled.cache_hits), ({}, 0))
+
+    def test_edits_deactivation_and_deletes_change_the_version(self):
+        version = ruleset.current_version()
+        self.rule.pattern = 'negado'
+        self.rule.save()
+        self.assertNotEqual(ruleset.current_version(), version)
+        self.assertEqual(ruleset.get_analyzer().active_rules[0].pattern.pattern, 'negado')
+
+        self.rule.is_active = False
+        self.rule.save()
+        self.assertEqual(self._rule_ids(ruleset.get_analyzer()), [])
+
+        RuleModel.objects.create(name='OTHER', pattern='x', severity='low', description='d')
+        self.assertEqual(self._rule_ids(ruleset.get_analyzer()), ['OTHER'])
+        version = ruleset.current_version()
+        self.rule.delete()
+        self.assertNotEqual(ruleset.current_version(), version)
+
+    def test_suppressions_are_part_of_the_version(self):
+        self.assertIsNone(ruleset.get_analyzer().suppressions)
+        suppression = Suppression.objects.create(cidr='10.0.0.0/8')
+        analyzer = ruleset.get_analyzer()
+        self.assertEqual(len(analyzer.suppressions), 1)
+        findings = analyzer._apply_rules({'ip': '10.1.1.1', 'message': 'denied'}, 'a.log', 'syslog')
+        self.assertEqual((findings, analyzer.suppressed), ([], {'DENIED': 1}))
+        suppression.delete()
+        self.assertIsNone(ruleset.get_analyzer().suppressions)
+
+
+class SearchIndexTests(TestCase):
+    """Índice FTS5 das linhas importadas e a busca da API"""
+
+    CONTENT = 'login ok para ana\r\nfailed password for root\n\ncampo\vcom VT\nfailed-login "x" OR y\n'
+
+    def setUp(self):
+        _isolate_storage(self)
+        self.index = search.get_search_index()
+        self.log_file = LogFile.objects.create(
+            filename='auth.log', filepath='/logs/auth.log', content=self.CONTENT, size_bytes=len(self.CONTENT)
+        )
+        self.index.add_file(self.log_file.id, self.CONTENT)
+
+    def _hits(self, query, mode='term'):
+        return self.index.search(query, mode=mode)[1]
+
+    def test_line_numbers_match_the_analyzer(self):
+        fid = self.log_file.id
+        self.assertEqual(self._hits('failed password', 'phrase'), [(fid, 2, 'failed password for root')])
+        self.assertEqual(self._hits('login'), [(fid, 5, 'failed-login "x" OR y'), (fid, 1, 'login ok para ana')])
+        # \v não quebra linha (só \n, como no analisador)
+        self.assertEqual(self._hits('VT'), [(fid, 4, 'campo\vcom VT')])
+
+    def test_modes_and_query_syntax_is_not_exposed(self):
+        self.assertEqual([line for _, line, _ in self._hits('pass', 'prefix')], [2])
+        self.assertEqual(self._hits('pass'), [])
+        self.assertEqual([line for _, line, _ in self._hits('"x" OR')], [5])
+        with self.assertRaises(ValueError):
+            search.build_match('   ')
+
+    def test_reindexing_and_removal(self):
+        self.index.add_file(self.log_file.id, 'outra coisa\n')
+        self.assertEqual(self._hits('failed'), [])
+        self.index.remove_file(self.log_file.id)
+        self.assertEqual(self._hits('outra'), [])
+
+    def test_api_pages_hits_and_hides_pending_deletes(self):
+        response = self.client.get('/api/logs/search/', {'q': 'failed', 'page_size': 1})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual((data['total_hits'], data['total_pages']), (2, 2))
+        self.assertEqual(data['hits'][0]['filename'], 'auth.log')
+        self.assertEqual(self.client.get('/api/logs/search/', {'q': 'x', 'mode': 'regex'}).status_code, 400)
+        LogFile.objects.filter(id=self.log_file.id).update(pending_delete=True)
+        data = self.client.get('/api/logs/search/', {'q': 'failed'}).json()
+        self.assertEqual((data['total_hits'], data['hits']), (0, []))
+
+
+class SketchTests(SimpleTestCase):
+    """Top-K e contagem de distintos com memória fixa"""
+
+    def setUp(self):
+        rng = random.Random(34)
+        # 5 IPs pesados no meio de uma cauda longa de IPs vistos poucas vezes
+        self.stream = [f'10.0.0.{i}' for i in range(5) for _ in range(400)]
+        self.stream += [f'172.16.{rng.randrange(256)}.{rng.randrange(256)}' for _ in range(8000)]
+        rng.shuffle(self.stream)
+        self.truth = {}
+        for ip in self.stream:
+            self.truth[ip] = self.truth.get(ip, 0) + 1
+
+    def _check_bounds(self, sketch):
+        for item, count, error in sketch.top(len(sketch)):
+            self.assertLessEqual(count - error, self.truth[item])
+            self.assertGreaterEqual(count, self.truth[item])
+
+    def test_space_saving_keeps_heavy_hitters_with_error_bounds(self):
+        sketch = SpaceSaving(capacity=32)
+        for ip in self.stream:
+            sketch.add(ip)
+        self.assertEqual(len(sketch), 32)
+        self.assertEqual(sketch.total, len(self.stream))
+        self.assertEqual({item for item, _, _ in sketch.top(5)}, {f'10.0.0.{i}' for i in range(5)})
+        self._check_bounds(sketch)
+
+    def test_space_saving_merge_and_round_trip(self):
+        left, right = SpaceSaving(32), SpaceSaving(32)
+        half = len(self.stream) // 2
+        for ip in self.stream[:half]:
+            left.add(ip)
+        for ip in self.stream[half:]:
+            right.add(ip)
+        merged = SpaceSaving.from_dict(json.loads(json.dumps(left.to_dict()))).merge(right)
+        self.assertEqual(merged.total, len(self.stream))
+        self.assertEqual({item for item, _, _ in merged.top(5)}, {f'10.0.0.{i}' for i in range(5)})
+        self._check_bounds(merged)
+
+    def test_hyperloglog_estimate_merge_and_round_trip(self):
+        left, right = HyperLogLog(), HyperLogLog()
+        for i in range(30000):
+            (left if i % 2 else right).add(f'ip-{i}')
+            left.add(f'ip-{i % 100}')
+        self.assertAlmostEqual(right.count(), 15000, delta=15000 * 0.05)
+        merged = HyperLogLog.from_dict(left.to_dict()).merge(right)
+        self.assertAlmostEqual(merged.count(), 30000, delta=30000 * 0.05)
+        small = HyperLogLog()
+        for i in range(50):
+            small.add(i)
+            small.add(str(i))
+        self.assertAlmostEqual(small.count(), 50, delta=2)
+        with self.assertRaises(ValueError):
+            HyperLogLog(precision=10).merge(HyperLogLog())
+
+    def test_rule_sketches_summary(self):
+        sketches = RuleSketches(capacity=8)
+        for i in range(20):
+            sketches.add(f'10.0.0.{i % 4}', '/login', None, {'ip_country': 'BR' if i % 2 else 'US'})
+        other = RuleSketches.from_dict(json.loads(json.dumps(sketches.to_dict())))
+        summary = sketches.merge(other).summary(n=2)
+        self.assertEqual(summary['unique_ips'], 4)
+        self.assertEqual(summary['top_paths'], [{'value': '/login', 'count': 40, 'error': 0}])
+        self.assertEqual(summary['top_user_agents'], [])
+        self.assertEqual(
+            sorted((row['value'], row['count']) for row in summary['top_labels']['ip_country']),
+            [('BR', 20), ('US', 20)],
+        )
+
+
+class TimestampTests(SimpleTestCase):
+    """Normalização de datas para epoch UTC (com memo por minuto)"""
+
+    def setUp(self):
+        self.normalizer = TimestampNormalizer(default_year=2025)
+
+    def _epoch(self, *args, tz=datetime.timezone.utc):
+        return datetime.datetime(*args, tzinfo=tz).timestamp()
+
+    def test_formats(self):
+        minus7 = datetime.timezone(-datetime.timedelta(hours=7))
+        plus3 = datetime.timezone(datetime.timedelta(hours=3))
+        cases = [
+            ('10/Oct/2025:13:55:36 -0700', self._epoch(2025, 10, 10, 13, 55, 36, tz=minus7)),
+            ('[10/Oct/2025:13:55:36 +0000]', self._epoch(2025, 10, 10, 13, 55, 36)),
+            ('2025-10-10T13:55:36Z', self._epoch(2025, 10, 10, 13, 55, 36)),
+            ('2025-10-10T13:55:36.250+03:00', self._epoch(2025, 10, 10, 13, 55, 36, 250000, tz=plus3)),
+            ('2025-10-10 13:55:36,5', self._epoch(2025, 10, 10, 13, 55, 36, 500000)),
+            ('2025-10-10T13:55', self._epoch(2025, 10, 10, 13, 55)),
+            ('2025-10-10', self._epoch(2025, 10, 10)),
+            ('Oct  9 07:01:02', self._epoch(2025, 10, 9, 7, 1, 2)),
+            ('1760104536', 1760104536.0),
+            (1760104536123, 1760104536.123),
+            ('1760104536123456', 1760104536.123456),
+        ]
+        for value, expected in cases:
+            with self.subTest(value=value):
+                self.assertAlmostEqual(self.normalizer.parse(value), expected, places=3)
+        for value in ('', 'ontem', '2025-13-40T00:00Z', '10/Foo/2025:13:55:36 +0000',
+                      '2025-10-10T13:55:36+25', 0, -5, True, None, float('nan')):
+            with self.subTest(value=value):
+                self.assertIsNone(self.normalizer.parse(value))
+
+    def test_minute_memo_matches_datetime_across_seconds_and_zones(self):
+        rng = random.Random(35)
+        normalizer = TimestampNormalizer(default_year=2025, max_cache=8)
+        for _ in range(2000):
+            # poucos minutos distintos (acerta o memo) e muitos segundos/fusos
+            offset = rng.choice([-420, 0, 180, 330])
+            tz = datetime.timezone(datetime.timedelta(minutes=offset))
+            dt = datetime.datetime(2025, 10, 10, 13, rng.randrange(55, 58), rng.randrange(60), tzinfo=tz)
+            sign = '-' if offset < 0 else '+'
+            hours, minutes = divmod(abs(offset), 60)
+            apache = dt.strftime('%d/%b/%Y:%H:%M:%S ') + f'{sign}{hours:02d}{minutes:02d}'
+            self.assertEqual(normalizer.apache(apache), dt.timestamp())
+            self.assertEqual(normalizer.iso(dt.isoformat()), dt.timestamp())
+            utc = dt.astimezone(datetime.timezone.utc)
+            self.assertEqual(normalizer.syslog_bsd(utc.strftime('%b %d %H:%M:%S')), utc.timestamp())
+        self.assertLessEqual(len(normalizer._minutes), 8)
+
+    def test_normalize_by_source_type(self):
+        expected = self._epoch(2025, 10, 10, 13, 55, 36)
+        events = [
+            ('apache', {'time': '10/Oct/2025:13:55:36 +0000'}),
+            ('syslog', {'time': 'Oct 10 13:55:36'}),
+            ('syslog', {'time': '2025-10-10T13:55:36Z'}),
+            ('json', {'level': 'info', 'ts': 'ruim', '@timestamp': '2025-10-10T13:55:36Z'}),
+            ('jsonl', {'time': expected * 1000}),
+            ('csv', {'date': '2025-10-10 13:55:36'}),
+            ('plaintext', {'message': '2025-10-10 13:55:36 ERROR falha no disco'}),
+            ('plaintext', {'message': '[10/Oct/2025:13:55:36 +0000] GET /'}),
+            ('plaintext', {'message': 'Oct 10 13:55:36 host sshd: ok'}),
+        ]
+        for source_type, event in events:
+            with self.subTest(source_type=source_type, event=event):
+                self.assertAlmostEqual(self.normalizer.normalize(event, source_type), expected, places=3)
+        self.assertIsNone(self.normalizer.normalize({'message': 'sem data 2025-10-10'}, 'plaintext'))
+        self.assertIsNone(self.normalizer.normalize({'time': '2025-10-10'}, 'desconhecido'))
+
+    def test_buckets_and_iso(self):
+        epoch = self._epoch(2025, 10, 10, 13, 55, 36)
+        self.assertEqual(bucket_start(epoch), self._epoch(2025, 10, 10, 13, 55))
+        self.assertEqual(bucket_start(epoch, 'hour'), self._epoch(2025, 10, 10, 13))
+        self.assertEqual(to_iso(epoch), '2025-10-10T13:55:36+00:00')
+        self.assertIsNone(to_iso(None))
+
+
+class ShardedReportTests(SimpleTestCase):
+    """HTML fragmentado: índice leve + achados em shards por regra/página"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.findings = []
+        for i in range(23):
+            rule_id, severity = ('SQLI', 'high') if i % 3 else ('SCAN', 'low')
+            self.findings.append({
+                'rule_id': rule_id,
+                'severity': severity,
+                'description': rule_id,
+                'source_file': f'app{i % 2}.log',
+                'raw_line': f'linha {i} </script><b>',
+                'timestamp': f'2025-10-10T13:{i:02d}:00+00:00',
+                'event': {'client_ip': f'10.0.0.{i}', 'n': i},
+            })
+        self.writer = ReportWriter(self.tmp.name)
+
+    def _manifest(self, html):
+        match = re.search(r"<script type='application/json' id='manifest'>(.*?)</script>", html, re.S)
+        return json.loads(match.group(1))
+
+    def _shard(self, shard_dir, shard_id):
+        with open(os.path.join(shard_dir, f'{shard_id}.js'), encoding='ascii') as f:
+            match = re.fullmatch(r'window\.synapseShard\("([\w-]+)","([A-Za-z0-9+/=]+)"\);\n', f.read())
+        self.assertEqual(match.group(1), shard_id)
+        return json.loads(gzip.decompress(base64.b64decode(match.group(2))))
+
+    def test_shards_hold_every_finding_by_rule_and_page(self):
+        path = self.writer.write_html_sharded(self.findings, 'report.html', page_size=5)
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+        # o HTML do log nunca fecha o <script> do manifesto nem entra cru na página
+        self.assertNotIn('linha 1 </script>', html)
+        manifest = self._manifest(html)
+        self.assertEqual(manifest['dir'], 'report_shards')
+        self.assertEqual(manifest['files'], ['app0.log', 'app1.log'])
+        shard_dir = os.path.join(self.tmp.name, manifest['dir'])
+        expected = {'SQLI': 15, 'SCAN': 8}
+        for index, rule in enumerate(manifest['rules']):
+            self.assertEqual(rule['count'], expected[rule['rule_id']])
+            self.assertEqual(rule['pages'], -(-rule['count'] // 5))
+            rows = []
+            for page in range(rule['pages']):
+                chunk = self._shard(shard_dir, f'r{index}-p{page}')
+                self.assertLessEqual(len(chunk), 5)
+                rows.extend(chunk)
+            wanted = [f for f in self.findings if f['rule_id'] == rule['rule_id']]
+            self.assertEqual(
+                rows,
+                [[f['timestamp'], manifest['files'].index(f['source_file']), f['raw_line'], f['event']] for f in wanted],
+            )
+        self.assertEqual(len(os.listdir(shard_dir)), 3 + 2)
+
+    def test_rewrite_drops_stale_shards(self):
+        self.writer.write_html_sharded(self.findings, 'report.html', page_size=2)
+        shard_dir = os.path.join(self.tmp.name, 'report_shards')
+        self.assertEqual(len(os.listdir(shard_dir)), 8 + 4)
+        model = build_report_model(self.findings[:1])
+        self.writer.write_reports(self.findings[:1], {'html'}, model=model, html_mode='sharded')
+        self.assertEqual(os.listdir(os.path.join(self.tmp.name, 'synapse_report_shards')), ['r0-p0.js'])
+        self.writer.write_html_sharded(self.findings[:1], 'report.html', page_size=2)
+        self.assertEqual(os.listdir(shard_dir), ['r0-p0.js'])
+        self.assertEqual(
+            sorted(name for name in os.listdir(self.tmp.name) if name.endswith('.tmp')), [],
+        )
+
+
+class RunDirectoryTests(SimpleTestCase):
+    """Cada execução da CLI grava num diretório próprio, com escrita atômica"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_run_ids_are_unique_and_directories_exclusive(self):
+        ids = {new_run_id() for _ in range(200)}
+        self.assertEqual(len(ids), 200)
+        for run_id in ids:
+            self.assertRegex(run_id, r'^\d{8}-\d{6}-[0-9a-f]{8}$')
+        path = make_run_directory(self.tmp.name, 'nightly')
+        self.assertEqual(path, os.path.join(self.tmp.name, 'nightly'))
+        with self.assertRaises(FileExistsError):
+            make_run_directory(self.tmp.name, 'nightly')
+        for bad in ('..', '.', 'a/b', '../fora'):
+            with self.subTest(run_id=bad), self.assertRaises(ValueError):
+                make_run_directory(self.tmp.name, bad)
+        self.assertTrue(os.path.isdir(make_run_directory(self.tmp.name)))
+
+    def test_atomic_open_keeps_old_file_on_failure(self):
+        path = os.path.join(self.tmp.name, 'synapse_report.json')
+        with _atomic_open(path) as f:
+            f.write('antigo')
+        with self.assertRaises(RuntimeError):
+            with _atomic_open(path) as f:
+                f.write('parcial')
+                raise RuntimeError('falha no meio da escrita')
+        with open(path, encoding='utf-8') as f:
+            self.assertEqual(f.read(), 'antigo')
+        self.assertEqual(os.listdir(self.tmp.name), ['synapse_report.json'])
+
+    def test_write_reports_fills_run_directory(self):
+        run_dir = make_run_directory(self.tmp.name)
+        findings = [{'rule_id': 'SQLI', 'severity': 'high', 'source_file': 'a.log', 'raw_line': 'x', 'event': {}}]
+        paths = ReportWriter(run_dir).write_reports(findings, {'json', 'csv', 'md', 'txt', 'html'})
+        self.assertEqual(
+            sorted(os.listdir(run_dir)),
+            ['synapse_report.csv', 'synapse_report.html', 'synapse_report.json', 'synapse_report.md', 'synapse_report.txt'],
+        )
+        self.assertEqual(sorted(paths), sorted(os.path.join(run_dir, name) for name in os.listdir(run_dir)))
+        with open(os.path.join(run_dir, 'synapse_report.json'), encoding='utf-8') as f:
+            self.assertEqual(json.load(f), findings)
+
+
+class ContentAddressedImportTests(SimpleTestCase):
+    """Importação sem duplicar conteúdo, com manifesto no destino"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.src = os.path.join(tmp.name, 'src')
+        self.dst = os.path.join(tmp.name, 'dst')
+        self.a = _write(os.path.join(self.src, 'a'), 'app.log', b'mesmo conteudo\n' * 10)
+        self.b = _write(os.path.join(self.src, 'b'), 'app.log', b'mesmo conteudo\n' * 10)
+        self.c = _write(self.src, 'other.log', b'outro conteudo\n' * 10)
+        self.d = _write(self.src, 'small.log', b'pequeno\n')
+
+    def _objects(self):
+        return sorted(name for name in os.listdir(self.dst) if name != utils.IMPORT_MANIFEST)
+
+    def _import(self, paths, **options):
+        with mock.patch.object(utils, 'sha256_file', wraps=utils.sha256_file) as hashed:
+            result = utils.copy_logs_to_directory(paths, self.dst, mode='copy', **options)
+        return result, sorted(call.args[0] for call in hashed.call_args_list)
+
+    def test_identical_content_becomes_one_object(self):
+        result, hashed = self._import([self.a, self.b, self.c, self.d, self.a])
+        self.assertEqual(len(result), 3)
+        self.assertEqual(len(self._objects()), 3)
+        # só arquivos com tamanho repetido são lidos para hash
+        self.assertEqual(hashed, sorted([self.a, self.b, self.c]))
+        with open(result[0], 'rb') as f:
+            self.assertEqual(f.read(), b'mesmo conteudo\n' * 10)
+        self.assertEqual(utils.copy_logs_to_directory([self.b], self.dst, mode='copy'), result[:1])
+
+    def test_reimport_skips_unchanged_sources(self):
+        first, _ = self._import([self.a, self.c])
+        copy = _write(os.path.join(self.src, 'copia'), 'app.log', b'mesmo conteudo\n' * 10)
+        second, hashed = self._import([self.a, self.c, copy])
+        self.assertEqual(second, first)
+        # a e c são reconhecidos pelo manifesto; só a cópia nova (e o objeto de mesmo tamanho) é lida
+        self.assertNotIn(self.a, hashed)
+        self.assertIn(copy, hashed)
+        self.assertEqual(len(self._objects()), 2)
+        with open(self.c, 'ab') as f:
+            f.write(b'linha nova\n')
+        third, _ = self._import([self.c])
+        self.assertNotEqual(third, first[1:])
+        self.assertEqual(len(self._objects()), 3)
+
+    def test_failed_copy_falls_back_to_twin_source(self):
+        real = utils._materialize
+
+        def flaky(src, dst, mode):
+            if src == self.a:
+                raise OSError('origem ilegível')
+            return real(src, dst, mode)
+
+        with mock.patch.object(utils, '_materialize', side_effect=flaky):
+            result = utils.copy_logs_to_directory([self.a, self.b], self.dst, mode='copy')
+        self.assertEqual(len(result), 1)
+        with open(result[0], 'rb') as f:
+            self.assertEqual(f.read(), b'mesmo conteudo\n' * 10)
+        with open(os.path.join(self.dst, utils.IMPORT_MANIFEST), encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.assertNotIn(self.a, manifest['sources'])
+        self.assertIn(self.b, manifest['sources'])
+
+    def test_failed_copy_without_twin_is_skipped(self):
+        with mock.patch.object(utils, '_materialize', side_effect=OSError('disco cheio')):
+            self.assertEqual(utils.copy_logs_to_directory([self.c], self.dst, mode='copy'), [])
+        self.assertEqual(self._objects(), [])
+        self.assertEqual(len(utils.copy_logs_to_directory([self.c], self.dst, mode='copy')), 1)
+        with self.assertRaises(ValueError):
+            utils.copy_logs_to_directory([self.c], self.dst, mode='symlink')
+
+
+class LogDiscoveryTests(SimpleTestCase):
+    """Varredura com os.scandir: filtros, profundidade e symlinks"""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = os.path.join(tmp.name, 'logs')
+        self.outside = os.path.join(tmp.name, 'fora')
+        for directory, name in [
+            (self.root, 'app.log'), (self.root, 'APP2.LOG'), (self.root, 'notes.md'),
+            (os.path.join(self.root, 'nginx'), 'access.log'),
+            (os.path.join(self.root, 'nginx', 'old'), 'access.1.log'),
+            (os.path.join(self.root, 'archive'), 'antigo.log'),
+            (self.outside, 'remoto.jsonl'),
+        ]:
+            _write(directory, name, b'linha\n')
+        # symlink de arquivo entra sempre; o de diretório aponta para fora e cria um ciclo
+        os.symlink(os.path.join(self.outside, 'remoto.jsonl'), os.path.join(self.root, 'link.jsonl'))
+        os.symlink(self.outside, os.path.join(self.root, 'remoto'))
+        os.symlink(self.root, os.path.join(self.outside, 'volta'))
+
+    def _relative(self, paths):
+        return sorted(os.path.relpath(p, self.root).replace(os.sep, '/') for p in paths)
+
+    def test_default_extensions_ignore_case_and_skip_dir_symlinks(self):
+        self.assertEqual(
+            self._relative(utils.find_log_files([self.root])),
+            ['APP2.LOG', 'app.log', 'archive/antigo.log', 'link.jsonl', 'nginx/access.log', 'nginx/old/access.1.log'],
+        )
+
+    def test_include_exclude_and_depth(self):
+        self.assertEqual(
+            self._relative(utils.find_log_files([self.root], include=['access*'], exclude=['nginx/old'])),
+            ['nginx/access.log'],
+        )
+        self.assertEqual(
+            self._relative(utils.find_log_files([self.root], exclude=['archive', '*.jsonl'], max_depth=0)),
+            ['APP2.LOG', 'app.log'],
+        )
+        # arquivo passado diretamente ignora os filtros
+        notes = os.path.join(self.root, 'notes.md')
+        self.assertEqual(utils.find_log_files([notes], include=['*.log']), [notes])
+
+    def test_modified_since(self):
+        old = os.path.join(self.root, 'archive', 'antigo.log')
+        os.utime(old, (1_000_000, 1_000_000))
+        infos = utils.discover_log_files([self.root], modified_since=2_000_000)
+        self.assertNotIn(old, [info.path for info in infos])
+        self.assertTrue(all(info.size == 6 and info.mtime >= 2_000_000 for info in infos))
+
+    def test_follow_symlinks_visits_each_directory_once(self):
+        for workers in (1, 8):
+            with self.subTest(workers=workers):
+                found = utils.find_log_files([self.root, self.outside], follow_symlinks=True, workers=workers)
+                self.assertEqual(len(found), len(set(found)))
+                self.assertEqual(
+                    self._relative(found),
+                    ['../fora/remoto.jsonl', 'APP2.LOG', 'app.log', 'archive/antigo.log',
+                     'link.jsonl', 'nginx/access.log', 'nginx/old/access.1.log'],
+                )
+
+
+class _SlowAnalyzer:
+    """Achados com uma pausa longa no meio, como um trecho grande do arquivo sem achado"""
+
+    def __init__(self, pause):
+        self.pause = pause
+        self.closed = threading.Event()
+
+    def iter_findings(self, paths):
+        try:
+            yield {'rule_id': 'A', 'severity': 'low', 'raw_line': 'primeira', 'line_number': 1}
+            time.sleep(self.pause)
+            yield {'rule_id': 'B', 'severity': 'low', 'raw_line': 'segunda', 'line_number': 9}
+            raise RuntimeError('leitura falhou')
+        finally:
+            self.closed.set()
+
+
+class _RecordingChannel:
+    def __init__(self, cancel_after=None):
+        self.events = []
+        self.cancel_after = cancel_after
+
+    def emit(self, event, data):
+        if self.cancel_after is not None and len(self.events) >= self.cancel_after:
+            raise streaming.StreamCancelled()
+        self.events.append((time.monotonic(), event, data))
+
+
+class StreamingTests(TestCase):
+    """Achados gravados e enviados em lotes pequenos, com flush por tempo"""
+
+    def setUp(self):
+        self.log_file = LogFile.objects.create(
+            filename='app.log', filepath='/uploaded/app.log', content='x\n', size_bytes=2, total_lines=1
+        )
+        self.analysis = LogAnalysis.objects.create(total_files=1, status='running')
+
+    def test_pending_findings_flush_while_scan_is_quiet(self):
+        channel = _RecordingChannel()
+        by_severity = {}
+        started = time.monotonic()
+        with self.assertRaisesMessage(RuntimeError, 'leitura falhou'):
+            streaming._stream_file(channel, _SlowAnalyzer(1.0), self.log_file, self.analysis, by_severity)
+        [(first_at, event, first), (second_at, _, second)] = channel.events
+        self.assertEqual(event, 'finding')
+        self.assertEqual((first['rule_name'], second['rule_name']), ('A', 'B'))
+        # o primeiro sai pelo timer, sem esperar o segundo achado
+        self.assertLess(first_at - started, 0.75)
+        self.assertGreaterEqual(second_at - started, 1.0)
+        self.assertEqual(by_severity, {'low': 2})
+        self.assertEqual(LogFinding.objects.filter(analysis=self.analysis).count(), 2)
+
+    def test_cancel_stops_scanner(self):
+        analyzer = _SlowAnalyzer(0.3)
+        channel = _RecordingChannel(cancel_after=0)
+        with self.assertRaises(streaming.StreamCancelled):
+            streaming._stream_file(channel, analyzer, self.log_file, self.analysis, {})
+        self.assertTrue(analyzer.closed.wait(2))
+
+
+class StreamingEndpointTests(TransactionTestCase):
+    """POST /api/logs/stream/analyze/ de ponta a ponta (NDJSON)"""
+
+    def setUp(self):
+        _isolate_storage(self)
+        RuleModel.objects.all().delete()
+        RuleModel.objects.create(name='DENIED', pattern='denied', severity='high', description='negado')
+        content = 'ok\naccess denied for bob\nok\naccess denied for ana\n'
+        self.log_file = LogFile.objects.create(
+            filename='app.log', filepath='/uploaded/app.log', content=content, size_bytes=len(content), total_lines=4
+        )
+
+    async def _events(self, body):
+        response = await AsyncClient().post(
+            '/api/logs/stream/analyze/?format=ndjson', data=json.dumps(body), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 200)
+        chunks = [chunk async for chunk in response.streaming_content]
+        return [json.loads(line) for line in b''.join(chunks).decode('utf-8').splitlines()]
+
+    def test_ndjson_stream(self):
+        events = async_to_sync(self._events)({'file_ids': [self.log_file.id]})
+        self.assertEqual([e['event'] for e in events], ['analysis', 'finding', 'finding', 'file', 'done'])
+        self.assertEqual([e['line_number'] for e in events[1:3]], [2, 4])
+        done = events[-1]
+        self.assertEqual(done['summary']['by_severity'], {'high': 2})
+        analysis = LogAnalysis.objects.get(id=done['analysis_id'])
+        self.assertEqual((analysis.status, analysis.total_findings), ('completed', 2))
+
+
+class IngestBufferTests(TransactionTestCase):
+    """Buffer de ingestão: segmentos, fechamento e falhas de gravação (thread real)"""
+
+    KEY = ('firewall', 'plaintext')
+
+    def setUp(self):
+        _isolate_storage(self)
+        RuleModel.objects.all().delete()
+        RuleModel.objects.create(name='DENIED', pattern='denied', severity='high', description='negado')
+
+    def _buffer(self, **options):
+        settings = {'batch_lines': 2, 'flush_seconds': 0.05, 'max_lines': 100, 'segment_bytes': 10 ** 6}
+        buffer = ingest.IngestBuffer(**{**settings, **options})
+        self.addCleanup(buffer.shutdown, 5)
+        return buffer
+
+    def _wait(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline, 'ingestão não gravou a tempo')
+            time.sleep(0.01)
+
+    def _offer(self, buffer, lines):
+        self.assertTrue(buffer.offer(*self.KEY, [(line, None) for line in lines]))
+
+    def test_segment_text_is_written_once_at_close(self):
+        buffer = self._buffer()
+        lines = ['ok', 'access denied for bob', 'ok 2', 'access denied for ana', 'fim']
+        self._offer(buffer, lines[:2])
+        self._wait(lambda: buffer.persisted == 2)
+        self._offer(buffer, lines[2:])
+        self._wait(lambda: buffer.persisted == 5)
+        log_file = LogFile.objects.get()
+        # aberto: contadores, achados e busca já valem; o texto ainda não foi gravado
+        text = ''.join(line + '\n' for line in lines)
+        self.assertEqual((log_file.content, log_file.content_sha256), ('', ''))
+        self.assertEqual((log_file.total_lines, log_file.size_bytes), (5, len(text)))
+        self.assertEqual(
+            sorted(LogFinding.objects.values_list('line_number', flat=True)), [2, 4]
+        )
+        self.assertEqual(search.get_search_index().search('denied')[0], 2)
+        self.assertEqual(LogAnalysis.objects.get().status, 'running')
+        self.assertEqual(select_log_files([])[1], [])
+        buffer.shutdown(5)
+        log_file.refresh_from_db()
+        self.assertEqual(log_file.content, text)
+        self.assertEqual(log_file.content_sha256, hashlib.sha256(text.encode('utf-8')).hexdigest())
+        self.assertEqual(LogAnalysis.objects.get().status, 'completed')
+
+    def test_segment_rolls_over_by_size(self):
+        buffer = self._buffer(batch_lines=1, segment_bytes=10)
+        for count, line in enumerate(['access denied 1', 'access denied 2', 'ok'], 1):
+            self._offer(buffer, [line])
+            self._wait(lambda: buffer.persisted == count)
+        buffer.shutdown(5)
+        self.assertEqual(
+            list(LogFile.objects.order_by('id').values_list('content', flat=True)),
+            ['access denied 1\n', 'access denied 2\n', 'ok\n'],
+        )
+        self.assertEqual(set(LogAnalysis.objects.values_list('status', flat=True)), {'completed'})
+
+    def test_failed_batch_closes_segment_as_failed(self):
+        buffer = self._buffer()
+        self._offer(buffer, ['access denied 1', 'ok'])
+        self._wait(lambda: buffer.persisted == 2)
+        with mock.patch.object(LogFinding.objects, 'bulk_create', side_effect=RuntimeError('disco cheio')):
+            self._offer(buffer, ['access denied 2', 'ok'])
+            self._wait(lambda: buffer.failed == 2)
+        self.assertIn('disco cheio', buffer.stats()['last_error'])
+        first = LogFile.objects.get()
+        # o segmento fecha com o que foi gravado antes da falha
+        self.assertEqual(first.content, 'access denied 1\nok\n')
+        self.assertEqual(first.total_lines, 2)
+        self.assertEqual(LogAnalysis.objects.get().status, 'failed')
+        self._offer(buffer, ['access denied 3'])
+        self._wait(lambda: buffer.persisted == 3)
+        self.assertEqual(LogFile.objects.count(), 2)
+        self.assertEqual(buffer._buffered, 0)
+
+    def test_batch_larger_than_buffer_is_rejected(self):
+        buffer = self._buffer(max_lines=3)
+        with self.assertRaises(ingest.IngestTooLarge):
+            buffer.offer(*self.KEY, [('linha', None)] * 4)
+        self.assertEqual(buffer.stats()['rejected_lines'], 4)
+        with mock.patch.object(ingest, '_buffer', buffer):
+            response = self.client.post(
+                '/api/logs/ingest/?source=firewall&source_type=plaintext',
+                data='a\nb\nc\nd\n', content_type='text/plain',
+            )
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('divida o envio', response.json()['error'])
+        self.assertEqual(LogFile.objects.count(), 0)
+
+
+class AnalyzeCommandTests(TestCase):
+    """manage.py analyze: progresso só acrescentado, retomada e falhas dos workers"""
+
+    def setUp(self):
+        self.state_dir = os.path.join(_isolate_storage(self), 'analyze')
+        RuleModel.objects.all().delete()
+        RuleModel.objects.create(
+            name='DENIED', pattern='denied', severity='high', description='d', sources='syslog,plaintext'
+        )
+        self.files = [
+            LogFile.objects.create(
+                filename=f'app{i}.log', filepath=f'/uploaded/app{i}.log',
+                content='access denied\nok\n', size_bytes=17, total_lines=2,
+            )
+            for i in range(3)
+        ]
+
+    def _call(self, *args):
+        call_command('analyze', *args, '--workers', '1', stdout=io.StringIO(), stderr=io.StringIO())
+
+    def test_completes_and_removes_the_state(self):
+        self._call()
+        analysis = LogAnalysis.objects.get()
+        self.assertEqual((analysis.status, analysis.total_files, analysis.total_findings), ('completed', 3, 3))
+        self.assertEqual(os.listdir(self.state_dir), [])
+
+    def test_failed_file_is_resumed_from_the_progress_log(self):
+        real = analyze.store_file_findings
+
+        def flaky(analyzer, log_file, analysis):
+            if log_file.id == self.files[1].id:
+                raise RuntimeError('disco cheio')
+            return real(analyzer, log_file, analysis)
+
+        with mock.patch.object(analyze, 'store_file_findings', side_effect=flaky):
+            with self.assertRaisesMessage(CommandError, '--resume'):
+                self._call()
+        analysis = LogAnalysis.objects.get()
+        self.assertEqual(analysis.status, 'failed')
+        with open(os.path.join(self.state_dir, f'{analysis.id}.done'), encoding='utf-8') as f:
+            self.assertEqual([json.loads(line)[0] for line in f], [self.files[0].id, self.files[2].id])
+        with open(os.path.join(self.state_dir, f'{analysis.id}.done'), 'a', encoding='utf-8') as f:
+            f.write('[99, {"hi')  # linha cortada por uma interrupção
+
+        with mock.patch.object(analyze.Command, '_run', side_effect=KeyboardInterrupt):
+            with self.assertRaisesMessage(CommandError, '2/3 arquivos'):
+                self._call('--resume', str(analysis.id))
+        with open(os.path.join(self.state_dir, f'{analysis.id}.done'), encoding='utf-8') as f:
+            self.assertTrue(f.read().endswith(']\n'))
+
+        self._call('--resume', str(analysis.id))
+        analysis.refresh_from_db()
+        self.assertEqual((analysis.status, analysis.total_findings), ('completed', 3))
+        self.assertEqual(LogFinding.objects.filter(log_file=self.files[1]).count(), 1)
+
+    def test_broken_worker_pool_marks_the_analysis_failed(self):
+        def broken(command, analysis_id, file_ids, workers, discard_partial):
+            yield analyze.analyze_stored_file(analysis_id, file_ids[0], discard_partial)
+            raise analyze.BrokenExecutor('worker encerrado')
+
+        with mock.patch.object(analyze.Command, '_run', broken):
+            with self.assertRaisesMessage(CommandError, '1/3 arquivos'):
+                self._call()
+        self.assertEqual(LogAnalysis.objects.get().status, 'failed')
+
+    def test_only_files_without_lines_are_checked_for_content(self):
+        # total_lines=0 com texto (registro antigo) não é tratado como vazio
+        LogFile.objects.filter(id=self.files[0].id).update(total_lines=0)
+        LogFile.objects.create(filename='blank.log', filepath='/uploaded/blank.log', content=' \n', size_bytes=2)
+        self.assertEqual(select_log_files([])[2], ['blank.log'])
+        with self.assertRaisesMessage(CommandError, 'blank.log'):
+            self._call()
+        self.assertFalse(LogAnalysis.objects.exists())
@@ -0,0 +1,376 @@
+import codecs
+import hashlib
+import zlib
+
+from django.conf import settings
+from rest_framework import status
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopFutureHandlers
+
+try:
+    import zstandard
+except ImportError:  # dependência opcional: sem ela, uploads .zst são recusados
+    zstandard = None
+
+from synapse_siem.backend.encoding import sniff_bytes
+from .models import LogFile
+from .search import get_search_index
+
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".gzip": "gzip", ".zst": "zstd", ".zstd": "zstd"}
+CONTENT_ENCODINGS = {"gzip": "gzip", "x-gzip": "gzip", "zstd": "zstd"}
+
+# bytes descompactados acumulados antes de detectar o encoding
+SNIFF_BYTES = 4096
+
+# separadores de linha de str.splitlines()
+LINE_BREAKS = frozenset("\n\r\v\f\x1c\x1d\x1e\x85\u2028\u2029")
+
+
+# saída máxima de cada chamada ao descompressor: um pedaço pequeno e muito
+# compactado (bomba) nunca vira mais do que isso em memória de uma vez
+DECOMPRESS_CHUNK = 1024 * 1024
+
+
+class UploadError(Exception):
+    pass
+
+
+class DecompressedTooLarge(UploadError):
+    pass
+
+
+class _Decompressor:
+    """Conta os bytes descompactados e para assim que passam de `max_output`."""
+
+    def __init__(self, max_output=None):
+        self.max_output = max_output
+        self.total = 0
+
+    def _count(self, data: bytes) -> bytes:
+        self.total += len(data)
+        if self.max_output is not None and self.total > self.max_output:
+            raise DecompressedTooLarge(
+                f"arquivo excede o limite de {self.max_output // (1024 * 1024)} MiB descompactado"
+            )
+        return data
+
+
+class _Gunzip(_Decompressor):
+    """gzip em streaming, aceitando vários membros concatenados (ex.: `cat a.gz b.gz`)."""
+
+    def __init__(self, max_output=None):
+        super().__init__(max_output)
+        self._d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        self._fed = False
+
+    def decompress(self, data: bytes) -> bytes:
+        out = []
+        while data:
+            self._fed = True
+            out.append(self._count(self._d.decompress(data, DECOMPRESS_CHUNK)))
+            if not self._d.eof:
+                # o que não coube em DECOMPRESS_CHUNK fica em unconsumed_tail
+                data = self._d.unconsumed_tail
+                continue
+            data = self._d.unused_data
+            self._d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            self._fed = False
+        return b"".join(out)
+
+    def finish(self) -> bytes:
+        tail = self._count(self._d.flush())
+        if self._fed and not self._d.eof:
+            raise UploadError("arquivo gzip incompleto")
+        return tail
+
+
+class _CountingSink:
+    """Destino do stream_writer do zstd: recebe a saída em pedaços de `write_size`."""
+
+    def __init__(self, decompressor: "_Unzstd"):
+        self._decompressor = decompressor
+        self.parts = []
+
+    def write(self, data: bytes) -> int:
+        self.parts.append(self._decompressor._count(bytes(data)))
+        return len(data)
+
+
+class _Unzstd(_Decompressor):
+    def __init__(self, max_output=None):
+        if zstandard is None:
+            raise UploadError("Upload zstd requer o pacote zstandard (pip install zstandard)")
+        super().__init__(max_output)
+        # decompressobj devolve toda a saída de uma vez; o stream_writer a entrega em
+        # pedaços ao destino, que conta e interrompe antes de acumular demais
+        self._sink = _CountingSink(self)
+        self._d = zstandard.ZstdDecompressor().stream_writer(
+            self._sink, write_size=DECOMPRESS_CHUNK, closefd=False
+        )
+
+    def decompress(self, data: bytes) -> bytes:
+        self._d.write(data)
+        out = b"".join(self._sink.parts)
+        self._sink.parts = []
+        return out
+
+    def finish(self) -> bytes:
+        return b""
+
+
+DECOMPRESSORS = {"gzip": _Gunzip, "zstd": _Unzstd}
+
+
+class LineCounter:
+    """Conta linhas não vazias como `len([l for l in text.splitlines() if l.strip()])`, em pedaços."""
+
+    def __init__(self):
+        self.total = 0
+        self._carry = ""
+
+    def feed(self, text: str) -> None:
+        pieces = (self._carry + text).splitlines(True)
+        self._carry = pieces.pop() if pieces and pieces[-1][-1] not in LINE_BREAKS else ""
+        self.total += sum(1 for piece in pieces if piece.strip())
+
+    def finish(self) -> int:
+        if self._carry.strip():
+            self.total += 1
+        self._carry = ""
+        return self.total
+
+
+class ReceivedLog(UploadedFile):
+    """Arquivo já descompactado, decodificado, com hash e contagem de linhas feitos no recebimento."""
+
+    def __init__(self, name, content, size, sha256, total_lines, received_bytes, compression, encoding, error=None):
+        # o conteúdo fica só como texto (é o que vai para o banco); sem cópia em bytes
+        super().__init__(file=None, name=name, content_type="text/plain", size=size, charset="utf-8")
+        self.content = content
+        self.sha256 = sha256
+        self.total_lines = total_lines
+        self.received_bytes = received_bytes
+        self.compression = compression
+        self.source_encoding = encoding
+        self.error = error
+
+
+class LogUploadHandler(FileUploadHandler):
+    """
+    Processa cada arquivo enquanto ele chega: descompacta gzip/zstd em streaming
+    (pelo Content-Encoding de um corpo cru, pela extensão ou pelos bytes mágicos),
+    detecta o encoding, decodifica, calcula o SHA-256 do conteúdo e conta as linhas.
+    Nada do arquivo compactado fica em memória ou em disco.
+    """
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_bytes = getattr(settings, "SYNAPSE_UPLOAD_MAX_BYTES", 512 * 1024 * 1024)
+        header = (request.META.get("HTTP_CONTENT_ENCODING", "") if request is not None else "").strip().lower()
+        self.content_encoding = CONTENT_ENCODINGS.get(header)
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        name = self.file_name or "upload.log"
+        suffix = name[name.rfind("."):].lower() if "." in name else ""
+        self.compression = None
+        if self.field_name is None and self.content_encoding:
+            # corpo cru (FileUploadParser): o Content-Encoding vale para o arquivo
+            self.compression = self.content_encoding
+        elif suffix in COMPRESSION_SUFFIXES:
+            self.compression = COMPRESSION_SUFFIXES[suffix]
+            name = name[: -len(suffix)]
+        self.stored_name = name
+        self._decompressor = None
+        self._pending = b""
+        self._decoder = None
+        self._encoding = None
+        self._parts = []
+        self._size = 0
+        self._hash = hashlib.sha256()
+        self._lines = LineCounter()
+        self._error = None
+        raise StopFutureHandlers()
+
+    def _start(self, first: bytes) -> None:
+        if self.compression is None:
+            if first.startswith(GZIP_MAGIC):
+                self.compression = "gzip"
+            elif first.startswith(ZSTD_MAGIC):
+                self.compression = "zstd"
+        if self.compression:
+            self._decompressor = DECOMPRESSORS[self.compression](max_output=self.max_bytes)
+
+    def _decode(self, data: bytes, final: bool = False) -> None:
+        if self._decoder is None:
+            self._pending += data
+            if len(self._pending) < SNIFF_BYTES and not final:
+                return
+            data, self._pending = self._pending, b""
+            self._encoding = sniff_bytes(data)
+            # bytes inválidos viram U+FFFD: ficam visíveis em vez de sumirem do texto
+            self._decoder = codecs.getincrementaldecoder(self._encoding)(errors="replace")
+        text = self._decoder.decode(data, final)
+        if not text:
+            return
+        encoded = text.encode("utf-8")
+        self._size += len(encoded)
+        if self._size > self.max_bytes:
+            raise UploadError(f"arquivo excede o limite de {self.max_bytes // (1024 * 1024)} MiB descompactado")
+        self._hash.update(encoded)
+        self._lines.feed(text)
+        self._parts.append(text)
+
+    def receive_data_chunk(self, raw_data, start):
+        if self._error is not None:
+            return None
+        try:
+            if start == 0:
+                self._start(raw_data)
+            if self._decompressor is not None:
+                raw_data = self._decompressor.decompress(raw_data)
+            self._decode(raw_data)
+        except Exception as exc:  # zlib, zstandard (sem classe de erro comum) ou limite de tamanho
+            self._fail(exc)
+        return None
+
+    def _fail(self, exc: Exception) -> None:
+        self._error = f"Falha ao ler '{self.file_name}': {exc}"
+        # descarta o que já foi decodificado; o restante do arquivo é ignorado
+        self._parts = []
+
+    def file_complete(self, file_size):
+        if self._error is None:
+            try:
+                if self._decompressor is not None:
+                    self._decode(self._decompressor.finish())
+                self._decode(b"", final=True)
+            except Exception as exc:
+                self._fail(exc)
+        content = "".join(self._parts)
+        self._parts = []
+        return ReceivedLog(
+            name=self.stored_name,
+            content=content,
+            size=self._size,
+            sha256=self._hash.hexdigest(),
+            total_lines=self._lines.finish() if self._error is None else 0,
+            received_bytes=file_size,
+            compression=self.compression,
+            encoding=self._encoding,
+            error=self._error,
+        )
+
+
+def store_log_file(filename, content, sha256=None, total_lines=None, size_bytes=None, filepath=None):
+    """
+    Grava um arquivo de log (deduplicado pelo SHA-256 do conteúdo) e indexa as linhas
+    para a busca. Retorna (log_file, criado, avisos); se o conteúdo já existe, devolve
+    o registro existente sem gravar nada.
+    """
+    if sha256 is None or size_bytes is None:
+        data = content.encode("utf-8")
+        sha256 = hashlib.sha256(data).hexdigest()
+        size_bytes = len(data)
+    # um arquivo com exclusão em andamento não serve de original: o conteúdo é gravado de novo
+    existing = LogFile.objects.filter(content_sha256=sha256, pending_delete=False).only('id', 'filename').first()
+    if existing is not None:
+        return existing, False, []
+    if total_lines is None:
+        total_lines = len([line for line in content.splitlines() if line.strip()])
+    log_file = LogFile.objects.create(
+        filename=filename,
+        filepath=filepath or f"/uploaded/{filename}",  # Path virtual
+        content=content,
+        content_sha256=sha256,
+        size_bytes=size_bytes,
+        total_lines=total_lines,
+    )
+    warnings = []
+    # Indexa as linhas do novo arquivo para a busca textual
+    try:
+        get_search_index().add_file(log_file.id, content)
+    except Exception as e:
+        warnings.append(f"Arquivo '{filename}' não indexado para busca: {str(e)}")
+    return log_file, True, warnings
+
+
+def import_received_files(received):
+    """
+    Grava os arquivos recebidos pelo LogUploadHandler.
+    Retorna (criados, duplicados, erros, avisos) no formato das respostas de upload.
+    """
+    created, duplicates, errors, warnings = [], [], [], []
+    for uploaded_file in received:
+        if uploaded_file.error:
+            errors.append({"filename": uploaded_file.name, "error": uploaded_file.error})
+            continue
+        if not uploaded_file.content.strip():
+            errors.append({
+                "filename": uploaded_file.name,
+                "error": f"Arquivo '{uploaded_file.name}' está vazio ou não contém texto válido"
+            })
+            continue
+        log_file, is_new, file_warnings = store_log_file(
+            uploaded_file.name,
+            uploaded_file.content,
+            sha256=uploaded_file.sha256,
+            total_lines=uploaded_file.total_lines,
+            size_bytes=uploaded_file.size,
+        )
+        warnings.extend(file_warnings)
+        if not is_new:
+            duplicates.append({
+                "filename": uploaded_file.name,
+                "file_id": log_file.id,
+                "existing_filename": log_file.filename
+            })
+            continue
+        created.append({
+            "file_id": log_file.id,
+            "filename": log_file.filename,
+            "size": log_file.size_bytes,
+            "total_lines": log_file.total_lines,
+            "uploaded_at": log_file.analyzed_at.isoformat(),
+            "content_sha256": log_file.content_sha256,
+            "received_bytes": uploaded_file.received_bytes,
+            "compression": uploaded_file.compression,
+            "encoding": uploaded_file.source_encoding
+        })
+    return created, duplicates, errors, warnings
+
+
+def upload_response(received, created, duplicates, errors, warnings):
+    """(corpo, status HTTP) da resposta de upload"""
+    if len(received) == 1:
+        # um arquivo só: mantém o formato de resposta de sempre
+        if errors:
+            return {"error": errors[0]["error"]}, status.HTTP_400_BAD_REQUEST
+        if duplicates:
+            dup = duplicates[0]
+            return {
+                "error": f"Conteúdo de '{dup['filename']}' já foi importado anteriormente (arquivo {dup['file_id']}: {dup['existing_filename']})"
+            }, status.HTTP_400_BAD_REQUEST
+        response_data = {"message": "Arquivo importado com sucesso", **created[0]}
+        if warnings:
+            response_data["warnings"] = warnings
+        return response_data, status.HTTP_201_CREATED
+    
+    response_data = {
+        "message": f"{len(created)} de {len(received)} arquivo(s) importado(s)",
+        "files": created,
+        "duplicates": duplicates,
+        "errors": errors
+    }
+    if warnings:
+        response_data["warnings"] = warnings
+    if created:
+        return response_data, status.HTTP_201_CREATED
+    if duplicates:
+        return response_data, status.HTTP_200_OK
+    return response_data, status.HTTP_400_BAD_REQUEST
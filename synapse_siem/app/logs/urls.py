@@ -1,9 +1,19 @@
 from django.urls import path
-from .views import LogAnalysisView, LogUploadView, LogFileDeleteView, AnalysisHistoryView
+from .views import (
+    LogAnalysisView, LogUploadView, LogIngestView, LogFileCatalogView, LogFileDeleteView, LogSearchView,
+    FindingTimelineView, AnalysisHistoryView
+)
+from .streaming import stream_analysis, stream_upload
 
 urlpatterns = [
     path('', LogAnalysisView.as_view(), name='log-analysis'),
     path('upload/', LogUploadView.as_view(), name='log-upload'),
+    path('ingest/', LogIngestView.as_view(), name='log-ingest'),
+    path('files/', LogFileCatalogView.as_view(), name='log-file-catalog'),
     path('files/<int:file_id>/', LogFileDeleteView.as_view(), name='log-file-delete'),
+    path('search/', LogSearchView.as_view(), name='log-search'),
+    path('timeline/', FindingTimelineView.as_view(), name='finding-timeline'),
     path('history/', AnalysisHistoryView.as_view(), name='analysis-history'),
+    path('stream/analyze/', stream_analysis, name='log-stream-analysis'),
+    path('stream/upload/', stream_upload, name='log-stream-upload'),
 ]
@@ -1,30 +1,73 @@
-import os
-import json
-import subprocess
-import tempfile
+import datetime
+import hashlib
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FileUploadParser
 from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Count, Max, Q
+from django.db.models.functions import TruncHour, TruncMinute
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+from django.utils.http import http_date, quote_etag
+from .analysis import (
+    FINDING_BATCH_SIZE, finding_payload, finding_record, log_file_on_disk, select_log_files
+)
+from .ingest import (
+    DEFAULT_SOURCE, INGEST_SOURCE_TYPES, NDJSON_CONTENT_TYPES, SOURCE_NAME_REGEX,
+    IngestError, IngestTooLarge, get_ingest_buffer, ndjson_entries, read_ingest_body, text_entries
+)
 from .models import LogFile, LogAnalysis, LogFinding
+from .retention import schedule_file_deletion
+from .ruleset import get_analyzer
+from .search import SEARCH_MODES, get_search_index
+from .uploads import LogUploadHandler, import_received_files, upload_response
+
+
+# Colunas de metadados: nunca carregam o campo `content` (conteúdo completo do log)
+FILE_METADATA_FIELDS = ('id', 'filename', 'size_bytes', 'analyzed_at', 'total_lines')
+
+CATALOG_DEFAULT_PAGE_SIZE = 50
+CATALOG_MAX_PAGE_SIZE = 500
+
+SEARCH_DEFAULT_PAGE_SIZE = 50
+SEARCH_MAX_PAGE_SIZE = 500
+
+TIMELINE_INTERVALS = {'minute': TruncMinute, 'hour': TruncHour}
+
+
+def _file_metadata(log_file):
+    return {
+        "id": log_file.id,
+        "filename": log_file.filename,
+        "size": log_file.size_bytes,
+        "uploaded_at": log_file.analyzed_at.isoformat(),
+        "total_lines": log_file.total_lines
+    }
+
+
+def _int_param(request, name, default, minimum=1, maximum=None):
+    try:
+        value = int(request.query_params.get(name, default))
+    except (TypeError, ValueError):
+        value = default
+    value = max(value, minimum)
+    if maximum is not None:
+        value = min(value, maximum)
+    return value
 
 
 class LogAnalysisView(APIView):
     def get(self, request):
         """Lista arquivos importados disponíveis para análise"""
         try:
-            log_files = LogFile.objects.all().order_by('-analyzed_at')
-            files_data = []
-            
-            for log_file in log_files:
-                files_data.append({
-                    "id": log_file.id,
-                    "filename": log_file.filename,
-                    "size": log_file.size_bytes,
-                    "uploaded_at": log_file.analyzed_at.isoformat(),
-                    "total_lines": log_file.total_lines
-                })
+            log_files = (
+                LogFile.objects.filter(pending_delete=False)
+                .only(*FILE_METADATA_FIELDS).order_by('-analyzed_at')
+            )
+            files_data = [_file_metadata(log_file) for log_file in log_files]
             
             return Response({
                 "message": "Selecione arquivos e clique em 'Run Log Analysis'",
@@ -41,22 +84,13 @@ class LogAnalysisView(APIView):
     def post(self, request):
         """Executa análise nos arquivos selecionados"""
         try:
-            selected_ids = request.data.get('file_ids', [])
-            
-            if not selected_ids:
-                # Se nenhum ID específico, analisa todos os arquivos
-                log_files = LogFile.objects.all()
-            else:
-                log_files = LogFile.objects.filter(id__in=selected_ids)
-            
-            if not log_files.exists():
+            log_files, scanned_files, empty_files = select_log_files(request.data.get('file_ids', []))
+            if not scanned_files:
                 return Response(
                     {"error": "Nenhum arquivo disponível para análise"}, 
                     status=status.HTTP_404_NOT_FOUND
                 )
             
-            # Verifica se arquivos têm conteúdo
-            empty_files = [f.filename for f in log_files if not f.content.strip()]
             if empty_files:
                 return Response(
                     {"error": f"Arquivos sem conteúdo: {', '.join(empty_files)}. Faça novo upload."}, 
@@ -65,7 +99,7 @@ class LogAnalysisView(APIView):
             
             # Cria nova análise
             analysis = LogAnalysis.objects.create(
-                total_files=log_files.count(),
+                total_files=len(scanned_files),
                 status='running'
             )
             
@@ -73,10 +107,12 @@ class LogAnalysisView(APIView):
             total_findings = 0
             errors = []
             
-            # Para cada arquivo, analisa usando main.py real
-            for log_file in log_files:
+            # Para cada arquivo, analisa com o ruleset compilado
+            # (um registro por vez, para não manter todos os conteúdos em memória)
+            analyzer = get_analyzer()
+            for log_file in log_files.iterator(chunk_size=1):
                 try:
-                    findings = self.analyze_file(log_file, analysis)
+                    findings = self.analyze_file(log_file, analysis, analyzer)
                     all_findings.extend(findings)
                     total_findings += len(findings)
                 except Exception as e:
@@ -89,7 +125,7 @@ class LogAnalysisView(APIView):
             
             # Prepara resposta
             summary = {
-                "total_logs": log_files.count(),
+                "total_logs": len(scanned_files),
                 "total_findings": total_findings,
                 "by_severity": {}
             }
@@ -104,11 +140,13 @@ class LogAnalysisView(APIView):
                 "summary": summary,
                 "total_findings": total_findings,
                 "findings": all_findings,
-                "scanned_files": [{"id": f.id, "filename": f.filename} for f in log_files]
+                "scanned_files": scanned_files
             }
             
             if errors:
                 response_data["warnings"] = errors
+            if analyzer.quarantined:
+                response_data["quarantined_rules"] = analyzer.quarantined
             
             return Response(response_data, status=status.HTTP_200_OK)
             
@@ -118,207 +156,335 @@ class LogAnalysisView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
-    def analyze_file(self, log_file, analysis):
-        """Analisa um arquivo usando o main.py real"""
+    def analyze_file(self, log_file, analysis, analyzer):
+        """Analisa um arquivo com o ruleset do banco (compilado e cacheado no processo)"""
         try:
-            # Cria arquivo temporário com o conteúdo salvo
-            with tempfile.NamedTemporaryFile(mode='w', delete=False, suffix='.log', encoding='utf-8') as temp_file:
-                temp_file.write(log_file.content)
-                temp_path = temp_file.name
+            with log_file_on_disk(log_file) as temp_path:
+                raw_findings = analyzer.analyze_files([temp_path])
             
-            try:
-                backend_dir = os.path.join(settings.BASE_DIR, 'backend')
-                main_py = os.path.join(backend_dir, 'main.py')
-                
-                cmd = [
-                    'python', main_py,
-                    temp_path,
-                    '--formats', 'json',
-                    '--output-dir', '/tmp'
-                ]
-                
-                env = os.environ.copy()
-                env['PYTHONPATH'] = '/app'
-                
-                result = subprocess.run(cmd, capture_output=True, text=True, cwd=backend_dir, env=env)
-                
-                if result.returncode != 0:
-                    raise Exception(f"Análise falhou: {result.stderr}")
-                
-                # Lê relatório gerado
-                report_file = '/tmp/synapse_report.json'
-                findings = []
-                
-                if os.path.exists(report_file):
-                    with open(report_file, 'r', encoding='utf-8') as f:
-                        report_data = json.load(f)
-                        if isinstance(report_data, dict):
-                            raw_findings = report_data.get('findings', [])
-                        elif isinstance(report_data, list):
-                            raw_findings = report_data
-                        else:
-                            raw_findings = []
-                    
-                    # Salva findings no banco
-                    for finding_data in raw_findings:
-                        finding = LogFinding.objects.create(
-                            analysis=analysis,
-                            log_file=log_file,
-                            line_number=finding_data.get('line_number', 0),
-                            content=finding_data.get('raw_line', ''),
-                            rule_name=finding_data.get('rule_id', 'Unknown'),
-                            severity=finding_data.get('severity', 'low'),
-                            description=finding_data.get('description', ''),
-                            recommendation=finding_data.get('recommendation', '')
-                        )
-                        
-                        findings.append({
-                            "id": finding.id,
-                            "rule_name": finding.rule_name,
-                            "severity": finding.severity,
-                            "description": finding.description,
-                            "recommendation": finding.recommendation,
-                            "file": log_file.filename,
-                            "line_number": finding.line_number
-                        })
-                
-                return findings
-                
-            finally:
-                if os.path.exists(temp_path):
-                    os.unlink(temp_path)
+            # Salva findings no banco
+            records = LogFinding.objects.bulk_create(
+                [finding_record(finding_data, analysis, log_file) for finding_data in raw_findings],
+                batch_size=FINDING_BATCH_SIZE
+            )
+            return [finding_payload(finding, log_file.filename) for finding in records]
             
         except Exception as e:
             raise Exception(f"Erro analisando {log_file.filename}: {str(e)}")
-        """Simula análise baseada no conteúdo do arquivo (mock)"""
-        findings = []
-        
-        # Mock de findings baseado no nome do arquivo
-        if 'security' in log_file.filename.lower():
-            # Cria alguns findings de exemplo
-            mock_findings = [
-                {
-                    "rule_name": "FAILED_LOGIN",
-                    "severity": "medium",
-                    "description": "Tentativa de login falhada detectada",
-                    "recommendation": "Verificar origem do IP e implementar rate limiting"
-                },
-                {
-                    "rule_name": "SUSPICIOUS_ACTIVITY", 
-                    "severity": "high",
-                    "description": "Atividade suspeita detectada nos logs",
-                    "recommendation": "Investigar padrões de acesso anômalos"
-                }
-            ]
-            
-            for i, mock_finding in enumerate(mock_findings):
-                finding = LogFinding.objects.create(
-                    analysis=analysis,
-                    log_file=log_file,
-                    line_number=i + 1,
-                    content=f"Mock log line {i + 1}",
-                    rule_name=mock_finding["rule_name"],
-                    severity=mock_finding["severity"],
-                    description=mock_finding["description"],
-                    recommendation=mock_finding["recommendation"]
-                )
-                
-                findings.append({
-                    "id": finding.id,
-                    "rule_name": finding.rule_name,
-                    "severity": finding.severity,
-                    "description": finding.description,
-                    "recommendation": finding.recommendation,
-                    "file": log_file.filename,
-                    "line_number": finding.line_number
-                })
-        
-        return findings
 
 
 class LogUploadView(APIView):
     parser_classes = [MultiPartParser, FileUploadParser]
     
+    def initialize_request(self, request, *args, **kwargs):
+        # descompactação, hash e contagem de linhas acontecem enquanto o corpo chega
+        request.upload_handlers = [LogUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+    
     def post(self, request):
-        """Upload de arquivo de log (salva metadados no banco)"""
+        """
+        Upload de um ou vários arquivos de log (multipart, partes .gz/.zst aceitas) ou de
+        um corpo cru com Content-Encoding gzip/zstd. Arquivos com conteúdo já importado
+        são deduplicados pelo SHA-256.
+        """
         try:
-            if 'file' not in request.FILES:
+            if request.content_type.startswith('multipart/') and request.META.get('HTTP_CONTENT_ENCODING'):
+                return Response(
+                    {"error": "Content-Encoding não é suportado em multipart; envie cada arquivo compactado (.gz/.zst)"},
+                    status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+                )
+            
+            files = request.FILES
+            # corpo cru (FileUploadParser) chega como dict simples; multipart, como MultiValueDict
+            received = [
+                f for field in files
+                for f in (files.getlist(field) if hasattr(files, 'getlist') else [files[field]])
+            ]
+            if not received:
                 return Response(
                     {"error": "Nenhum arquivo enviado"}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            uploaded_file = request.FILES['file']
+            response_data, response_status = upload_response(received, *import_received_files(received))
+            return Response(response_data, status=response_status)
             
-            # Verifica se arquivo já existe
-            if LogFile.objects.filter(filename=uploaded_file.name).exists():
+        except Exception as e:
+            return Response(
+                {"error": f"Erro no upload: {str(e)}"}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class LogIngestView(APIView):
+    # o corpo é lido em pedaços pela própria view (sem parser do DRF)
+    parser_classes = []
+    
+    def get(self, request):
+        """Estado do buffer de ingestão deste processo"""
+        return Response(get_ingest_buffer().stats(), status=status.HTTP_200_OK)
+    
+    def post(self, request):
+        """
+        Recebe um lote de linhas (texto cru ou NDJSON) de um shipper. As linhas entram
+        no buffer e são analisadas em micro-lotes; com o buffer cheio, responde 429
+        com Retry-After.
+        """
+        try:
+            source = request.query_params.get('source') or request.headers.get('X-Synapse-Source') or DEFAULT_SOURCE
+            if not SOURCE_NAME_REGEX.match(source):
                 return Response(
-                    {"error": f"Arquivo '{uploaded_file.name}' já foi importado anteriormente"}, 
+                    {"error": "Origem inválida: use letras, números, '.', '_' ou '-' (até 100 caracteres)"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            
-            # Lê e salva conteúdo do arquivo
-            content = ""
-            total_lines = 0
-            try:
-                content = uploaded_file.read().decode('utf-8', errors='ignore')
-                if content.strip():  # Verifica se não está vazio
-                    total_lines = len([line for line in content.splitlines() if line.strip()])
-                else:
-                    return Response(
-                        {"error": f"Arquivo '{uploaded_file.name}' está vazio ou não contém texto válido"}, 
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-            except Exception as e:
+            source_type = request.query_params.get('source_type') or None
+            if source_type is not None and source_type not in INGEST_SOURCE_TYPES:
                 return Response(
-                    {"error": f"Erro ao ler arquivo: {str(e)}"}, 
+                    {"error": f"source_type inválido. Use: {', '.join(INGEST_SOURCE_TYPES)}"},
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Salva metadados e conteúdo no banco
-            log_file = LogFile.objects.create(
-                filename=uploaded_file.name,
-                filepath=f"/uploaded/{uploaded_file.name}",  # Path virtual
-                content=content,  # Salva o conteúdo
-                size_bytes=uploaded_file.size,
-                total_lines=total_lines
-            )
+            try:
+                text = read_ingest_body(request, settings.SYNAPSE_INGEST_MAX_REQUEST_BYTES)
+            except IngestTooLarge as e:
+                return Response({"error": str(e)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            except IngestError as e:
+                return Response({"error": str(e)}, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+            
+            rejected = 0
+            if request.content_type in NDJSON_CONTENT_TYPES or source_type == 'jsonl':
+                source_type = 'jsonl'
+                entries, rejected = ndjson_entries(text)
+            else:
+                source_type, entries = text_entries(text, source_type)
+            
+            buffer = get_ingest_buffer()
+            if not buffer.offer(source, source_type, entries):
+                retry_after = buffer.retry_after()
+                response = Response(
+                    {"error": "Buffer de ingestão cheio; reenvie o lote mais tarde", "retry_after": retry_after},
+                    status=status.HTTP_429_TOO_MANY_REQUESTS
+                )
+                response['Retry-After'] = str(retry_after)
+                return response
             
             return Response({
-                "message": "Arquivo importado com sucesso",
-                "file_id": log_file.id,
-                "filename": log_file.filename,
-                "size": log_file.size_bytes,
-                "total_lines": log_file.total_lines,
-                "uploaded_at": log_file.analyzed_at.isoformat()
-            }, status=status.HTTP_201_CREATED)
+                "source": source,
+                "source_type": source_type,
+                "accepted": len(entries),
+                "rejected": rejected
+            }, status=status.HTTP_202_ACCEPTED)
             
+        except IngestTooLarge as e:
+            return Response({"error": str(e)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        except IngestError as e:
+            return Response({"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         except Exception as e:
             return Response(
-                {"error": f"Erro no upload: {str(e)}"}, 
+                {"error": f"Erro na ingestão: {str(e)}"}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class LogFileCatalogView(APIView):
+    def get(self, request):
+        """Catálogo paginado de arquivos (somente metadados) com suporte a GET condicional"""
+        try:
+            page_number = _int_param(request, 'page', 1)
+            page_size = _int_param(
+                request, 'page_size', CATALOG_DEFAULT_PAGE_SIZE, maximum=CATALOG_MAX_PAGE_SIZE
+            )
+            
+            # Estado do catálogo lido do banco (vale entre processos): quantidade, maior id e
+            # última alteração; exclusões pendentes contam no updated_at e saem da contagem
+            visible = Q(pending_delete=False)
+            state = LogFile.objects.aggregate(
+                count=Count('id', filter=visible), last_id=Max('id', filter=visible),
+                last_modified=Max('updated_at')
+            )
+            last_modified = state['last_modified']
+            fingerprint = f"{state['count']}:{state['last_id']}:{last_modified}:{page_number}:{page_size}"
+            etag = quote_etag(hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()[:32])
+            last_modified_ts = int(last_modified.timestamp()) if last_modified else None
+            
+            # validação só pelo ETag: a exclusão definitiva de uma linha pode fazer o
+            # Max(updated_at) voltar no tempo, então If-Modified-Since sozinho não basta
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+            
+            queryset = (
+                LogFile.objects.filter(pending_delete=False)
+                .only(*FILE_METADATA_FIELDS).order_by('-analyzed_at', '-id')
+            )
+            paginator = Paginator(queryset, page_size)
+            page = paginator.get_page(page_number)
+            
+            response = Response({
+                "files": [_file_metadata(log_file) for log_file in page.object_list],
+                "total_files": paginator.count,
+                "page": page.number,
+                "page_size": page_size,
+                "total_pages": paginator.num_pages,
+                "has_next": page.has_next(),
+                "has_previous": page.has_previous()
+            }, status=status.HTTP_200_OK)
+            response['ETag'] = etag
+            if last_modified_ts is not None:
+                response['Last-Modified'] = http_date(last_modified_ts)
+            response['Cache-Control'] = 'no-cache'
+            return response
+            
+        except Exception as e:
+            return Response(
+                {"error": f"Erro ao listar catálogo: {str(e)}"}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
 
 class LogFileDeleteView(APIView):
     def delete(self, request, file_id):
-        """Exclui arquivo importado"""
+        """
+        Agenda a exclusão de um arquivo importado. O arquivo sai na hora do catálogo, da
+        busca e das análises; ele e seus achados são removidos em lotes em segundo plano.
+        """
         try:
-            log_file = LogFile.objects.get(id=file_id)
-            log_file.delete()
+            if not LogFile.objects.filter(id=file_id).exists():
+                return Response(
+                    {"error": "Arquivo não encontrado"}, 
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            if LogFile.objects.filter(id=file_id, pending_delete=False).update(
+                pending_delete=True, updated_at=timezone.now()
+            ):
+                schedule_file_deletion(file_id)
             
             return Response({
-                "message": "Arquivo excluído com sucesso"
+                "message": "Exclusão agendada",
+                "file_id": file_id,
+                "pending_delete": True
+            }, status=status.HTTP_202_ACCEPTED)
+            
+        except Exception as e:
+            return Response(
+                {"error": f"Erro ao excluir arquivo: {str(e)}"}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+class LogSearchView(APIView):
+    def get(self, request):
+        """Busca textual (termo, frase ou prefixo) nas linhas dos arquivos importados"""
+        try:
+            query = request.query_params.get('q', '').strip()
+            mode = request.query_params.get('mode', 'term')
+            if not query:
+                return Response(
+                    {"error": "Informe o parâmetro 'q'"}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if mode not in SEARCH_MODES:
+                return Response(
+                    {"error": f"Modo inválido: {mode}. Use: {', '.join(SEARCH_MODES)}"}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            page_number = _int_param(request, 'page', 1)
+            page_size = _int_param(
+                request, 'page_size', SEARCH_DEFAULT_PAGE_SIZE, maximum=SEARCH_MAX_PAGE_SIZE
+            )
+            
+            # arquivos com exclusão pendente ainda podem estar no índice
+            pending = LogFile.objects.filter(pending_delete=True).values_list('id', flat=True)
+            total, rows = get_search_index().search(
+                query, mode=mode, offset=(page_number - 1) * page_size, limit=page_size,
+                exclude_files=set(pending)
+            )
+            filenames = dict(
+                LogFile.objects.filter(id__in={file_id for file_id, _, _ in rows}, pending_delete=False)
+                .values_list('id', 'filename')
+            )
+            hits = [
+                {
+                    "file_id": file_id,
+                    "filename": filenames[file_id],
+                    "line_number": line_number,
+                    "line": line
+                }
+                for file_id, line_number, line in rows
+                if file_id in filenames
+            ]
+            
+            return Response({
+                "query": query,
+                "mode": mode,
+                "total_hits": total,
+                "page": page_number,
+                "page_size": page_size,
+                "total_pages": (total + page_size - 1) // page_size,
+                "hits": hits
             }, status=status.HTTP_200_OK)
             
-        except LogFile.DoesNotExist:
+        except Exception as e:
             return Response(
-                {"error": "Arquivo não encontrado"}, 
-                status=status.HTTP_404_NOT_FOUND
+                {"error": f"Erro na busca: {str(e)}"}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class FindingTimelineView(APIView):
+    def get(self, request):
+        """Histograma de achados por minuto/hora, com filtros de período, análise, severidade e regra"""
+        try:
+            interval = request.query_params.get('interval', 'hour')
+            if interval not in TIMELINE_INTERVALS:
+                return Response(
+                    {"error": f"Intervalo inválido: {interval}. Use: {', '.join(TIMELINE_INTERVALS)}"}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            findings = LogFinding.objects.filter(timestamp__isnull=False)
+            for name, lookup in (('start', 'timestamp__gte'), ('end', 'timestamp__lt')):
+                value = request.query_params.get(name)
+                if not value:
+                    continue
+                try:
+                    parsed = parse_datetime(value)
+                except ValueError:
+                    parsed = None
+                if parsed is None:
+                    return Response(
+                        {"error": f"Data inválida em '{name}': {value} (use ISO 8601)"}, 
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                if timezone.is_naive(parsed):
+                    parsed = timezone.make_aware(parsed, datetime.timezone.utc)
+                findings = findings.filter(**{lookup: parsed})
+            if request.query_params.get('analysis_id'):
+                findings = findings.filter(analysis_id=_int_param(request, 'analysis_id', 0))
+            if request.query_params.get('severity'):
+                findings = findings.filter(severity=request.query_params['severity'])
+            if request.query_params.get('rule'):
+                findings = findings.filter(rule_name=request.query_params['rule'])
+            
+            buckets = (
+                findings.annotate(bucket=TIMELINE_INTERVALS[interval]('timestamp'))
+                .values('bucket')
+                .annotate(count=Count('id'))
+                .order_by('bucket')
+            )
+            timeline = [
+                {"start": row['bucket'].isoformat(), "count": row['count']}
+                for row in buckets
+            ]
+            
+            return Response({
+                "interval": interval,
+                "total_findings": sum(row['count'] for row in timeline),
+                "buckets": timeline
+            }, status=status.HTTP_200_OK)
+            
         except Exception as e:
             return Response(
-                {"error": f"Erro ao excluir arquivo: {str(e)}"}, 
+                {"error": f"Erro ao montar linha do tempo: {str(e)}"}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
@@ -0,0 +1,178 @@
+from typing import Any, Dict, List, Optional
+
+try:
+    import numpy as np
+except ImportError:  # dependência opcional: só o estágio de analytics precisa dela
+    np = None
+
+from .columnar import ColumnarEvents
+from .timestamps import MINUTE, TimestampNormalizer, to_iso
+
+
+def _to_int(value: Any, default: int = -1) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _minute_iso(minute: int) -> str:
+    return to_iso(minute * MINUTE)
+
+
+def _merge(target: Dict, keys: List, values) -> None:
+    for key, value in zip(keys, values.tolist()):
+        if value:
+            target[key] = target.get(key, 0) + value
+
+
+class TrafficAnalytics:
+    """
+    Estatísticas de tráfego de access logs (Apache) calculadas de forma vetorizada.
+
+    Cada arquivo chega como `ColumnarEvents`: os códigos de dicionário viram
+    arrays NumPy e os agregados são feitos com bincount/unique. Só o que é
+    proporcional ao número de valores distintos (IPs, paths, minutos) passa por
+    Python, nunca o número de linhas. Os acumuladores são somáveis entre arquivos.
+    """
+
+    def __init__(self, top_n: int = 20, zscore_threshold: float = 3.0, min_path_requests: int = 10) -> None:
+        if np is None:
+            raise RuntimeError("O estágio de analytics requer NumPy (pip install numpy)")
+        self.top_n = top_n
+        self.zscore_threshold = zscore_threshold
+        self.min_path_requests = min_path_requests
+        self.total_requests = 0
+        self.status_counts: Dict[int, int] = {}
+        self.bytes_by_ip: Dict[str, int] = {}
+        self.requests_by_ip: Dict[str, int] = {}
+        self.requests_by_minute: Dict[int, int] = {}
+        self.path_requests: Dict[str, int] = {}
+        self.path_4xx: Dict[str, int] = {}
+        self.path_5xx: Dict[str, int] = {}
+        self.timestamps = TimestampNormalizer()
+
+    def _apache_minute(self, value: Any) -> int:
+        epoch = self.timestamps.apache(value) if isinstance(value, str) else None
+        return -1 if epoch is None else int(epoch) // MINUTE
+
+    @staticmethod
+    def _lookup(events: ColumnarEvents, name: str, convert) -> "np.ndarray":
+        """Aplica `convert` a cada valor distinto e expande para as linhas (-1 = ausente)."""
+        codes, dictionary = events.column(name)
+        codes = np.frombuffer(codes, dtype=np.intc) if len(codes) else np.zeros(0, dtype=np.intc)
+        lut = np.array([convert(v) for v in dictionary] + [-1], dtype=np.int64)
+        # código -1 (ausente) indexa o último elemento da tabela, que é -1
+        return lut[codes]
+
+    def add(self, events: ColumnarEvents) -> None:
+        if not len(events):
+            return
+        status = self._lookup(events, "status", _to_int)
+        size = self._lookup(events, "size", lambda v: _to_int(v, 0))
+        minutes = self._lookup(events, "time", self._apache_minute)
+        ip_codes, ip_dict = events.column("ip")
+        ip_codes = np.frombuffer(ip_codes, dtype=np.intc)
+        path_codes, path_dict = events.column("path")
+        path_codes = np.frombuffer(path_codes, dtype=np.intc)
+
+        self.total_requests += len(events)
+
+        valid_status = status[status >= 0]
+        if valid_status.size:
+            codes, counts = np.unique(valid_status, return_counts=True)
+            _merge(self.status_counts, codes.tolist(), counts)
+
+        has_ip = ip_codes >= 0
+        if has_ip.any():
+            ips = ip_codes[has_ip]
+            _merge(self.requests_by_ip, ip_dict, np.bincount(ips, minlength=len(ip_dict)))
+            byte_sums = np.bincount(ips, weights=np.maximum(size[has_ip], 0), minlength=len(ip_dict))
+            _merge(self.bytes_by_ip, ip_dict, byte_sums.astype(np.int64))
+
+        valid_minutes = minutes[minutes >= 0]
+        if valid_minutes.size:
+            buckets, counts = np.unique(valid_minutes, return_counts=True)
+            _merge(self.requests_by_minute, buckets.tolist(), counts)
+
+        has_path = path_codes >= 0
+        if has_path.any():
+            # agrupa paths sem a query string (ex.: /busca?q=1 e /busca?q=2)
+            normalized = [str(p).split("?", 1)[0] for p in path_dict]
+            norm_keys = sorted(set(normalized))
+            norm_index = {p: i for i, p in enumerate(norm_keys)}
+            remap = np.array([norm_index[p] for p in normalized], dtype=np.int64)
+            paths = remap[path_codes[has_path]]
+            path_status = status[has_path]
+            n = len(norm_keys)
+            _merge(self.path_requests, norm_keys, np.bincount(paths, minlength=n))
+            is_4xx = (path_status >= 400) & (path_status < 500)
+            is_5xx = path_status >= 500
+            _merge(self.path_4xx, norm_keys, np.bincount(paths[is_4xx], minlength=n))
+            _merge(self.path_5xx, norm_keys, np.bincount(paths[is_5xx], minlength=n))
+
+    def _minute_stats(self) -> Dict:
+        if not self.requests_by_minute:
+            return {"buckets": 0, "mean": 0.0, "std": 0.0, "peak": None, "anomalies": []}
+        minutes = np.fromiter(self.requests_by_minute.keys(), dtype=np.int64)
+        counts = np.fromiter(self.requests_by_minute.values(), dtype=np.int64)
+        start = int(minutes.min())
+        # série densa: minutos sem requisição contam como zero
+        series = np.zeros(int(minutes.max()) - start + 1, dtype=np.float64)
+        series[minutes - start] = counts
+        mean = float(series.mean())
+        std = float(series.std())
+        peak = int(series.argmax())
+        anomalies: List[Dict] = []
+        if std > 0:
+            zscores = (series - mean) / std
+            flagged = np.nonzero(zscores >= self.zscore_threshold)[0]
+            flagged = flagged[np.argsort(-zscores[flagged])][: self.top_n]
+            anomalies = [
+                {"minute": _minute_iso(start + int(i)), "requests": int(series[i]), "zscore": round(float(zscores[i]), 2)}
+                for i in flagged
+            ]
+        return {
+            "buckets": int(series.size),
+            "mean": round(mean, 3),
+            "std": round(std, 3),
+            "peak": {"minute": _minute_iso(start + peak), "requests": int(series[peak])},
+            "anomalies": anomalies,
+        }
+
+    def result(self) -> Optional[Dict]:
+        if not self.total_requests:
+            return None
+        classes: Dict[str, int] = {}
+        for code, count in self.status_counts.items():
+            key = f"{code // 100}xx"
+            classes[key] = classes.get(key, 0) + count
+
+        top_bytes = sorted(self.bytes_by_ip.items(), key=lambda kv: kv[1], reverse=True)[: self.top_n]
+
+        path_rows = []
+        for path, total in self.path_requests.items():
+            if total < self.min_path_requests:
+                continue
+            c4 = self.path_4xx.get(path, 0)
+            c5 = self.path_5xx.get(path, 0)
+            if c4 or c5:
+                path_rows.append({
+                    "path": path,
+                    "requests": total,
+                    "4xx": c4,
+                    "5xx": c5,
+                    "error_ratio": round((c4 + c5) / total, 4),
+                })
+        path_rows.sort(key=lambda r: (r["error_ratio"], r["requests"]), reverse=True)
+
+        return {
+            "total_requests": self.total_requests,
+            "status_distribution": {str(k): v for k, v in sorted(self.status_counts.items())},
+            "status_classes": dict(sorted(classes.items())),
+            "top_bytes_by_ip": [
+                {"ip": ip, "bytes": total, "requests": self.requests_by_ip.get(ip, 0)} for ip, total in top_bytes
+            ],
+            "requests_per_minute": self._minute_stats(),
+            "error_ratio_by_path": path_rows[: self.top_n],
+        }
@@ -1,26 +1,455 @@
 import os
+import re
+import copy
 import json
-from typing import Dict, Iterable, List
+import mmap
+import time
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Pattern, Tuple
 
-from .parsers import autodetect_and_parse
-from .rules import Rule, load_rules_from_json
+from .analytics import TrafficAnalytics
+from .cache import EventCache, ResultCache, make_cache_key
+from .columnar import ColumnarEvents
+from .encoding import AUTO, is_ascii_compatible, resolve_encoding
+from .enrichment import IpEnricher
+from .parsers import BYTE_BLOBS, LINE_PARSERS, NUMBERED_PARSERS, SOURCE_TYPES, detect_source_type, read_byte_lines
+from .regex_guard import RuleBudget, audit_rules, required_literals
+from .rules import Rule, bytes_pattern, load_rules_from_json, ruleset_fingerprint
+from .suppressions import EventAttributes, SuppressionSet
+from .timestamps import TimestampNormalizer, to_iso
+from .utils import sha256_file
+
+
+# versão do formato dos findings; entra na chave do cache de resultados
+FINDINGS_FORMAT = 4
+
+# text: decodifica e parseia toda linha; bytes: casa linhas ASCII sem decodificar;
+# mmap: em texto simples, busca cada regra no arquivo mapeado em memória
+SCAN_MODES = ("text", "bytes", "mmap")
+# tipos de origem em que o texto das regras é a própria linha (busca no buffer inteiro é válida)
+MMAP_SOURCE_TYPES = ("plaintext",)
+SCAN_WINDOW = 4 * 1024 * 1024
+NON_ASCII_BYTES = re.compile(rb"[\x80-\xff]")
+# construções que olham além do match: no buffer enxergariam o \n e as linhas
+# vizinhas, e por linha só o início/fim da string (\A, \Z, lookbehind,
+# lookahead negativo, fronteira de palavra)
+LINE_CONTEXT_TOKENS = ("\\A", "\\Z", "(?<", "(?!", "\\b", "\\B")
 
 
 class LogAnalyzer:
-    def __init__(self, rules_path: str, default_encoding: str = "utf-8") -> None:
-        self.rules: List[Rule] = load_rules_from_json(rules_path)
+    def __init__(
+        self,
+        rules_path: str = "",
+        default_encoding: str = AUTO,
+        cache: Optional[ResultCache] = None,
+        rules: Optional[List[Rule]] = None,
+        budget: Optional[RuleBudget] = None,
+        event_cache: Optional[EventCache] = None,
+        traffic: Optional[TrafficAnalytics] = None,
+        scan_mode: str = "mmap",
+        suppressions: Optional[SuppressionSet] = None,
+        enricher: Optional[IpEnricher] = None,
+    ) -> None:
+        # regras já compiladas (ex.: vindas do banco) dispensam o rules.json
+        self.rules: List[Rule] = rules if rules is not None else load_rules_from_json(rules_path)
         self.default_encoding = default_encoding
+        self.cache = cache
+        self.event_cache = event_cache
+        # estágio opcional de estatísticas de tráfego (access logs Apache)
+        self.traffic = traffic
+        self.budget = budget
+        if scan_mode not in SCAN_MODES:
+            raise ValueError(f"Modo de varredura inválido: {scan_mode} (use {', '.join(SCAN_MODES)})")
+        self.scan_mode = scan_mode
+        # achados suprimidos não chegam a ser montados; contados por regra
+        self.suppressions = suppressions if suppressions else None
+        self.suppressed: Dict[str, int] = {}
+        # rótulos do IP (ASN, país, zona...) anexados aos achados e usados no `where` das regras
+        self.enricher = enricher if enricher else None
+        # regras com formato exponencial ficam em quarentena desde o carregamento
+        self.active_rules, self.quarantined, self.rule_warnings = audit_rules(self.rules)
+        self.ruleset_hash = ruleset_fingerprint(self.active_rules)
+        self._build_dispatch()
+        self.cache_hits = 0
+        self.timestamps = TimestampNormalizer()
+
+    def _build_dispatch(self) -> None:
+        # tabela tipo de origem -> subconjunto de regras aplicáveis
+        self.dispatch: Dict[str, List[Rule]] = {
+            source_type: [r for r in self.active_rules if r.applies_to(source_type)]
+            for source_type in SOURCE_TYPES
+        }
+        self.text_dispatch: Dict[str, List[Tuple[Rule, Pattern]]] = {
+            source_type: [(r, r.pattern) for r in rules] for source_type, rules in self.dispatch.items()
+        }
+        # versão em bytes; None se alguma regra do tipo não for ASCII (arquivo vai pelo modo texto)
+        self.byte_dispatch: Dict[str, Optional[List[Tuple[Rule, Pattern]]]] = {}
+        for source_type in BYTE_BLOBS:
+            pairs = [(r, bytes_pattern(r)) for r in self.dispatch[source_type]]
+            self.byte_dispatch[source_type] = None if any(p is None for _r, p in pairs) else pairs
+        # (regra, regex da linha, regex multilinha para o buffer, pré-filtro literal).
+        # Com pré-filtro, toda linha com o literal é conferida sozinha; sem ele, uma
+        # regra que depende do contexto da linha leva o tipo de origem ao modo bytes
+        self.scan_dispatch: Dict[str, Optional[List[Tuple]]] = {}
+        for source_type in MMAP_SOURCE_TYPES:
+            pairs = self.byte_dispatch[source_type]
+            entries = None if pairs is None else []
+            for rule, pattern in pairs or ():
+                prefilter = required_literals(rule.pattern.pattern, rule.pattern.flags)
+                if prefilter is not None:
+                    literals, ignorecase = prefilter
+                    prefilter = (tuple(literal.encode("ascii") for literal in literals), ignorecase)
+                elif any(token in rule.pattern.pattern for token in LINE_CONTEXT_TOKENS):
+                    entries = None
+                    break
+                entries.append((rule, pattern, bytes_pattern(rule, multiline=True), prefilter))
+            self.scan_dispatch[source_type] = entries
+
+    def for_run(self) -> "LogAnalyzer":
+        """
+        Cópia para uma execução (ex.: uma requisição): compartilha regras compiladas e
+        tabelas de despacho, mas tem quarentena, orçamento e contadores próprios.
+        """
+        run = copy.copy(self)
+        run.quarantined = dict(self.quarantined)
+        run.suppressed = {}
+        run.cache_hits = 0
+        run.budget = self.budget.fresh() if self.budget is not None else None
+        run.timestamps = TimestampNormalizer()
+        return run
+
+    def _quarantine(self, slow: Dict[str, str]) -> None:
+        self.quarantined.update(slow)
+        self.active_rules = [r for r in self.active_rules if r.id not in slow]
+        self.ruleset_hash = ruleset_fingerprint(self.active_rules)
+        self._build_dispatch()
 
     def analyze_files(self, files: Iterable[str], max_lines: int = 0) -> List[Dict]:
-        all_findings: List[Dict] = []
+        return list(self.iter_findings(files, max_lines=max_lines))
+
+    def iter_findings(self, files: Iterable[str], max_lines: int = 0) -> Iterator[Dict]:
+        """Achados à medida que são encontrados (para quem consome em streaming)."""
         for path in files:
-            for event in autodetect_and_parse(path, max_lines=max_lines, encoding=self.default_encoding):
-                findings = self._apply_rules(event, source_file=path)
-                if findings:
-                    all_findings.extend(findings)
-        return all_findings
+            yield from self._iter_path(path, max_lines=max_lines)
+
+    def iter_event_findings(
+        self, events: Iterable[Tuple[int, Dict]], source_file: str, source_type: str
+    ) -> Iterator[Dict]:
+        """Achados de eventos já parseados em memória (ingestão), com o número da linha de cada um."""
+        if not self.dispatch[source_type]:
+            return
+        for line_number, event in events:
+            yield from self._apply_rules(event, source_file, source_type, line_number=line_number)
+
+    def _iter_path(self, path: str, max_lines: int = 0) -> Iterator[Dict]:
+        key = None
+        ruleset_hash = self.ruleset_hash
+        # "auto" vira o encoding detectado deste arquivo
+        encoding = resolve_encoding(path, self.default_encoding)
+        options = {"max_lines": max_lines, "encoding": encoding}
+        content_hash = None
+        if self.cache is not None or self.event_cache is not None:
+            content_hash = sha256_file(path)
+        source_type = detect_source_type(path, encoding=encoding)
+        # analytics de tráfego precisam dos eventos mesmo sem regras ou com resultado em cache
+        wants_traffic = self.traffic is not None and source_type == "apache"
+        # modo bytes: sem cache de eventos nem analytics, que precisam de todos os eventos
+        use_bytes = (
+            self.scan_mode != "text"
+            and self.event_cache is None
+            and not wants_traffic
+            and self.byte_dispatch.get(source_type) is not None
+            and is_ascii_compatible(encoding)
+        )
+        if self.cache is not None:
+            key_options = {**options, "findings_format": FINDINGS_FORMAT, "pipeline": "bytes" if use_bytes else "text"}
+            if self.suppressions is not None:
+                key_options["suppressions"] = self.suppressions.digest
+            if self.enricher is not None:
+                key_options["enrichment"] = self.enricher.digest
+            key = make_cache_key(content_hash, ruleset_hash, key_options)
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache_hits += 1
+                # o mesmo conteúdo pode ter vindo de outro caminho
+                for finding in cached:
+                    finding["source_file"] = path
+                if wants_traffic:
+                    deque(self._iter_events(path, source_type, options, content_hash), maxlen=0)
+                yield from cached
+                return
+        # nenhuma regra para este tipo de origem: nem precisa parsear
+        if use_bytes and self.dispatch[source_type]:
+            if self.scan_mode == "mmap" and not max_lines and self.scan_dispatch.get(source_type) is not None:
+                produced = self._scan_mmap(path, source_type, encoding)
+            else:
+                produced = self._scan_bytes(path, source_type, encoding, max_lines)
+        elif self.dispatch[source_type]:
+            produced = (
+                finding
+                for number, event in self._iter_events(path, source_type, options, content_hash)
+                for finding in self._apply_rules(event, path, source_type, line_number=number)
+            )
+        else:
+            if wants_traffic:
+                deque(self._iter_events(path, source_type, options, content_hash), maxlen=0)
+            produced = iter(())
+        findings: List[Dict] = []
+        for finding in produced:
+            findings.append(finding)
+            yield finding
+        # só chega aqui se o consumidor leu tudo; não guarda resultado parcial
+        # se alguma regra entrou em quarentena no meio do arquivo
+        if key is not None and ruleset_hash == self.ruleset_hash:
+            self.cache.put(key, findings)
+
+    def _iter_events(
+        self, path: str, source_type: str, options: Dict, content_hash: Optional[str]
+    ) -> Iterator[Tuple[Optional[int], Dict]]:
+        """Eventos do arquivo com o número da linha de cada um, como nos modos bytes e mmap."""
+        parser = NUMBERED_PARSERS[source_type]
+        wants_traffic = self.traffic is not None and source_type == "apache"
+        key = None
+        columns = None
+        if self.event_cache is not None and content_hash is not None:
+            key = EventCache.make_key(content_hash, source_type, options)
+            columns = self.event_cache.get(key)
+        if columns is not None:
+            # eventos já parseados: troca de regras não paga o parsing de novo
+            yield from columns.numbered()
+        elif key is None and not wants_traffic:
+            yield from parser(path, **options)
+            return
+        else:
+            columns = ColumnarEvents()
+            for number, event in parser(path, **options):
+                columns.append(event, number)
+                yield number, event
+            if key is not None:
+                self.event_cache.put(key, columns)
+        if wants_traffic:
+            self.traffic.add(columns)
+
+    def _scan_bytes(self, path: str, source_type: str, encoding: str, max_lines: int) -> Iterator[Dict]:
+        """
+        Aplica as regras direto nos bytes de cada linha. Só linhas com achado
+        (ou com bytes não ASCII, que seguem pelo caminho de texto) são decodificadas
+        e viram evento; as demais nunca saem de `bytes`.
+        """
+        blob_of = BYTE_BLOBS[source_type]
+        parse_line = LINE_PARSERS[source_type]
+        for number, line in enumerate(read_byte_lines(path, max_lines=max_lines, encoding=encoding), 1):
+            if not line.isascii():
+                event = parse_line(line.decode(encoding, errors="replace"))
+                if event is not None:
+                    yield from self._apply_rules(event, path, source_type, line_number=number)
+                continue
+            blob = blob_of(line)
+            if blob is None:
+                continue
+            # consultado a cada linha: uma quarentena no meio do arquivo troca a tabela
+            matched = self._match(blob, self.byte_dispatch[source_type])
+            if matched:
+                event = parse_line(line.decode("ascii"))
+                yield from self._build_findings(event, matched, path, source_type, number)
+
+    def _scan_mmap(self, path: str, source_type: str, encoding: str) -> Iterator[Dict]:
+        """
+        Busca cada regra no arquivo inteiro mapeado em memória, sem laço Python por linha.
+        Arquivo com CR segue pelo modo bytes linha a linha: o modo texto também quebra
+        linha em CR e a busca multilinha não.
+        """
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                if buf.find(b"\r") < 0:
+                    yield from self._scan_buffer(buf, path, source_type, encoding)
+                    return
+        yield from self._scan_bytes(path, source_type, encoding, 0)
 
-    def _apply_rules(self, event: Dict, source_file: str) -> List[Dict]:
+    def _scan_buffer(self, buf, path: str, source_type: str, encoding: str) -> Iterator[Dict]:
+        """
+        O buffer é percorrido em janelas que terminam em fim de linha. Em cada janela,
+        cada regra roda `search` a partir da última linha candidata: o início do match
+        dá a linha, que é conferida com a regex original só naquela linha, e a busca
+        continua na linha seguinte. O número da linha vem da contagem de quebras das
+        janelas anteriores mais as quebras até a linha candidata. Linhas com bytes
+        não ASCII vão pelo caminho de texto, como no modo bytes.
+        """
+        parse_line = LINE_PARSERS[source_type]
+        size = len(buf)
+        start = 0
+        line_base = 0
+        while start < size:
+            if start + SCAN_WINDOW >= size:
+                end = size
+            else:
+                end = buf.rfind(b"\n", start, start + SCAN_WINDOW) + 1
+                if end <= start:
+                    newline = buf.find(b"\n", start + SCAN_WINDOW)
+                    end = size if newline < 0 else newline + 1
+            # mmap não tem count(): a janela é copiada (uma cópia por janela, não por linha)
+            chunk = buf[start:end]
+            yield from self._scan_chunk(chunk, line_base, path, source_type, encoding, parse_line)
+            line_base += chunk.count(b"\n")
+            start = end
+
+    def _scan_chunk(
+        self, chunk: bytes, line_base: int, path: str, source_type: str, encoding: str, parse_line
+    ) -> List[Dict]:
+        end = len(chunk)
+        window_lines = chunk.count(b"\n") + (chunk[-1] != 10)
+
+        def bounds(offset: int) -> Tuple[int, int]:
+            line_end = chunk.find(b"\n", offset)
+            return chunk.rfind(b"\n", 0, offset) + 1, end if line_end < 0 else line_end
+
+        text_lines = set()
+        pos = 0
+        while True:
+            m = NON_ASCII_BYTES.search(chunk, pos)
+            if m is None:
+                break
+            line_start, line_end = bounds(m.start())
+            text_lines.add(line_start)
+            pos = line_end + 1
+
+        hits: Dict[int, List[Rule]] = {}
+        lowered = None
+        for rule, line_pattern, scan_pattern, prefilter in self.scan_dispatch[source_type]:
+            started = time.perf_counter()
+            candidates: Dict[int, int] = {}
+            if prefilter is not None:
+                # todo match contém um dos literais: bytes.find (em C) acha as linhas candidatas
+                literals, ignorecase = prefilter
+                if ignorecase and lowered is None:
+                    lowered = chunk.lower()
+                haystack = lowered if ignorecase else chunk
+                for literal in literals:
+                    offset = haystack.find(literal)
+                    while offset >= 0:
+                        line_start, line_end = bounds(offset)
+                        candidates[line_start] = line_end
+                        offset = haystack.find(literal, line_end + 1)
+            else:
+                pos = 0
+                while pos < end:
+                    m = scan_pattern.search(chunk, pos)
+                    if m is None:
+                        break
+                    offset = m.start()
+                    if offset >= end and chunk[-1] == 10:
+                        # match vazio depois da última quebra: não é uma linha
+                        break
+                    line_start, line_end = bounds(offset)
+                    candidates[line_start] = line_end
+                    pos = line_end + 1
+            for line_start, line_end in candidates.items():
+                if line_start not in text_lines and line_pattern.search(chunk[line_start:line_end]):
+                    hits.setdefault(line_start, []).append(rule)
+            if self.budget is not None:
+                self.budget.record_batch(rule.id, time.perf_counter() - started, window_lines)
+        if self.budget is not None:
+            slow = self.budget.over_budget()
+            if slow:
+                self._quarantine(slow)
+
+        findings: List[Dict] = []
+        number = line_base
+        previous = 0
+        for line_start in sorted(text_lines.union(hits)):
+            number += chunk.count(b"\n", previous, line_start)
+            previous = line_start
+            line = chunk[line_start:bounds(line_start)[1]]
+            if line_start in text_lines:
+                event = parse_line(line.decode(encoding, errors="replace"))
+                if event is not None:
+                    findings.extend(self._apply_rules(event, path, source_type, line_number=number + 1))
+            else:
+                event = parse_line(line.decode("ascii"))
+                findings.extend(self._build_findings(event, hits[line_start], path, source_type, number + 1))
+        return findings
+
+    def _match(self, blob, candidates: List[Tuple[Rule, Pattern]]) -> List[Rule]:
+        matched: List[Rule] = []
+        timed = self.budget is not None and self.budget.should_sample()
+        for rule, pattern in candidates:
+            if timed:
+                started = time.perf_counter()
+                found = pattern.search(blob)
+                self.budget.record(rule.id, time.perf_counter() - started)
+            else:
+                found = pattern.search(blob)
+            if found:
+                matched.append(rule)
+        if timed:
+            slow = self.budget.over_budget()
+            if slow:
+                self._quarantine(slow)
+        return matched
+
+    def _unsuppressed(self, attributes: EventAttributes, matched: List[Rule]) -> List[Rule]:
+        suppressions = self.suppressions
+        kept: List[Rule] = []
+        for rule in matched:
+            if suppressions.applies_to(rule.id):
+                if suppressions.suppresses(rule.id, attributes):
+                    self.suppressed[rule.id] = self.suppressed.get(rule.id, 0) + 1
+                    continue
+            kept.append(rule)
+        return kept
+
+    def _build_findings(
+        self, event: Dict, matched: List[Rule], source_file: str, source_type: str, line_number: Optional[int]
+    ) -> List[Dict]:
+        # IP/path/user agent extraídos sob demanda, uma vez por evento
+        attributes = EventAttributes(event)
+        if self.suppressions is not None:
+            matched = self._unsuppressed(attributes, matched)
+            if not matched:
+                return []
+        enrichment = None
+        if self.enricher is not None:
+            enrichment = self.enricher.labels(attributes)
+        if any(rule.where for rule in matched):
+            # sem enriquecimento, condições `where` nunca são satisfeitas
+            labels = enrichment or {}
+            matched = [rule for rule in matched if rule.accepts(labels)]
+            if not matched:
+                return []
+        if isinstance(event.get("message"), str):
+            raw_line = event.get("message")
+        else:
+            try:
+                raw_line = json.dumps(event, ensure_ascii=False)
+            except Exception:
+                raw_line = str(event)
+        # só eventos com achado pagam a normalização da data
+        timestamp = to_iso(self.timestamps.normalize(event, source_type))
+        findings = [
+            {
+                "rule_id": rule.id,
+                "description": rule.description,
+                "severity": rule.severity,
+                "recommendation": rule.recommendation,
+                "source_file": source_file,
+                "event": event,
+                "raw_line": raw_line,
+                "timestamp": timestamp,
+                # conhecido quando o arquivo é lido linha a linha pelo analisador
+                "line_number": line_number,
+            }
+            for rule in matched
+        ]
+        if enrichment is not None:
+            for finding in findings:
+                finding["enrichment"] = enrichment
+        return findings
+
+    def _apply_rules(
+        self, event: Dict, source_file: str, source_type: str = "plaintext", line_number: Optional[int] = None
+    ) -> List[Dict]:
         text_blob = " ".join(
             [
                 str(v)
@@ -28,30 +457,7 @@ class LogAnalyzer:
                 if isinstance(v, (str, int, float)) and v is not None
             ]
         )
-        results: List[Dict] = []
-        for rule in self.rules:
-            if rule.pattern.search(text_blob):
-                raw_line = None
-                if isinstance(event.get("message"), str):
-                    raw_line = event.get("message")
-                else:
-                    try:
-                        raw_line = json.dumps(event, ensure_ascii=False)
-                    except Exception:
-                        raw_line = str(event)
-                results.append(
-                    {
-                        "rule_id": rule.id,
-                        "description": rule.description,
-                        "severity": rule.severity,
-                        "recommendation": rule.recommendation,
-                        "source_file": source_file,
-                        "event": event,
-                        "raw_line": raw_line,
-                    }
-                )
-        return results
-
-
-
-
+        matched = self._match(text_blob, self.text_dispatch[source_type])
+        if not matched:
+            return []
+        return self._build_findings(event, matched, source_file, source_type, line_number)
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .columnar import ColumnarEvents
+
+
+RESULT_CACHE_SUFFIX = ".json"
+EVENT_CACHE_SUFFIX = ".cols"
+
+
+def make_cache_key(content_hash: str, ruleset_hash: str, options: Dict) -> str:
+    """Chave do cache: (hash do conteúdo, hash do conjunto de regras, opções do parser)."""
+    opts = json.dumps(options, sort_keys=True, ensure_ascii=False)
+    raw = f"{content_hash}:{ruleset_hash}:{opts}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class DiskLRU:
+    """
+    Diretório de entradas `directory/<chave[:2]>/<chave><sufixo>` com despejo LRU
+    limitado por tamanho.
+
+    A ordem de uso é mantida em memória (inicializada a partir do mtime dos
+    arquivos) e as escritas são atômicas, permitindo compartilhar o diretório
+    entre a CLI e o servidor web.
+    """
+
+    suffix = ""
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index: Optional["OrderedDict[str, int]"] = None
+        self._total_bytes = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + self.suffix)
+
+    def _load_index(self) -> "OrderedDict[str, int]":
+        if self._index is not None:
+            return self._index
+        entries: List[Tuple[float, str, int]] = []
+        for root, _dirs, filenames in os.walk(self.directory):
+            for name in filenames:
+                if not name.endswith(self.suffix):
+                    continue
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, name[: -len(self.suffix)], st.st_size))
+        entries.sort()
+        self._index = OrderedDict((key, size) for _mtime, key, size in entries)
+        self._total_bytes = sum(self._index.values())
+        return self._index
+
+    def _touch(self, key: str) -> None:
+        with self._lock:
+            index = self._load_index()
+            if key in index:
+                index.move_to_end(key)
+        try:
+            # mtime registra o último acesso para outros processos
+            os.utime(self._path_for(key), None)
+        except OSError:
+            pass
+
+    def _discard(self, key: str) -> None:
+        """Remove uma entrada corrompida (arquivo truncado, formato antigo...)."""
+        with self._lock:
+            index = self._load_index()
+            self._total_bytes -= index.pop(key, 0)
+        try:
+            os.unlink(self._path_for(key))
+        except OSError:
+            pass
+
+    def _record_write(self, key: str) -> None:
+        try:
+            size = os.path.getsize(self._path_for(key))
+        except OSError:
+            return
+        with self._lock:
+            index = self._load_index()
+            self._total_bytes += size - index.pop(key, 0)
+            index[key] = size
+            while self._total_bytes > self.max_bytes and index:
+                old_key, old_size = index.popitem(last=False)
+                self._total_bytes -= old_size
+                try:
+                    os.unlink(self._path_for(old_key))
+                except OSError:
+                    pass
+
+
+class ResultCache(DiskLRU):
+    """Cache em disco de resultados de análise (findings em JSON)."""
+
+    suffix = RESULT_CACHE_SUFFIX
+
+    def get(self, key: str) -> Optional[List[Dict]]:
+        try:
+            with open(self._path_for(key), "r", encoding="utf-8") as f:
+                findings = json.load(f)
+        except OSError:
+            return None
+        except ValueError:
+            self._discard(key)
+            return None
+        self._touch(key)
+        return findings
+
+    def put(self, key: str, findings: List[Dict]) -> None:
+        path = self._path_for(key)
+        data = json.dumps(findings, ensure_ascii=False).encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return
+        self._record_write(key)
+
+
+class EventCache(DiskLRU):
+    """
+    Cache em disco dos eventos já parseados, em formato colunar.
+
+    A chave é (hash do conteúdo, tipo de origem, opções do parser): trocar as
+    regras não invalida a entrada, então reanalisar dados antigos com um
+    ruleset novo pula o parsing.
+    """
+
+    suffix = EVENT_CACHE_SUFFIX
+
+    @staticmethod
+    def make_key(content_hash: str, source_type: str, options: Dict) -> str:
+        return make_cache_key(content_hash, source_type, options)
+
+    def get(self, key: str) -> Optional[ColumnarEvents]:
+        try:
+            events = ColumnarEvents.load(self._path_for(key))
+        except OSError:
+            return None
+        except (ValueError, KeyError, TypeError, IndexError, EOFError, struct.error):
+            # entrada truncada ou corrompida: vale como ausente e é refeita pelo put()
+            self._discard(key)
+            return None
+        self._touch(key)
+        return events
+
+    def put(self, key: str, events: ColumnarEvents) -> None:
+        try:
+            events.save(self._path_for(key))
+        except OSError:
+            return
+        self._record_write(key)
@@ -0,0 +1,145 @@
+import json
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Tuple
+
+
+COLUMNAR_MAGIC = b"SYNCOL2\n"
+CODE_TYPECODE = "i"
+MISSING = -1
+
+
+def _value_key(value: Any) -> Hashable:
+    # str é o caso comum; os demais levam o tipo para não colapsar 1, 1.0 e True
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return ("json", json.dumps(value, sort_keys=True, ensure_ascii=False))
+    return (type(value).__name__, value)
+
+
+class ColumnarEvents:
+    """
+    Eventos parseados guardados coluna a coluna.
+
+    Cada coluna é um `array('i')` de códigos para um dicionário de valores do
+    próprio arquivo (IPs, métodos, paths, status...), com -1 para campo ausente.
+    A ordem das chaves de cada evento é guardada como um "esquema" também
+    codificado, então os eventos reconstruídos são idênticos aos originais.
+    O número da linha de origem de cada evento fica em `line_numbers` (-1 = sem linha).
+    """
+
+    def __init__(self) -> None:
+        self.length = 0
+        self.schemas: List[Tuple[str, ...]] = []
+        self.schema_codes = array(CODE_TYPECODE)
+        self.line_numbers = array(CODE_TYPECODE)
+        self.columns: Dict[str, array] = {}
+        self.dictionaries: Dict[str, List[Any]] = {}
+        self._schema_lookup: Dict[Tuple[str, ...], int] = {}
+        self._lookups: Dict[str, Dict[Hashable, int]] = {}
+
+    def __len__(self) -> int:
+        return self.length
+
+    def append(self, event: Dict, line_number: Optional[int] = None) -> None:
+        keys = tuple(event.keys())
+        schema = self._schema_lookup.get(keys)
+        if schema is None:
+            schema = self._schema_lookup[keys] = len(self.schemas)
+            self.schemas.append(keys)
+        self.schema_codes.append(schema)
+        self.line_numbers.append(MISSING if line_number is None else line_number)
+        for name, value in event.items():
+            column = self.columns.get(name)
+            if column is None:
+                column = self.columns[name] = array(CODE_TYPECODE, [MISSING]) * self.length
+                self.dictionaries[name] = []
+                self._lookups[name] = {}
+            lookup = self._lookups[name]
+            key = _value_key(value)
+            code = lookup.get(key)
+            if code is None:
+                code = lookup[key] = len(self.dictionaries[name])
+                self.dictionaries[name].append(value)
+            column.append(code)
+        self.length += 1
+        if len(event) != len(self.columns):
+            for column in self.columns.values():
+                if len(column) < self.length:
+                    column.append(MISSING)
+
+    def column(self, name: str) -> Tuple[array, List[Any]]:
+        """Códigos e dicionário de uma coluna (códigos vazios se a coluna não existir)."""
+        if name not in self.columns:
+            return array(CODE_TYPECODE, [MISSING]) * self.length, []
+        return self.columns[name], self.dictionaries[name]
+
+    def __iter__(self) -> Iterator[Dict]:
+        columns = self.columns
+        dictionaries = self.dictionaries
+        schemas = self.schemas
+        for i, schema in enumerate(self.schema_codes):
+            yield {name: dictionaries[name][columns[name][i]] for name in schemas[schema]}
+
+    def numbered(self) -> Iterator[Tuple[Optional[int], Dict]]:
+        """Eventos com o número da linha de origem (None se o evento não tiver linha)."""
+        for number, event in zip(self.line_numbers, self):
+            yield (None if number == MISSING else number), event
+
+    def save(self, path: str) -> None:
+        names = list(self.columns)
+        header = {
+            "length": self.length,
+            "byteorder": sys.byteorder,
+            "typecode": CODE_TYPECODE,
+            "schemas": [list(s) for s in self.schemas],
+            "columns": [{"name": n, "dictionary": self.dictionaries[n]} for n in names],
+        }
+        header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(COLUMNAR_MAGIC)
+                f.write(struct.pack("<Q", len(header_bytes)))
+                f.write(header_bytes)
+                self.schema_codes.tofile(f)
+                self.line_numbers.tofile(f)
+                for name in names:
+                    self.columns[name].tofile(f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "ColumnarEvents":
+        with open(path, "rb") as f:
+            if f.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+                raise ValueError(f"arquivo colunar inválido: {path}")
+            (header_len,) = struct.unpack("<Q", f.read(8))
+            header = json.loads(f.read(header_len).decode("utf-8"))
+            swap = header["byteorder"] != sys.byteorder
+            length = header["length"]
+
+            def read_codes() -> array:
+                codes = array(header["typecode"])
+                codes.fromfile(f, length)
+                if swap:
+                    codes.byteswap()
+                return codes
+
+            events = cls()
+            events.length = length
+            events.schemas = [tuple(s) for s in header["schemas"]]
+            events.schema_codes = read_codes()
+            events.line_numbers = read_codes()
+            for col in header["columns"]:
+                events.columns[col["name"]] = read_codes()
+                events.dictionaries[col["name"]] = col["dictionary"]
+        return events
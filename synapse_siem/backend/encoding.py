@@ -0,0 +1,77 @@
+import codecs
+from typing import Optional
+
+
+AUTO = "auto"
+SNIFF_BYTES = 64 * 1024
+# sem BOM e sem UTF-8 válido: exportações Windows costumam ser cp1252
+LEGACY_FALLBACK = "cp1252"
+
+# encodings em que bytes < 0x80 são sempre o próprio caractere ASCII
+ASCII_COMPATIBLE = {"ascii", "utf-8", "utf-8-sig"}
+
+_BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32"),
+    (codecs.BOM_UTF32_BE, "utf-32"),
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def _utf16_without_bom(sample: bytes) -> Optional[str]:
+    """Texto UTF-16 sem BOM tem nulos concentrados numa das posições (par/ímpar)."""
+    if len(sample) < 4:
+        return None
+    even = sample[0::2]
+    odd = sample[1::2]
+    even_nulls = even.count(0) / len(even)
+    odd_nulls = odd.count(0) / len(odd)
+    if odd_nulls > 0.3 and even_nulls < 0.05:
+        return "utf-16-le"
+    if even_nulls > 0.3 and odd_nulls < 0.05:
+        return "utf-16-be"
+    return None
+
+
+def sniff_bytes(sample: bytes, fallback: str = LEGACY_FALLBACK) -> str:
+    for bom, name in _BOMS:
+        if sample.startswith(bom):
+            return name
+    utf16 = _utf16_without_bom(sample)
+    if utf16:
+        return utf16
+    if sample.isascii():
+        # só o início foi lido: UTF-8 (superconjunto do ASCII) decodifica certo
+        # um "é" que apareça depois da amostra
+        return "utf-8"
+    try:
+        # final=False: a amostra pode cortar um caractere multibyte no fim
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        return fallback
+
+
+def sniff_encoding(path: str, sample_size: int = SNIFF_BYTES, fallback: str = LEGACY_FALLBACK) -> str:
+    """
+    Detecta o encoding de um arquivo pelo início do conteúdo: BOM, padrão de
+    nulos do UTF-16 ou UTF-8 válido (ASCII puro incluído); senão `fallback`.
+    """
+    try:
+        with open(path, "rb") as f:
+            sample = f.read(sample_size)
+    except OSError:
+        return "utf-8"
+    return sniff_bytes(sample, fallback=fallback)
+
+
+def resolve_encoding(path: str, encoding: str) -> str:
+    """`auto` vira o encoding detectado para o arquivo; os demais valores passam direto."""
+    if encoding and encoding.lower() != AUTO:
+        return encoding
+    return sniff_encoding(path)
+
+
+def is_ascii_compatible(encoding: str) -> bool:
+    return codecs.lookup(encoding).name in ASCII_COMPATIBLE
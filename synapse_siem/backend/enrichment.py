@@ -0,0 +1,172 @@
+"""
+Enriquecimento local de IPs: ASN, país, zona interna etc. a partir de tabelas
+CSV de faixas de endereços, carregadas uma única vez.
+
+Cada tabela vira um índice de intervalos ordenados (busca binária) e o
+resultado por IP fica num cache LRU, já que os mesmos IPs se repetem o tempo
+todo. Nenhuma consulta a arquivo ou rede por evento.
+
+Formato do CSV (com cabeçalho): a faixa em `cidr` (ou `network`) ou em
+`start`/`end` (IPs), e o rótulo na coluna com o nome da tabela (ex.: `asn`)
+ou em `label`. Faixas sobrepostas: vale a mais específica.
+"""
+import bisect
+import csv
+import hashlib
+import ipaddress
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .suppressions import EventAttributes, ip_key
+from .utils import sha256_file
+
+# campo do achado = prefixo + nome da tabela (ip_asn, ip_country, ip_zone...)
+FIELD_PREFIX = "ip_"
+TABLE_NAME_REGEX = re.compile(r"^[a-z][a-z0-9_]{0,31}$")
+DEFAULT_CACHE_SIZE = 65536
+
+
+def _flatten(ranges: List[Tuple[int, int, str]]) -> Tuple[List[int], List[int], List[str]]:
+    """
+    Faixas possivelmente sobrepostas -> segmentos disjuntos ordenados, cada um com o
+    rótulo da faixa mais interna (varredura com pilha sobre as faixas ordenadas).
+    """
+    starts: List[int] = []
+    ends: List[int] = []
+    labels: List[str] = []
+
+    def emit(first: int, last: int, label: str) -> None:
+        if first > last:
+            return
+        if ends and ends[-1] + 1 == first and labels[-1] == label:
+            ends[-1] = last
+        else:
+            starts.append(first)
+            ends.append(last)
+            labels.append(label)
+
+    stack: List[Tuple[int, str]] = []  # (fim, rótulo)
+    pos = 0
+    for first, last, label in sorted(ranges, key=lambda r: (r[0], -r[1])):
+        while stack and stack[-1][0] < first:
+            end, outer = stack.pop()
+            if pos <= end:
+                emit(pos, end, outer)
+                pos = end + 1
+        if stack and pos < first:
+            emit(pos, first - 1, stack[-1][1])
+        stack.append((last, label))
+        pos = first
+    while stack:
+        end, outer = stack.pop()
+        if pos <= end:
+            emit(pos, end, outer)
+            pos = end + 1
+    return starts, ends, labels
+
+
+class RangeTable:
+    """Faixas de IP -> rótulo, um índice ordenado por versão de IP."""
+
+    def __init__(self, ranges: Iterable[Tuple[int, int, int, str]]):
+        by_version: Dict[int, List[Tuple[int, int, str]]] = {}
+        count = 0
+        for version, first, last, label in ranges:
+            by_version.setdefault(version, []).append((first, last, label))
+            count += 1
+        self.size = count
+        self._indexes = {version: _flatten(items) for version, items in by_version.items()}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def lookup(self, key: Tuple[int, int]) -> Optional[str]:
+        index = self._indexes.get(key[0])
+        if index is None:
+            return None
+        starts, ends, labels = index
+        i = bisect.bisect_right(starts, key[1]) - 1
+        if i >= 0 and key[1] <= ends[i]:
+            return labels[i]
+        return None
+
+
+def _parse_range(row: Dict[str, str]) -> Optional[Tuple[int, int, int]]:
+    network = row.get("cidr") or row.get("network")
+    if network:
+        net = ipaddress.ip_network(network.strip(), strict=False)
+        return net.version, int(net.network_address), int(net.broadcast_address)
+    first = ip_key(row.get("start") or "")
+    last = ip_key(row.get("end") or "")
+    if first is None or last is None or first[0] != last[0] or first[1] > last[1]:
+        return None
+    return first[0], first[1], last[1]
+
+
+def load_range_table(path: str, name: str) -> RangeTable:
+    """Lê a tabela CSV `name`; linhas com faixa inválida ou sem rótulo são ignoradas."""
+    with open(path, "r", encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        columns = {(c or "").strip().lower(): c for c in reader.fieldnames or ()}
+        if not ({"cidr", "network"} & set(columns) or {"start", "end"} <= set(columns)):
+            raise ValueError(f"{path}: informe a faixa em 'cidr'/'network' ou 'start'/'end'")
+        label_column = columns.get(name) or columns.get("label")
+        if label_column is None:
+            raise ValueError(f"{path}: coluna de rótulo '{name}' (ou 'label') ausente")
+
+        def ranges() -> Iterable[Tuple[int, int, int, str]]:
+            for raw in reader:
+                row = {key: (raw.get(column) or "") for key, column in columns.items()}
+                label = (raw.get(label_column) or "").strip()
+                if not label:
+                    continue
+                try:
+                    parsed = _parse_range(row)
+                except ValueError:
+                    continue
+                if parsed is not None:
+                    yield (*parsed, label)
+
+        return RangeTable(ranges())
+
+
+class IpEnricher:
+    """Rótulos de IP (um campo por tabela) com cache LRU na frente dos índices."""
+
+    def __init__(self, tables: Dict[str, RangeTable], digest: str = "", cache_size: int = DEFAULT_CACHE_SIZE):
+        self.tables = tables
+        self.digest = digest
+        self.fields = tuple(FIELD_PREFIX + name for name in tables)
+        self._items = tuple((FIELD_PREFIX + name, table) for name, table in tables.items())
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def __len__(self) -> int:
+        return len(self.tables)
+
+    def _lookup(self, key: Tuple[int, int]) -> Tuple[Tuple[str, str], ...]:
+        labels = []
+        for field, table in self._items:
+            label = table.lookup(key)
+            if label is not None:
+                labels.append((field, label))
+        return tuple(labels)
+
+    def labels(self, attributes: EventAttributes) -> Dict[str, str]:
+        """Rótulos do IP do evento ({} sem IP ou fora de todas as faixas)."""
+        key = attributes.ip
+        if key is None:
+            return {}
+        return dict(self.lookup(key))
+
+
+def load_enrichment_tables(tables: Dict[str, str], cache_size: int = DEFAULT_CACHE_SIZE) -> IpEnricher:
+    """Carrega {nome: caminho do CSV}; o digest muda se qualquer tabela mudar."""
+    loaded: Dict[str, RangeTable] = {}
+    h = hashlib.sha256()
+    for name, path in sorted(tables.items()):
+        if not TABLE_NAME_REGEX.match(name):
+            raise ValueError(f"nome de tabela inválido: {name!r} (use letras minúsculas, números e '_')")
+        loaded[name] = load_range_table(path, name)
+        h.update(f"{name}\0{sha256_file(path)}\n".encode("utf-8"))
+    return IpEnricher(loaded, digest=h.hexdigest(), cache_size=cache_size)
@@ -10,9 +10,15 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir
 if PROJECT_ROOT not in sys.path:
     sys.path.insert(0, PROJECT_ROOT)
 
+from synapse_siem.backend.analytics import TrafficAnalytics
 from synapse_siem.backend.analyzer import LogAnalyzer
-from synapse_siem.backend.report import ReportWriter
-from synapse_siem.backend.utils import find_log_files, copy_logs_to_directory
+from synapse_siem.backend.cache import EventCache, ResultCache
+from synapse_siem.backend.enrichment import DEFAULT_CACHE_SIZE, load_enrichment_tables
+from synapse_siem.backend.regex_guard import RuleBudget
+from synapse_siem.backend.report import ReportWriter, build_report_model, make_run_directory
+from synapse_siem.backend.suppressions import load_suppressions_from_json
+from synapse_siem.backend.timestamps import TimestampNormalizer
+from synapse_siem.backend.utils import discover_log_files, copy_logs_to_directory
 
 
 def parse_args() -> argparse.Namespace:
@@ -29,15 +35,50 @@ def parse_args() -> argparse.Namespace:
         default=os.path.join(os.path.dirname(__file__), "rules.json"),
         help="Caminho do arquivo de regras (JSON)",
     )
+    parser.add_argument(
+        "--suppressions",
+        default="",
+        help="Arquivo JSON de supressões (IP/CIDR e exceções de path/user agent por regra)",
+    )
+    parser.add_argument(
+        "--enrich",
+        action="append",
+        default=[],
+        metavar="NOME=CSV",
+        help="Tabela CSV de faixas de IP para enriquecer os achados (ex.: asn=asn.csv, country=geo.csv, "
+        "zone=zonas.csv); vira o campo ip_<nome>. Repetível",
+    )
+    parser.add_argument(
+        "--enrich-cache-size",
+        type=int,
+        default=DEFAULT_CACHE_SIZE,
+        help=f"IPs distintos mantidos no cache LRU do enriquecimento (padrão: {DEFAULT_CACHE_SIZE})",
+    )
     parser.add_argument(
         "--output-dir",
         default=os.path.join(os.path.dirname(__file__), "reports"),
-        help="Diretório de saída para os relatórios (padrão: backend/reports)",
+        help="Diretório base dos relatórios (padrão: backend/reports); cada execução grava em <dir>/<run-id>/",
+    )
+    parser.add_argument(
+        "--run-id",
+        default="",
+        help="Identificador da execução (subdiretório de saída); padrão: data/hora + sufixo aleatório",
     )
     parser.add_argument(
         "--formats",
         default="json,md,csv,txt",
-        help="Formatos de saída: json,md,csv,txt (separados por vírgula)",
+        help="Formatos de saída: json,md,csv,txt,html (separados por vírgula)",
+    )
+    parser.add_argument(
+        "--html-mode",
+        choices=["single", "sharded"],
+        default="single",
+        help="HTML em arquivo único ou fragmentado (índice + shards carregados sob demanda, para grandes volumes)",
+    )
+    parser.add_argument(
+        "--analytics",
+        action="store_true",
+        help="Calcula estatísticas de tráfego dos access logs (requer NumPy) e inclui nos relatórios",
     )
     parser.add_argument(
         "--max-lines",
@@ -47,14 +88,91 @@ def parse_args() -> argparse.Namespace:
     )
     parser.add_argument(
         "--encoding",
-        default="utf-8",
-        help="Encoding padrão para leitura dos arquivos de log",
+        default="auto",
+        help="Encoding dos arquivos de log ('auto' detecta por arquivo: BOM, UTF-16, UTF-8 ou cp1252)",
+    )
+    parser.add_argument(
+        "--scan-mode",
+        choices=["mmap", "bytes", "text"],
+        default="mmap",
+        help=(
+            "Varredura: mmap (texto simples buscado no arquivo mapeado em memória), "
+            "bytes (linhas ASCII casadas sem decodificar) ou text (decodifica todas as linhas)"
+        ),
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default="",
+        help="Diretório do cache de resultados (reaproveita análises de conteúdo idêntico)",
+    )
+    parser.add_argument(
+        "--cache-max-mb",
+        type=int,
+        default=256,
+        help="Tamanho máximo do cache de resultados em MB (despejo LRU)",
+    )
+    parser.add_argument(
+        "--event-cache-dir",
+        default="",
+        help="Diretório do cache colunar de eventos parseados (reanálise com regras novas pula o parsing)",
+    )
+    parser.add_argument(
+        "--event-cache-max-mb",
+        type=int,
+        default=1024,
+        help="Tamanho máximo do cache de eventos em MB (despejo LRU)",
+    )
+    parser.add_argument(
+        "--rule-budget-us",
+        type=float,
+        default=1000.0,
+        help="Orçamento médio de tempo por regra e evento em µs; regras lentas entram em quarentena (0 = desativado)",
+    )
+    parser.add_argument(
+        "--include",
+        action="append",
+        default=[],
+        help="Glob de arquivos a incluir ao varrer diretórios (repetível; padrão: extensões de log conhecidas)",
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        help="Glob de arquivos/diretórios a ignorar (repetível; diretórios excluídos não são varridos)",
+    )
+    parser.add_argument(
+        "--max-depth",
+        type=int,
+        default=None,
+        help="Profundidade máxima de varredura dos diretórios (0 = só o diretório informado)",
+    )
+    parser.add_argument(
+        "--modified-since",
+        default="",
+        help="Só considera arquivos modificados a partir desta data (ISO 8601, ex.: 2025-09-01T00:00:00)",
+    )
+    parser.add_argument(
+        "--follow-symlinks",
+        action="store_true",
+        help="Segue links simbólicos de diretórios (com proteção contra ciclos)",
+    )
+    parser.add_argument(
+        "--discovery-workers",
+        type=int,
+        default=8,
+        help="Diretórios varridos em paralelo na descoberta de arquivos",
     )
     parser.add_argument(
         "--import-to",
         default="",
         help="Diretório para importar (copiar) os logs antes da análise",
     )
+    parser.add_argument(
+        "--import-mode",
+        choices=["auto", "reflink", "copy"],
+        default="auto",
+        help="Como materializar arquivos importados: auto (reflink, hardlink ou cópia), reflink (ou cópia) ou copy",
+    )
     parser.add_argument(
         "--import-only",
         action="store_true",
@@ -115,7 +233,23 @@ def main() -> int:
             return 1
         inputs.append(path)
 
-    log_files = find_log_files(inputs)
+    modified_since = None
+    if args.modified_since:
+        modified_since = TimestampNormalizer().parse(args.modified_since)
+        if modified_since is None:
+            print(f"[ERRO] Data inválida em --modified-since: {args.modified_since}", file=sys.stderr)
+            return 1
+
+    discovered = discover_log_files(
+        inputs,
+        include=args.include,
+        exclude=args.exclude,
+        max_depth=args.max_depth,
+        modified_since=modified_since,
+        follow_symlinks=args.follow_symlinks,
+        workers=args.discovery_workers,
+    )
+    log_files = [info.path for info in discovered]
     if not log_files:
         print("[AVISO] Nenhum arquivo de log encontrado.")
         return 0
@@ -128,7 +262,7 @@ def main() -> int:
     # Importação de logs (GUI sempre importa; linha de comando importa quando --import-to)
     if args.import_to or args.gui:
         dest_dir = args.import_to or default_imports_dir
-        imported = copy_logs_to_directory(log_files, dest_dir)
+        imported = copy_logs_to_directory(log_files, dest_dir, mode=args.import_mode)
         print(json.dumps({
             "imported_count": len(imported),
             "destination": os.path.abspath(dest_dir),
@@ -140,32 +274,91 @@ def main() -> int:
         if imported:
             log_files = imported
 
-    analyzer = LogAnalyzer(rules_path=args.rules, default_encoding=args.encoding)
+    cache = None
+    if args.cache_dir:
+        cache = ResultCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024 * 1024)
+
+    event_cache = None
+    if args.event_cache_dir:
+        event_cache = EventCache(args.event_cache_dir, max_bytes=args.event_cache_max_mb * 1024 * 1024)
+
+    budget = RuleBudget(budget_us=args.rule_budget_us) if args.rule_budget_us > 0 else None
+
+    traffic = TrafficAnalytics() if args.analytics else None
+
+    suppressions = None
+    if args.suppressions:
+        try:
+            suppressions = load_suppressions_from_json(args.suppressions)
+        except (OSError, ValueError) as exc:
+            print(f"[ERRO] Supressões inválidas em {args.suppressions}: {exc}", file=sys.stderr)
+            return 1
+
+    enricher = None
+    if args.enrich:
+        tables = {}
+        for spec in args.enrich:
+            name, sep, path = spec.partition("=")
+            if not sep or not name.strip() or not path.strip():
+                print(f"[ERRO] --enrich espera NOME=CSV, recebido: {spec}", file=sys.stderr)
+                return 1
+            tables[name.strip()] = path.strip()
+        try:
+            enricher = load_enrichment_tables(tables, cache_size=args.enrich_cache_size)
+        except (OSError, ValueError) as exc:
+            print(f"[ERRO] Tabela de enriquecimento inválida: {exc}", file=sys.stderr)
+            return 1
+
+    analyzer = LogAnalyzer(
+        rules_path=args.rules,
+        default_encoding=args.encoding,
+        cache=cache,
+        budget=budget,
+        event_cache=event_cache,
+        traffic=traffic,
+        scan_mode=args.scan_mode,
+        suppressions=suppressions,
+        enricher=enricher,
+    )
     findings = analyzer.analyze_files(log_files, max_lines=args.max_lines)
+    traffic_stats = traffic.result() if traffic is not None else None
 
     # Saídas
     formats = {fmt.strip().lower() for fmt in args.formats.split(",") if fmt.strip()}
-    writer = ReportWriter(output_dir=args.output_dir)
-
-    base_name = "synapse_report"
-    if "json" in formats:
-        writer.write_json(findings, f"{base_name}.json")
-    if "csv" in formats:
-        writer.write_csv(findings, f"{base_name}.csv")
-    if "md" in formats or "markdown" in formats:
-        writer.write_markdown(findings, f"{base_name}.md")
-    if "txt" in formats:
-        writer.write_txt_simple(findings, f"{base_name}.txt")
+    # diretório exclusivo por execução: execuções simultâneas não sobrescrevem umas às outras
+    try:
+        run_dir = make_run_directory(args.output_dir, args.run_id or None)
+    except FileExistsError:
+        print(f"[ERRO] Já existe uma execução com o id '{args.run_id}' em {args.output_dir}", file=sys.stderr)
+        return 1
+    except ValueError as exc:
+        print(f"[ERRO] {exc}", file=sys.stderr)
+        return 1
+    writer = ReportWriter(output_dir=run_dir)
+
+    model = build_report_model(findings)
+    report_paths = writer.write_reports(
+        findings, formats, base_name="synapse_report", traffic=traffic_stats, model=model, html_mode=args.html_mode
+    )
 
     # Resumo no stdout
     summary = {
+        "run_dir": os.path.abspath(run_dir),
+        "reports": report_paths,
         "total_logs": len(log_files),
-        "total_findings": len(findings),
-        "by_severity": {},
+        "total_findings": model.total,
+        "by_severity": {sev: count for sev, count in model.by_severity.items() if count},
+        "by_rule": {
+            rule_id: {"occurrences": stats["occurrences"], "unique_ips": stats["unique_ips"]}
+            for rule_id, stats in model.rule_stats().items()
+        },
     }
-    for f in findings:
-        sev = f.get("severity", "desconhecido")
-        summary["by_severity"][sev] = summary["by_severity"].get(sev, 0) + 1
+    if analyzer.suppressed:
+        summary["suppressed"] = analyzer.suppressed
+    if analyzer.quarantined:
+        summary["quarantined_rules"] = analyzer.quarantined
+    if analyzer.rule_warnings:
+        summary["rule_warnings"] = analyzer.rule_warnings
     print(json.dumps(summary, ensure_ascii=False, indent=2))
 
     return 0
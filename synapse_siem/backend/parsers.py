@@ -1,13 +1,45 @@
+import codecs
 import csv
 import json
 import re
-from typing import Dict, Iterable, Iterator, Optional
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
 
 
 APACHE_COMBINED_REGEX = re.compile(
     r"^(?P<ip>\S+) \S+ \S+ \[(?P<time>[^\]]+)\] \"(?P<method>\S+) (?P<path>\S+) \S+\" (?P<status>\d{3}) (?P<size>\S+)( \"(?P<ref>[^\"]*)\" \"(?P<ua>[^\"]*)\")?"
 )
 
+# RFC 3164 (BSD) e RFC 5424
+SYSLOG_BSD_REGEX = re.compile(
+    r"^(?:<(?P<pri>\d{1,3})>)?(?P<time>[A-Z][a-z]{2} [ \d]\d \d{2}:\d{2}:\d{2}) (?P<host>\S+) (?P<app>[^:\[\s]+)(?:\[(?P<pid>\d+)\])?: ?(?P<message>.*)$"
+)
+SYSLOG_5424_REGEX = re.compile(
+    r"^<(?P<pri>\d{1,3})>1 (?P<time>\S+) (?P<host>\S+) (?P<app>\S+) (?P<pid>\S+) (?P<msgid>\S+) (?P<sd>-|(?:\[.*?\])+) ?(?P<message>.*)$"
+)
+
+# mesmas expressões para o modo bytes (linhas ASCII casadas sem decodificar)
+APACHE_COMBINED_BYTES = re.compile(APACHE_COMBINED_REGEX.pattern.encode("ascii"))
+SYSLOG_BSD_BYTES = re.compile(SYSLOG_BSD_REGEX.pattern.encode("ascii"))
+SYSLOG_5424_BYTES = re.compile(SYSLOG_5424_REGEX.pattern.encode("ascii"))
+
+# campos de evento com IP de origem, caminho e user agent (relatórios e supressões)
+IPV4_REGEX = re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}\b")
+IP_FIELDS = ("ip", "src_ip", "client_ip", "remote_addr", "source_ip")
+PATH_FIELDS = ("path", "url", "uri", "request_uri")
+UA_FIELDS = ("ua", "user_agent", "http_user_agent", "agent")
+
+# Tipos de origem produzidos pelos parsers (usados para escopo das regras)
+SOURCE_TYPES = ("apache", "syslog", "json", "jsonl", "csv", "plaintext")
+
+
+def first_field(event: Dict, names: Tuple[str, ...]) -> Optional[str]:
+    """Primeiro campo preenchido (não vazio e diferente de "-") entre `names`."""
+    for name in names:
+        value = event.get(name)
+        if isinstance(value, str) and value and value != "-":
+            return value
+    return None
+
 
 def read_lines(path: str, max_lines: int = 0, encoding: str = "utf-8") -> Iterator[str]:
     count = 0
@@ -19,19 +51,42 @@ def read_lines(path: str, max_lines: int = 0, encoding: str = "utf-8") -> Iterat
             yield line.rstrip("\n")
 
 
-def parse_jsonl(path: str, max_lines: int = 0, encoding: str = "utf-8") -> Iterator[Dict]:
-    for line in read_lines(path, max_lines=max_lines, encoding=encoding):
+def read_byte_lines(path: str, max_lines: int = 0, encoding: str = "utf-8") -> Iterator[bytes]:
+    """Linhas cruas (sem o fim de linha); remove o BOM da primeira se o encoding for utf-8-sig."""
+    bom = codecs.BOM_UTF8 if codecs.lookup(encoding).name == "utf-8-sig" else b""
+    count = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if max_lines and count >= max_lines:
+                break
+            if not count and bom and line.startswith(bom):
+                line = line[len(bom):]
+            count += 1
+            if line.endswith(b"\n"):
+                line = line[:-1]
+                if line.endswith(b"\r"):
+                    line = line[:-1]
+            yield line
+
+
+def _numbered_jsonl(path: str, max_lines: int = 0, encoding: str = "utf-8") -> Iterator[Tuple[int, Dict]]:
+    for number, line in enumerate(read_lines(path, max_lines=max_lines, encoding=encoding), 1):
         line = line.strip()
         if not line:
             continue
         try:
             obj = json.loads(line)
             if isinstance(obj, dict):
-                yield obj
+                yield number, obj
         except json.JSONDecodeError:
             continue
 
 
+def parse_jsonl(path: str, max_lines: int = 0, encoding: str = "utf-8") -> Iterator[Dict]:
+    for _, obj in _numbered_jsonl(path, max_lines=max_lines, encoding=encoding):
+        yield obj
+
+
 def parse_json(path: str, max_lines: int = 0, encoding: str = "utf-8") -> Iterator[Dict]:
     try:
         with open(path, "r", encoding=encoding, errors="replace") as f:
@@ -48,53 +103,166 @@ def parse_json(path: str, max_lines: int = 0, encoding: str = "utf-8") -> Iterat
         return
 
 
-def parse_csv(path: str, max_lines: int = 0, encoding: str = "utf-8") -> Iterator[Dict]:
+def _numbered_csv(path: str, max_lines: int = 0, encoding: str = "utf-8") -> Iterator[Tuple[int, Dict]]:
     try:
         with open(path, newline="", encoding=encoding, errors="replace") as csvfile:
             reader = csv.DictReader(csvfile)
             for i, row in enumerate(reader):
                 if max_lines and i >= max_lines:
                     break
-                yield dict(row)
+                # line_num = última linha física lida (campo entre aspas pode ocupar várias)
+                yield reader.line_num, dict(row)
     except Exception:
         return
 
 
+def parse_csv(path: str, max_lines: int = 0, encoding: str = "utf-8") -> Iterator[Dict]:
+    for _, row in _numbered_csv(path, max_lines=max_lines, encoding=encoding):
+        yield row
+
+
+def parse_apache_line(line: str) -> Optional[Dict]:
+    m = APACHE_COMBINED_REGEX.match(line)
+    if not m:
+        return None
+    d = m.groupdict()
+    d["source"] = "apache"
+    return d
+
+
 def parse_apache(path: str, max_lines: int = 0, encoding: str = "utf-8") -> Iterator[Dict]:
-    for i, line in enumerate(read_lines(path, max_lines=max_lines, encoding=encoding)):
-        m = APACHE_COMBINED_REGEX.match(line)
-        if not m:
-            continue
-        d = m.groupdict()
-        d["source"] = "apache"
-        yield d
+    for line in read_lines(path, max_lines=max_lines, encoding=encoding):
+        d = parse_apache_line(line)
+        if d is not None:
+            yield d
+
+
+def parse_syslog_line(line: str) -> Optional[Dict]:
+    m = SYSLOG_5424_REGEX.match(line) or SYSLOG_BSD_REGEX.match(line)
+    if not m:
+        return None
+    d = {k: v for k, v in m.groupdict().items() if v is not None}
+    d["source"] = "syslog"
+    return d
+
+
+def parse_syslog(path: str, max_lines: int = 0, encoding: str = "utf-8") -> Iterator[Dict]:
+    for line in read_lines(path, max_lines=max_lines, encoding=encoding):
+        d = parse_syslog_line(line)
+        if d is not None:
+            yield d
+
+
+def parse_plaintext_line(line: str) -> Dict:
+    return {"message": line}
 
 
 def parse_plaintext(path: str, max_lines: int = 0, encoding: str = "utf-8") -> Iterator[Dict]:
-    for i, line in enumerate(read_lines(path, max_lines=max_lines, encoding=encoding)):
+    for line in read_lines(path, max_lines=max_lines, encoding=encoding):
         yield {"message": line}
 
 
-def autodetect_and_parse(path: str, max_lines: int = 0, encoding: str = "utf-8") -> Iterator[Dict]:
+PARSERS: Dict[str, Callable[..., Iterator[Dict]]] = {
+    "apache": parse_apache,
+    "syslog": parse_syslog,
+    "json": parse_json,
+    "jsonl": parse_jsonl,
+    "csv": parse_csv,
+    "plaintext": parse_plaintext,
+}
+
+# Formatos de uma linha por evento: permitem o modo bytes do analisador
+LINE_PARSERS: Dict[str, Callable[[str], Optional[Dict]]] = {
+    "apache": parse_apache_line,
+    "syslog": parse_syslog_line,
+    "plaintext": parse_plaintext_line,
+}
+
+
+def _numbered_lines(source_type: str) -> Callable[..., Iterator[Tuple[int, Dict]]]:
+    parse_line = LINE_PARSERS[source_type]
+
+    def numbered(path: str, max_lines: int = 0, encoding: str = "utf-8") -> Iterator[Tuple[int, Dict]]:
+        for number, line in enumerate(read_lines(path, max_lines=max_lines, encoding=encoding), 1):
+            event = parse_line(line)
+            if event is not None:
+                yield number, event
+
+    return numbered
+
+
+def _numbered_json(path: str, max_lines: int = 0, encoding: str = "utf-8") -> Iterator[Tuple[Optional[int], Dict]]:
+    # documento JSON único: os eventos não têm linha própria
+    for obj in parse_json(path, max_lines=max_lines, encoding=encoding):
+        yield None, obj
+
+
+# Mesmos eventos de PARSERS, cada um com o número da linha (a partir de 1) em que está;
+# é o mesmo número que os modos bytes e mmap do analisador dão ao achado
+NUMBERED_PARSERS: Dict[str, Callable[..., Iterator[Tuple[Optional[int], Dict]]]] = {
+    "apache": _numbered_lines("apache"),
+    "syslog": _numbered_lines("syslog"),
+    "json": _numbered_json,
+    "jsonl": _numbered_jsonl,
+    "csv": _numbered_csv,
+    "plaintext": _numbered_lines("plaintext"),
+}
+
+
+def _apache_blob(line: bytes) -> Optional[bytes]:
+    m = APACHE_COMBINED_BYTES.match(line)
+    if not m:
+        return None
+    return b" ".join([v for v in m.groupdict().values() if v is not None] + [b"apache"])
+
+
+def _syslog_blob(line: bytes) -> Optional[bytes]:
+    m = SYSLOG_5424_BYTES.match(line) or SYSLOG_BSD_BYTES.match(line)
+    if not m:
+        return None
+    return b" ".join([v for v in m.groupdict().values() if v is not None] + [b"syslog"])
+
+
+def _plaintext_blob(line: bytes) -> bytes:
+    return line
+
+
+# Texto em que as regras são aplicadas, montado direto dos bytes de uma linha ASCII.
+# Reproduz exatamente o texto que o analisador monta a partir do evento
+# (valores na ordem dos campos, separados por espaço); None = linha ignorada pelo parser.
+BYTE_BLOBS: Dict[str, Callable[[bytes], Optional[bytes]]] = {
+    "apache": _apache_blob,
+    "syslog": _syslog_blob,
+    "plaintext": _plaintext_blob,
+}
+
+
+def detect_source_type(path: str, encoding: str = "utf-8") -> str:
     lower = path.lower()
     if lower.endswith(".jsonl"):
-        yield from parse_jsonl(path, max_lines=max_lines, encoding=encoding)
-        return
+        return "jsonl"
     if lower.endswith(".json"):
-        yield from parse_json(path, max_lines=max_lines, encoding=encoding)
-        return
+        return "json"
     if lower.endswith(".csv"):
-        yield from parse_csv(path, max_lines=max_lines, encoding=encoding)
-        return
-    # tentativa simples de apache
+        return "csv"
+    # tentativa simples pela primeira linha não vazia
     for line in read_lines(path, max_lines=10, encoding=encoding):
-        if APACHE_COMBINED_REGEX.match(line):
-            yield from parse_apache(path, max_lines=max_lines, encoding=encoding)
-            return
-        break
+        if not line.strip():
+            continue
+        return detect_line_type(line)
     # fallback
-    yield from parse_plaintext(path, max_lines=max_lines, encoding=encoding)
+    return "plaintext"
 
 
+def detect_line_type(line: str) -> str:
+    """Tipo de origem de uma linha de texto (apache, syslog ou plaintext)."""
+    if APACHE_COMBINED_REGEX.match(line):
+        return "apache"
+    if parse_syslog_line(line) is not None:
+        return "syslog"
+    return "plaintext"
 
 
+def autodetect_and_parse(path: str, max_lines: int = 0, encoding: str = "utf-8") -> Iterator[Dict]:
+    source_type = detect_source_type(path, encoding=encoding)
+    yield from PARSERS[source_type](path, max_lines=max_lines, encoding=encoding)
@@ -0,0 +1,382 @@
+import re
+import string
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+try:  # Python 3.11+
+    from re import _constants as sre_constants
+    from re import _parser as sre_parse
+except ImportError:  # pragma: no cover - Python < 3.11
+    import sre_constants  # type: ignore
+    import sre_parse  # type: ignore
+
+from .rules import Rule
+
+
+# Análise estática aproximada: os conjuntos de "primeiro caractere" são
+# calculados apenas sobre ASCII, o que basta para as regras de log.
+_ALL = frozenset(range(128))
+_NO_NEWLINE = _ALL - {10}
+_DIGITS = frozenset(ord(c) for c in string.digits)
+_SPACES = frozenset(ord(c) for c in " \t\n\r\f\v")
+_WORD = frozenset(ord(c) for c in string.ascii_letters + string.digits + "_")
+_CATEGORIES = {
+    "DIGIT": _DIGITS,
+    "NOT_DIGIT": _ALL - _DIGITS,
+    "SPACE": _SPACES,
+    "NOT_SPACE": _ALL - _SPACES,
+    "WORD": _WORD,
+    "NOT_WORD": _ALL - _WORD,
+    "LINEBREAK": frozenset({10}),
+    "NOT_LINEBREAK": _NO_NEWLINE,
+}
+
+_REPEATS = {sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT}
+_POSSESSIVE = getattr(sre_constants, "POSSESSIVE_REPEAT", None)
+_ATOMIC = getattr(sre_constants, "ATOMIC_GROUP", None)
+
+# Corpo de repetição com pelo menos esta quantidade de caracteres iniciais possíveis
+# é tratado como "curinga" (ex.: `.`, `\S`, `[^"]`)
+WILDCARD_MIN_CHARS = 64
+# Contagem {m,n} a partir da qual a repetição conta como ilimitada na busca por
+# backtracking exponencial: `(.*a){12}` explode como `(.*a)+`
+COUNTED_REPEAT_LIMIT = 10
+
+CRITICAL = "critical"
+WARNING = "warning"
+
+
+@dataclass
+class PatternIssue:
+    level: str
+    message: str
+
+
+def _category_chars(category) -> FrozenSet[int]:
+    name = str(category).replace("CATEGORY_", "").replace("UNI_", "").replace("LOC_", "")
+    return _CATEGORIES.get(name, _ALL)
+
+
+def _fold(chars: FrozenSet[int], ignorecase: bool) -> FrozenSet[int]:
+    if not ignorecase:
+        return chars
+    folded = set(chars)
+    for c in chars:
+        ch = chr(c)
+        if ch.isalpha():
+            folded.add(ord(ch.swapcase()))
+    return frozenset(folded)
+
+
+def _in_chars(items, ignorecase: bool) -> FrozenSet[int]:
+    chars = set()
+    negate = False
+    for op, av in items:
+        if op is sre_constants.NEGATE:
+            negate = True
+        elif op is sre_constants.LITERAL:
+            if av < 128:
+                chars.add(av)
+        elif op is sre_constants.RANGE:
+            lo, hi = av
+            chars.update(range(lo, min(hi, 127) + 1))
+        elif op is sre_constants.CATEGORY:
+            chars.update(_category_chars(av))
+    result = _fold(frozenset(chars), ignorecase)
+    return _ALL - result if negate else result
+
+
+def _first(seq, ignorecase: bool) -> Tuple[FrozenSet[int], bool]:
+    """Conjunto de possíveis primeiros caracteres e se a sequência aceita vazio."""
+    result: FrozenSet[int] = frozenset()
+    for op, av in seq:
+        chars, nullable = _first_item(op, av, ignorecase)
+        result |= chars
+        if not nullable:
+            return result, False
+    return result, True
+
+
+def _first_item(op, av, ignorecase: bool) -> Tuple[FrozenSet[int], bool]:
+    if op is sre_constants.LITERAL:
+        return _fold(frozenset({av}) if av < 128 else frozenset(), ignorecase), False
+    if op is sre_constants.NOT_LITERAL:
+        return _ALL - _fold(frozenset({av}), ignorecase), False
+    if op is sre_constants.ANY:
+        return _NO_NEWLINE, False
+    if op is sre_constants.IN:
+        return _in_chars(av, ignorecase), False
+    if op is sre_constants.SUBPATTERN:
+        return _first(av[-1], ignorecase)
+    if op is sre_constants.BRANCH:
+        chars: FrozenSet[int] = frozenset()
+        nullable = False
+        for branch in av[1]:
+            c, n = _first(branch, ignorecase)
+            chars |= c
+            nullable = nullable or n
+        return chars, nullable
+    if op in _REPEATS or op is _POSSESSIVE:
+        lo, _hi, sub = av
+        chars, nullable = _first(sub, ignorecase)
+        return chars, nullable or lo == 0
+    if op is _ATOMIC:
+        return _first(av, ignorecase)
+    if op in (sre_constants.AT, sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+        return frozenset(), True
+    # referências a grupos e construções raras: assume o pior caso
+    return _ALL, True
+
+
+def _ambiguous_branch(seq, follow: FrozenSet[int], ignorecase: bool) -> Optional[str]:
+    """
+    Alternação do corpo de uma repetição que casa o mesmo texto de mais de um jeito:
+    ramos com primeiros caracteres em comum, ou um ramo vazio quando os outros começam
+    com o que pode vir depois dele. `(a|aa)+` é fatorado pelo sre_parse em `a(?:|a)`:
+    o ramo vazio seguido da próxima iteração (`a`) disputa com o ramo `a`.
+    `follow`: primeiros caracteres do que vem depois de `seq` (a próxima iteração).
+    """
+    items = list(seq)
+    for i, (op, av) in enumerate(items):
+        after, rest_nullable = _first(items[i + 1:], ignorecase)
+        if rest_nullable:
+            after = after | follow
+        if op is sre_constants.SUBPATTERN:
+            found = _ambiguous_branch(av[-1], after, ignorecase)
+            if found:
+                return found
+        elif op is sre_constants.BRANCH:
+            seen: FrozenSet[int] = frozenset()
+            empty = False
+            for branch in av[1]:
+                first, nullable = _first(branch, ignorecase)
+                # dois ramos vazios: `(a|a)` vira `a(?:|)`
+                if seen & first or (empty and nullable):
+                    return "alternação com ramos sobrepostos sob quantificador ilimitado"
+                seen |= first
+                empty = empty or nullable
+            if empty and seen & after:
+                return "alternação com ramo vazio ambíguo sob quantificador ilimitado"
+    return None
+
+
+def _walk(seq, issues: List[PatternIssue], inside_unbounded: bool, ignorecase: bool) -> None:
+    wildcards = 0
+    previous: Tuple[FrozenSet[int], bool] = (frozenset(), False)  # (primeiros, ilimitado)
+    for op, av in seq:
+        if op in _REPEATS:
+            _lo, hi, sub = av
+            unbounded = hi == sre_constants.MAXREPEAT
+            # contagem grande: para o backtracking exponencial, equivale a ilimitada
+            repeats = unbounded or hi >= COUNTED_REPEAT_LIMIT
+            chars, nullable = _first(sub, ignorecase)
+            if repeats and inside_unbounded and chars:
+                issues.append(PatternIssue(CRITICAL, "quantificadores ilimitados aninhados (backtracking exponencial)"))
+            if repeats:
+                ambiguous = _ambiguous_branch(sub, chars, ignorecase)
+                if ambiguous:
+                    issues.append(PatternIssue(CRITICAL, ambiguous))
+            if unbounded and len(chars) >= WILDCARD_MIN_CHARS:
+                wildcards += 1
+            if unbounded and previous[1] and previous[0] & chars:
+                issues.append(PatternIssue(WARNING, "quantificadores ilimitados adjacentes sobrepostos (custo polinomial)"))
+            previous = (chars, unbounded)
+            _walk(sub, issues, inside_unbounded or repeats, ignorecase)
+            continue
+        if op is not sre_constants.AT:
+            previous = (frozenset(), False)
+        if op is sre_constants.SUBPATTERN:
+            _walk(av[-1], issues, inside_unbounded, ignorecase)
+        elif op is sre_constants.BRANCH:
+            for branch in av[1]:
+                _walk(branch, issues, inside_unbounded, ignorecase)
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            _walk(av[1], issues, inside_unbounded, ignorecase)
+        elif op is _POSSESSIVE:
+            # repetição possessiva não faz backtracking
+            _walk(av[2], issues, False, ignorecase)
+        elif op is _ATOMIC:
+            _walk(av, issues, False, ignorecase)
+    if wildcards >= 2:
+        issues.append(PatternIssue(WARNING, f"{wildcards} curingas ilimitados na mesma sequência (custo polinomial)"))
+
+
+def _best(current: Optional[FrozenSet[str]], candidate: Optional[FrozenSet[str]]) -> Optional[FrozenSet[str]]:
+    # prefere o conjunto cujo literal mais curto é o mais longo (menos candidatos falsos)
+    if not candidate:
+        return current
+    if current is None:
+        return candidate
+    key = lambda s: (min(map(len, s)), -len(s))
+    return candidate if key(candidate) > key(current) else current
+
+
+def _required(seq) -> Optional[FrozenSet[str]]:
+    """Literais dos quais ao menos um aparece em todo match da sequência (None = sem garantia)."""
+    best: Optional[FrozenSet[str]] = None
+    run: List[str] = []
+    for op, av in seq:
+        if op is sre_constants.LITERAL and av < 128:
+            run.append(chr(av))
+            continue
+        if run:
+            best = _best(best, frozenset({"".join(run)}))
+            run = []
+        if op is sre_constants.SUBPATTERN:
+            # grupo que liga/desliga flags (ex.: (?i:...)) muda o casamento dos literais
+            if not av[1] and not av[2]:
+                best = _best(best, _required(av[-1]))
+        elif op is sre_constants.BRANCH:
+            branches = [_required(branch) for branch in av[1]]
+            if all(branches):
+                best = _best(best, frozenset().union(*branches))
+        elif op in _REPEATS or op is _POSSESSIVE:
+            if av[0] >= 1:
+                best = _best(best, _required(av[2]))
+        elif op is _ATOMIC:
+            best = _best(best, _required(av))
+    if run:
+        best = _best(best, frozenset({"".join(run)}))
+    return best
+
+
+def required_literals(pattern: str, flags: int = re.IGNORECASE, min_length: int = 2) -> Optional[Tuple[Tuple[str, ...], bool]]:
+    """
+    Pré-filtro literal: (literais, ignorecase) tais que todo match contém ao menos um
+    dos literais (em minúsculas quando ignorecase). None se não houver conjunto
+    garantido com literais de pelo menos `min_length` caracteres.
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except (re.error, OverflowError, RecursionError):
+        return None
+    literals = _required(list(parsed))
+    if not literals or min(map(len, literals)) < min_length:
+        return None
+    ignorecase = bool(parsed.state.flags & re.IGNORECASE)
+    if ignorecase:
+        literals = frozenset(literal.lower() for literal in literals)
+    return tuple(sorted(literals)), ignorecase
+
+
+def check_pattern(pattern: str, flags: int = re.IGNORECASE) -> List[PatternIssue]:
+    """Procura formatos de regex sujeitos a backtracking catastrófico (ReDoS)."""
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except (re.error, OverflowError, RecursionError) as exc:
+        return [PatternIssue(CRITICAL, f"regex inválida: {exc}")]
+    issues: List[PatternIssue] = []
+    _walk(list(parsed), issues, False, bool(flags & re.IGNORECASE))
+    # remove duplicados mantendo a ordem
+    unique: Dict[Tuple[str, str], PatternIssue] = {}
+    for issue in issues:
+        unique.setdefault((issue.level, issue.message), issue)
+    return list(unique.values())
+
+
+def audit_rules(rules: List[Rule]) -> Tuple[List[Rule], Dict[str, str], Dict[str, List[str]]]:
+    """
+    Separa as regras em ativas e em quarentena (formatos exponenciais ou nenhum
+    tipo de origem conhecido).
+
+    Retorna (ativas, quarentena {id: motivo}, avisos {id: [mensagens]}).
+    """
+    active: List[Rule] = []
+    quarantined: Dict[str, str] = {}
+    warnings: Dict[str, List[str]] = {}
+    for rule in rules:
+        issues = check_pattern(rule.pattern.pattern, rule.pattern.flags)
+        critical = [i.message for i in issues if i.level == CRITICAL]
+        if rule.unknown_sources and not rule.sources:
+            # sem nenhum tipo válido a regra nunca rodaria (e não pode virar "todos")
+            critical.append(f"nenhum tipo de origem conhecido: {', '.join(rule.unknown_sources)}")
+        if critical:
+            quarantined[rule.id] = "; ".join(critical)
+            continue
+        messages = [i.message for i in issues]
+        if rule.unknown_sources:
+            messages.append(f"tipos de origem desconhecidos ignorados: {', '.join(rule.unknown_sources)}")
+        if messages:
+            warnings[rule.id] = messages
+        active.append(rule)
+    return active, quarantined, warnings
+
+
+class RuleBudget:
+    """
+    Orçamento de tempo por regra, medido por amostragem de eventos.
+
+    A cada `sample_every` eventos o tempo de cada regra é medido. Uma regra vai para
+    quarentena quando estoura `hard_limit_factor` vezes o orçamento em `hard_limit_strikes`
+    medições seguidas, ou quando, após `min_samples`, a média passa de `budget_us` com
+    pelo menos metade das medições acima do orçamento. Uma medição isolada (pausa do GC,
+    disputa pelo GIL) não basta para tirar uma regra de detecção do ar.
+    """
+
+    def __init__(
+        self,
+        budget_us: float = 1000.0,
+        sample_every: int = 64,
+        min_samples: int = 16,
+        hard_limit_factor: float = 50.0,
+        hard_limit_strikes: int = 3,
+    ) -> None:
+        self.budget_us = budget_us
+        self.budget_s = budget_us / 1_000_000
+        self.sample_every = max(1, sample_every)
+        self.min_samples = min_samples
+        self.hard_limit_factor = hard_limit_factor
+        self.hard_limit_s = self.budget_s * hard_limit_factor
+        self.hard_limit_strikes = max(1, hard_limit_strikes)
+        self._events = 0
+        # id -> [amostras, total, amostras acima do orçamento, estouros seguidos, pior]
+        self._stats: Dict[str, List[float]] = {}
+
+    def fresh(self) -> "RuleBudget":
+        """Mesmo orçamento, sem amostras (uma análise não herda as medições de outra)."""
+        return RuleBudget(
+            self.budget_us, self.sample_every, self.min_samples, self.hard_limit_factor, self.hard_limit_strikes
+        )
+
+    def should_sample(self) -> bool:
+        self._events += 1
+        return self._events % self.sample_every == 0
+
+    def record(self, rule_id: str, seconds: float) -> None:
+        self._add(rule_id, seconds, 1, seconds)
+
+    def record_batch(self, rule_id: str, seconds: float, events: int) -> None:
+        """Uma busca que cobriu `events` linhas de uma vez (varredura do buffer inteiro)."""
+        if events <= 0:
+            return
+        self._add(rule_id, seconds, events, seconds / events)
+
+    def _add(self, rule_id: str, seconds: float, events: int, per_event: float) -> None:
+        stats = self._stats.get(rule_id)
+        if stats is None:
+            stats = self._stats[rule_id] = [0, 0.0, 0, 0, 0.0]
+        stats[0] += events
+        stats[1] += seconds
+        if per_event > self.budget_s:
+            stats[2] += events
+        # uma busca em lote conta como uma medição para a sequência de estouros
+        stats[3] = stats[3] + 1 if per_event > self.hard_limit_s else 0
+        if per_event > stats[4]:
+            stats[4] = per_event
+
+    def over_budget(self) -> Dict[str, str]:
+        slow: Dict[str, str] = {}
+        for rule_id, (samples, total, over, streak, worst) in self._stats.items():
+            if streak >= self.hard_limit_strikes:
+                slow[rule_id] = (
+                    f"{streak} avaliações seguidas acima de {self.hard_limit_s * 1_000_000:.0f} µs "
+                    f"(pior: {worst * 1_000_000:.0f} µs)"
+                )
+            elif samples >= self.min_samples and total / samples > self.budget_s and over * 2 >= samples:
+                slow[rule_id] = (
+                    f"tempo médio de {total / samples * 1_000_000:.0f} µs por evento "
+                    f"excedeu o orçamento de {self.budget_s * 1_000_000:.0f} µs"
+                )
+        for rule_id in slow:
+            del self._stats[rule_id]
+        return slow
@@ -1,8 +1,21 @@
+import base64
 import csv
+import gzip
 import json
 import os
+import random
+import re
+import tempfile
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, Iterable, List, Tuple
+from html import escape
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Tuple
+
+from .parsers import IP_FIELDS, IPV4_REGEX, PATH_FIELDS, UA_FIELDS, first_field
+from .sketches import RuleSketches
+from .timestamps import INTERVALS, bucket_start, to_iso
 
 
 SEVERITY_ORDER = ["info", "low", "medium", "high", "critical"]
@@ -22,50 +35,481 @@ SEVERITY_EMOJI = {
 }
 
 
-def _summarize_by_severity(findings: List[Dict]) -> Dict[str, int]:
-    summary: Dict[str, int] = {s: 0 for s in SEVERITY_ORDER}
-    for f in findings:
-        sev = f.get("severity", "medium")
-        summary[sev] = summary.get(sev, 0) + 1
-    return summary
+# quantidade de itens por tabela de "top" nos relatórios
+TOP_K = 5
+STATS_SECTIONS = (
+    ("top_ips", "Principais IPs de origem"),
+    ("top_paths", "Principais paths"),
+    ("top_user_agents", "Principais user agents"),
+)
+# títulos dos rótulos de enriquecimento de IP (demais tabelas usam o nome do campo)
+LABEL_TITLES = {
+    "ip_asn": "Principais ASNs",
+    "ip_country": "Principais países",
+    "ip_zone": "Principais zonas",
+}
+
+INTERVAL_LABEL = {"minute": "minuto", "hour": "hora"}
+# acima disso a linha do tempo por minuto vira por hora
+TIMELINE_MAX_MINUTE_BUCKETS = 180
+# eventos de exemplo guardados por regra
+SAMPLE_SIZE = 5
+
+
+def _finding_attributes(finding: Dict) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """(ip, path, user agent) de um achado; sem campo de IP, usa o primeiro IPv4 da linha."""
+    event = finding.get("event") or {}
+    if not isinstance(event, dict):
+        event = {}
+    ip = first_field(event, IP_FIELDS)
+    if ip is None:
+        m = IPV4_REGEX.search(finding.get("raw_line") or "")
+        ip = m.group(0) if m else None
+    return ip, first_field(event, PATH_FIELDS), first_field(event, UA_FIELDS)
+
+
+@dataclass
+class RuleSummary:
+    rule_id: str
+    severity: str
+    description: str
+    recommendation: str
+    count: int = 0
+    per_file: Dict[str, int] = field(default_factory=dict)
+    samples: List[Dict] = field(default_factory=list)
+    sketches: Optional[RuleSketches] = field(default_factory=RuleSketches, repr=False)
+    stats: Dict = field(default_factory=dict)
 
 
-def _aggregate_by_rule(findings: List[Dict]) -> List[Dict]:
-    bucket: Dict[str, Dict] = {}
+@dataclass
+class ReportModel:
+    """Agregados de um conjunto de achados, compartilhados por todos os formatos."""
+
+    total: int
+    by_severity: Dict[str, int]
+    groups: List[RuleSummary]
+    sources: List[str]
+    minute_counts: Dict[int, int]
+    generated_at: str
+
+    def rule_stats(self) -> Dict[str, Dict]:
+        """Resumo por regra: ocorrências, IPs distintos (estimados) e top IPs/paths/user agents."""
+        return {g.rule_id: {"occurrences": g.count, **g.stats} for g in self.groups}
+
+    def timeline(self, interval: Optional[str] = None) -> Tuple[str, List[Tuple[str, int]]]:
+        """
+        Histograma de achados por minuto/hora a partir de `finding["timestamp"]`.
+
+        Sem `interval`, usa minuto enquanto o período couber em
+        TIMELINE_MAX_MINUTE_BUCKETS e hora caso contrário.
+        """
+        minutes = self.minute_counts
+        if interval is None:
+            span = (max(minutes) - min(minutes)) if minutes else 0
+            interval = "minute" if span < TIMELINE_MAX_MINUTE_BUCKETS * INTERVALS["minute"] else "hour"
+        counts: Dict[int, int] = {}
+        for minute, count in minutes.items():
+            bucket = bucket_start(minute, interval)
+            counts[bucket] = counts.get(bucket, 0) + count
+        return interval, [(to_iso(bucket), count) for bucket, count in sorted(counts.items())]
+
+
+def build_report_model(findings: Iterable[Dict], sample_size: int = SAMPLE_SIZE, seed: int = 0) -> ReportModel:
+    """
+    Monta o ReportModel numa única passada sobre os achados.
+
+    Por regra guarda só contagens, sketches de memória fixa e uma amostra de
+    `sample_size` eventos (reservoir sampling), nunca a lista completa.
+    """
+    rng = random.Random(seed)
+    by_severity: Dict[str, int] = {s: 0 for s in SEVERITY_ORDER}
+    groups: Dict[str, RuleSummary] = {}
+    sources = set()
+    minute_counts: Dict[int, int] = {}
+    total = 0
     for f in findings:
+        total += 1
+        sev = f.get("severity", "medium")
+        by_severity[sev] = by_severity.get(sev, 0) + 1
         rid = f.get("rule_id", "desconhecida")
-        if rid not in bucket:
-            bucket[rid] = {
-                "rule_id": rid,
-                "severity": f.get("severity", "medium"),
-                "description": f.get("description", ""),
-                "recommendation": f.get("recommendation", ""),
-                "items": [],
-                "per_file": {},
-            }
-        bucket[rid]["items"].append(f)
+        g = groups.get(rid)
+        if g is None:
+            g = groups[rid] = RuleSummary(
+                rule_id=rid,
+                severity=sev,
+                description=f.get("description", ""),
+                recommendation=f.get("recommendation", ""),
+            )
+        g.count += 1
         src = f.get("source_file", "?")
-        bucket[rid]["per_file"][src] = bucket[rid]["per_file"].get(src, 0) + 1
-    groups = list(bucket.values())
-    groups.sort(key=lambda g: (SEVERITY_ORDER.index(g.get("severity", "medium")), -len(g["items"])))
-    return groups
+        sources.add(src)
+        g.per_file[src] = g.per_file.get(src, 0) + 1
+        # reservoir sampling (algoritmo R): amostra uniforme de tamanho fixo
+        if len(g.samples) < sample_size:
+            g.samples.append(f)
+        else:
+            slot = rng.randrange(g.count)
+            if slot < sample_size:
+                g.samples[slot] = f
+        g.sketches.add(*_finding_attributes(f), f.get("enrichment"))
+        stamp = f.get("timestamp")
+        if stamp:
+            try:
+                minute = bucket_start(datetime.fromisoformat(stamp).timestamp(), "minute")
+            except ValueError:
+                minute = None
+            if minute is not None:
+                minute_counts[minute] = minute_counts.get(minute, 0) + 1
+    ordered = list(groups.values())
+    for g in ordered:
+        g.stats = g.sketches.summary(TOP_K)
+        g.sketches = None
+    ordered.sort(key=lambda g: (SEVERITY_ORDER.index(g.severity) if g.severity in SEVERITY_ORDER else 0, -g.count))
+    return ReportModel(
+        total=total,
+        by_severity=by_severity,
+        groups=ordered,
+        sources=sorted(sources),
+        minute_counts=minute_counts,
+        generated_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    )
+
+
+def _stats_sections(stats: Dict) -> Iterator[Tuple[str, List[Dict]]]:
+    for key, title in STATS_SECTIONS:
+        yield title, stats.get(key) or []
+    for name, rows in (stats.get("top_labels") or {}).items():
+        yield LABEL_TITLES.get(name, f"Principais valores de {name}"), rows
+
+
+def _md_code(value) -> str:
+    """
+    Valor vindo do log como código inline numa célula de tabela Markdown: dentro do
+    código o texto não vira HTML, `|` não quebra a tabela e crases internas pedem um
+    delimitador mais longo que a maior sequência delas.
+    """
+    text = str(value).replace("\r", " ").replace("\n", " ").replace("|", "\\|")
+    fence = "`" * (max((len(run) for run in re.findall("`+", text)), default=0) + 1)
+    pad = " " if text.startswith("`") or text.endswith("`") else ""
+    return f"{fence}{pad}{text}{pad}{fence}"
+
+
+def _stats_markdown(md, stats: Dict) -> None:
+    md.write(f"IPs distintos (estimado): **{stats['unique_ips']}**\n\n")
+    for title, rows in _stats_sections(stats):
+        if not rows:
+            continue
+        md.write(f"{title}:\n\n| Valor | Ocorrências |\n|---|---:|\n")
+        for row in rows:
+            approx = f" (±{row['error']})" if row["error"] else ""
+            md.write(f"| {_md_code(row['value'])} | {row['count']}{approx} |\n")
+        md.write("\n")
+
+
+def _stats_html(html, stats: Dict) -> None:
+    html.write(f"<p><strong>IPs distintos (estimado):</strong> {stats['unique_ips']}</p>")
+    for title, rows in _stats_sections(stats):
+        if not rows:
+            continue
+        html.write(f"<h4>{title}</h4>")
+        html.write("<table><thead><tr><th>Valor</th><th>Ocorrências</th></tr></thead><tbody>")
+        for row in rows:
+            approx = f" (±{row['error']})" if row["error"] else ""
+            html.write(f"<tr><td><code>{escape(str(row['value']))}</code></td><td>{row['count']}{approx}</td></tr>")
+        html.write("</tbody></table>")
+
+
+def _fmt_bytes(n: int) -> str:
+    size = float(n)
+    for unit in ("B", "KB", "MB", "GB", "TB"):
+        if size < 1024 or unit == "TB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return str(n)
+
+
+def _write_traffic_markdown(md, traffic: Dict) -> None:
+    rpm = traffic.get("requests_per_minute", {})
+    md.write("## Tráfego\n\n")
+    md.write(f"Total de requisições: **{traffic['total_requests']}**  \n")
+    if rpm.get("peak"):
+        md.write(
+            f"Requisições por minuto: média {rpm['mean']}, desvio {rpm['std']}, "
+            f"pico {rpm['peak']['requests']} em {rpm['peak']['minute']}\n\n"
+        )
+    md.write("| Status | Requisições |\n|---|---:|\n")
+    for code, count in traffic.get("status_distribution", {}).items():
+        md.write(f"| {code} | {count} |\n")
+    md.write("\n")
+    if traffic.get("top_bytes_by_ip"):
+        md.write("### Bytes por IP\n\n")
+        md.write("| IP | Bytes | Requisições |\n|---|---:|---:|\n")
+        for row in traffic["top_bytes_by_ip"]:
+            md.write(f"| {_md_code(row['ip'])} | {_fmt_bytes(row['bytes'])} | {row['requests']} |\n")
+        md.write("\n")
+    if traffic.get("error_ratio_by_path"):
+        md.write("### Taxa de erro por path\n\n")
+        md.write("| Path | Requisições | 4xx | 5xx | Taxa de erro |\n|---|---:|---:|---:|---:|\n")
+        for row in traffic["error_ratio_by_path"]:
+            md.write(f"| {_md_code(row['path'])} | {row['requests']} | {row['4xx']} | {row['5xx']} | {row['error_ratio']:.1%} |\n")
+        md.write("\n")
+    if rpm.get("anomalies"):
+        md.write("### Picos anômalos (z-score por minuto)\n\n")
+        md.write("| Minuto (UTC) | Requisições | z-score |\n|---|---:|---:|\n")
+        for row in rpm["anomalies"]:
+            md.write(f"| {row['minute']} | {row['requests']} | {row['zscore']} |\n")
+        md.write("\n")
+
+
+def _write_traffic_html(html, traffic: Dict) -> None:
+    rpm = traffic.get("requests_per_minute", {})
+    html.write("<h2>Tráfego</h2>")
+    html.write("<div class='grid'>")
+    html.write(f"<div class='card'><div class='muted'>requisições</div><div style='font-size:28px;font-weight:700'>{traffic['total_requests']}</div></div>")
+    for cls, count in traffic.get("status_classes", {}).items():
+        html.write(f"<div class='card'><div class='muted'>{cls}</div><div style='font-size:28px;font-weight:700'>{count}</div></div>")
+    if rpm.get("peak"):
+        html.write(f"<div class='card'><div class='muted'>pico/minuto</div><div style='font-size:28px;font-weight:700'>{rpm['peak']['requests']}</div><div class='muted'>média {rpm['mean']}</div></div>")
+    html.write("</div>")
+    if traffic.get("top_bytes_by_ip"):
+        html.write("<h3>Bytes por IP</h3>")
+        html.write("<table><thead><tr><th>IP</th><th>Bytes</th><th>Requisições</th></tr></thead><tbody>")
+        for row in traffic["top_bytes_by_ip"]:
+            html.write(f"<tr><td><code>{escape(str(row['ip']))}</code></td><td>{_fmt_bytes(row['bytes'])}</td><td>{row['requests']}</td></tr>")
+        html.write("</tbody></table>")
+    if traffic.get("error_ratio_by_path"):
+        html.write("<h3>Taxa de erro por path</h3>")
+        html.write("<table><thead><tr><th>Path</th><th>Requisições</th><th>4xx</th><th>5xx</th><th>Taxa de erro</th></tr></thead><tbody>")
+        for row in traffic["error_ratio_by_path"]:
+            html.write(f"<tr><td><code>{escape(str(row['path']))}</code></td><td>{row['requests']}</td><td>{row['4xx']}</td><td>{row['5xx']}</td><td>{row['error_ratio']:.1%}</td></tr>")
+        html.write("</tbody></table>")
+    if rpm.get("anomalies"):
+        html.write("<h3>Picos anômalos (z-score por minuto)</h3>")
+        html.write("<table><thead><tr><th>Minuto (UTC)</th><th>Requisições</th><th>z-score</th></tr></thead><tbody>")
+        for row in rpm["anomalies"]:
+            html.write(f"<tr class='sev-high'><td>{row['minute']}</td><td>{row['requests']}</td><td>{row['zscore']}</td></tr>")
+        html.write("</tbody></table>")
+
+
+@contextmanager
+def _atomic_open(path: str, encoding: str = "utf-8", newline: Optional[str] = None) -> Iterator[TextIO]:
+    """Escreve num temporário do mesmo diretório e renomeia no fim: leitores nunca veem arquivo parcial."""
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding=encoding, newline=newline) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def new_run_id() -> str:
+    """Identificador de execução: data/hora + sufixo aleatório (ordenável e sem colisão)."""
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+
+def make_run_directory(base_dir: str, run_id: Optional[str] = None) -> str:
+    """Cria `base_dir/<run_id>`; falha se já existir para não misturar execuções."""
+    run_id = run_id or new_run_id()
+    if run_id in (".", "..") or os.path.basename(run_id) != run_id or "/" in run_id:
+        raise ValueError(f"id de execução inválido: {run_id!r}")
+    path = os.path.join(base_dir, run_id)
+    os.makedirs(path)
+    return path
+
+
+HTML_CSS = (
+    "body{font-family:Segoe UI,Roboto,Arial,sans-serif;margin:20px;}"
+    "h1{margin-bottom:0;} small{color:#555;} table{border-collapse:collapse;width:100%;}"
+    "th,td{border:1px solid #ddd;padding:8px;} th{background:#f5f5f5;text-align:left;}"
+    ".sev-info{background:#eef5ff;} .sev-low{background:#effaf0;} .sev-medium{background:#fff7e6;}"
+    ".sev-high{background:#ffecec;} .sev-critical{background:#ffe1e1;} .badge{padding:2px 6px;border-radius:4px;}"
+    ".b-info{background:#2f86eb;color:#fff;} .b-low{background:#2ecc71;color:#fff;} .b-medium{background:#f39c12;color:#fff;}"
+    ".b-high{background:#e74c3c;color:#fff;} .b-critical{background:#c0392b;color:#fff;} pre{background:#f8f8f8;padding:8px;overflow:auto;}"
+    "details{margin:8px 0;} summary{cursor:pointer;} .grid{display:grid;grid-template-columns:repeat(auto-fit,minmax(160px,1fr));gap:12px;margin:12px 0;}"
+    ".card{border:1px solid #ddd;border-radius:8px;padding:12px;background:#fff;} .muted{color:#666;}"
+    "#filter{padding:8px;border:1px solid #ccc;border-radius:6px;width:100%;max-width:420px;}"
+)
+
+RULES_FILTER_JS = "<script>\nconst q=document.getElementById('filter');\nconst rows=[...document.querySelectorAll('#rulesTbl tbody tr')];\nq&&q.addEventListener('input',()=>{const v=q.value.toLowerCase();rows.forEach(r=>{r.style.display=r.innerText.toLowerCase().includes(v)?'':'none';});});\n</script>"
+
+# achados por shard no HTML fragmentado
+SHARD_PAGE_SIZE = 2000
+SHARD_ROW_HEIGHT = 26
+
+SHARDED_CSS = (
+    "#rulesTbl tbody tr{cursor:pointer;} #rulesTbl tbody tr.active{outline:2px solid #2f86eb;}"
+    "#viewer{position:relative;height:480px;overflow:auto;border:1px solid #ddd;border-radius:6px;font-family:monospace;font-size:12px;}"
+    f"#viewer .row{{position:absolute;left:0;right:0;height:{SHARD_ROW_HEIGHT}px;line-height:{SHARD_ROW_HEIGHT}px;padding:0 8px;"
+    "white-space:nowrap;overflow:hidden;text-overflow:ellipsis;border-bottom:1px solid #f0f0f0;cursor:pointer;}"
+    "#viewer .row:hover{background:#f5f9ff;} #findingFilter{padding:8px;border:1px solid #ccc;border-radius:6px;width:100%;max-width:420px;margin:8px 0;}"
+)
+
+# Visualizador: shards são arquivos .js (carregados por <script>, funciona também em file://)
+# com JSON compactado em gzip + base64, descompactado com DecompressionStream. Só as
+# páginas que aparecem na rolagem (ou que o filtro precisa) são baixadas, e só as linhas
+# visíveis viram elementos no DOM.
+SHARDED_VIEWER_JS = """<script>
+const M=JSON.parse(document.getElementById('manifest').textContent);
+const ROW=M.row_height, pages={}, pending={};
+let rule=null, filtered=null, filterSeq=0;
+window.synapseShard=(id,b64)=>{const p=pending[id];if(!p)return;
+  const bin=Uint8Array.from(atob(b64),c=>c.charCodeAt(0));
+  new Response(new Blob([bin]).stream().pipeThrough(new DecompressionStream('gzip'))).text()
+    .then(t=>{pages[id]=JSON.parse(t);delete pending[id];p.resolve(pages[id]);});};
+function loadPage(r,n){const id='r'+r+'-p'+n;if(pages[id])return Promise.resolve(pages[id]);
+  if(pending[id])return pending[id].promise;let resolve;const promise=new Promise(x=>resolve=x);
+  pending[id]={resolve,promise};const s=document.createElement('script');s.src=M.dir+'/'+id+'.js';
+  document.head.appendChild(s);return promise;}
+const view=document.getElementById('viewer'), spacer=document.getElementById('spacer');
+const detail=document.getElementById('detail'), info=document.getElementById('viewerInfo');
+function rowAt(i){if(filtered)return filtered[i];const p=pages['r'+rule+'-p'+Math.floor(i/M.page_size)];
+  return p?p[i%M.page_size]:undefined;}
+function total(){return filtered?filtered.length:M.rules[rule].count;}
+function label(r){return (r[0]||'-')+'  '+M.files[r[1]]+'  '+r[2];}
+function render(){if(rule===null)return;const n=total();spacer.style.height=(n*ROW)+'px';
+  const first=Math.max(0,Math.floor(view.scrollTop/ROW)-5), last=Math.min(n,first+Math.ceil(view.clientHeight/ROW)+10);
+  const frag=document.createDocumentFragment();const missing=new Set();
+  for(let i=first;i<last;i++){const r=rowAt(i);const d=document.createElement('div');d.className='row';d.style.top=(i*ROW)+'px';
+    if(r){d.textContent=label(r);d.onclick=()=>{detail.textContent=JSON.stringify(r[3],null,2);};}
+    else{d.textContent='carregando...';missing.add(Math.floor(i/M.page_size));}
+    frag.appendChild(d);}
+  spacer.replaceChildren(frag);missing.forEach(n=>loadPage(rule,n).then(render));
+  info.textContent=M.rules[rule].rule_id+': '+n+' ocorrências'+(filtered?' (filtradas)':'');}
+view.addEventListener('scroll',()=>requestAnimationFrame(render));
+function select(r){rule=r;filtered=null;document.getElementById('findingFilter').value='';
+  document.querySelectorAll('#rulesTbl tbody tr').forEach(tr=>tr.classList.toggle('active',+tr.dataset.rule===r));
+  view.scrollTop=0;detail.textContent='';render();}
+document.querySelectorAll('#rulesTbl tbody tr').forEach(tr=>tr.addEventListener('click',e=>{e.preventDefault();select(+tr.dataset.rule);}));
+document.getElementById('findingFilter').addEventListener('input',e=>{if(rule===null)return;
+  const v=e.target.value.toLowerCase(), seq=++filterSeq;
+  if(!v){filtered=null;render();return;}
+  const all=[];for(let n=0;n<M.rules[rule].pages;n++)all.push(loadPage(rule,n));
+  info.textContent='carregando '+all.length+' página(s)...';
+  Promise.all(all).then(ps=>{if(seq!==filterSeq)return;
+    filtered=ps.flat().filter(r=>(label(r)+' '+JSON.stringify(r[3])).toLowerCase().includes(v));view.scrollTop=0;render();});});
+if(M.rules.length)select(0);
+</script>"""
+
+
+def _sev_class(sev: str) -> str:
+    return {
+        "info": "sev-info",
+        "low": "sev-low",
+        "medium": "sev-medium",
+        "high": "sev-high",
+        "critical": "sev-critical",
+    }.get(sev, "")
+
+
+def _badge(sev: str) -> str:
+    label = SEVERITY_LABEL.get(sev, sev)
+    cls = {
+        "info": "b-info",
+        "low": "b-low",
+        "medium": "b-medium",
+        "high": "b-high",
+        "critical": "b-critical",
+    }.get(sev, "b-medium")
+    return f"<span class='badge {cls}'>{label}</span>"
+
+
+def _write_html_overview(html, model: ReportModel, traffic: Optional[Dict], extra_css: str = "") -> None:
+    """Cabeçalho, resumo, linha do tempo, tráfego e tabela de regras (comum aos dois modos de HTML)."""
+    interval, buckets = model.timeline()
+    html.write("<!DOCTYPE html><html lang='pt-br'><head><meta charset='utf-8'>")
+    html.write("<meta name='viewport' content='width=device-width, initial-scale=1'>")
+    html.write("<title>Relatório de Análise de Logs - SYNAPSE</title>")
+    html.write(f"<style>{HTML_CSS}{extra_css}</style></head><body>")
+    html.write("<h1>Relatório de Análise de Logs - SYNAPSE</h1>")
+    html.write(f"<small>Gerado em {model.generated_at}</small>")
+    html.write(f"<p><strong>Total de ocorrências:</strong> {model.total}</p>")
+
+    html.write("<h2>Resumo por severidade</h2>")
+    html.write("<div class='grid'>")
+    for s in reversed(SEVERITY_ORDER):
+        count = model.by_severity.get(s, 0)
+        if count:
+            html.write(f"<div class='card {_sev_class(s)}'><div>{_badge(s)}</div><div style='font-size:28px;font-weight:700'>{count}</div><div class='muted'>ocorrências</div></div>")
+    html.write("</div>")
+
+    if buckets:
+        peak = max(count for _start, count in buckets)
+        html.write("<h2>Linha do tempo</h2>")
+        html.write(f"<p class='muted'>Ocorrências por {INTERVAL_LABEL[interval]} (UTC)</p>")
+        html.write("<table><thead><tr><th>Início</th><th>Ocorrências</th><th></th></tr></thead><tbody>")
+        for start, count in buckets:
+            width = max(1, round(count * 100 / peak))
+            html.write(f"<tr><td>{start}</td><td>{count}</td><td style='width:50%'><div style='background:#2f86eb;height:10px;width:{width}%'></div></td></tr>")
+        html.write("</tbody></table>")
+
+    if traffic:
+        _write_traffic_html(html, traffic)
+
+    html.write("<h2>Principais regras</h2>")
+    html.write("<input id='filter' type='search' placeholder='Filtrar por regra, severidade ou descrição...'>")
+    html.write("<table id='rulesTbl'><thead><tr><th>Regra</th><th>Severidade</th><th>Ocorrências</th><th>Descrição</th></tr></thead><tbody>")
+    for index, g in enumerate(model.groups):
+        html.write(
+            f"<tr class='{_sev_class(g.severity)}' data-rule='{index}'><td><a href='#rule-{g.rule_id}'><code>{g.rule_id}</code></a></td><td>{_badge(g.severity)}</td><td>{g.count}</td><td>{g.description}</td></tr>"
+        )
+    html.write("</tbody></table>")
+
+
+def _write_shard(directory: str, shard_id: str, rows: List) -> None:
+    payload = gzip.compress(json.dumps(rows, ensure_ascii=False).encode("utf-8"), compresslevel=6)
+    encoded = base64.b64encode(payload).decode("ascii")
+    with _atomic_open(os.path.join(directory, f"{shard_id}.js"), encoding="ascii") as f:
+        f.write(f'window.synapseShard("{shard_id}","{encoded}");\n')
 
 
 class ReportWriter:
     def __init__(self, output_dir: str) -> None:
         self.output_dir = output_dir
 
-    def write_json(self, findings: List[Dict], filename: str) -> str:
+    def write_reports(
+        self,
+        findings: List[Dict],
+        formats: Iterable[str],
+        base_name: str = "synapse_report",
+        traffic: Optional[Dict] = None,
+        model: Optional[ReportModel] = None,
+        html_mode: str = "single",
+    ) -> List[str]:
+        """Gera os formatos pedidos a partir de um único ReportModel (uma passada de agregação)."""
+        formats = set(formats)
+        model = model or build_report_model(findings)
+        paths: List[str] = []
+        if "json" in formats:
+            paths.append(self.write_json(findings, f"{base_name}.json", extras={"traffic": traffic} if traffic else None))
+        if "csv" in formats:
+            paths.append(self.write_csv(findings, f"{base_name}.csv", model=model))
+        if "md" in formats or "markdown" in formats:
+            paths.append(self.write_markdown(findings, f"{base_name}.md", traffic=traffic, model=model))
+        if "txt" in formats:
+            paths.append(self.write_txt_simple(findings, f"{base_name}.txt", model=model))
+        if "html" in formats:
+            # "sharded": índice leve + achados em shards carregados sob demanda
+            write_html = self.write_html_sharded if html_mode == "sharded" else self.write_html
+            paths.append(write_html(findings, f"{base_name}.html", traffic=traffic, model=model))
+        return paths
+
+    def write_json(self, findings: List[Dict], filename: str, extras: Optional[Dict] = None) -> str:
         path = os.path.join(self.output_dir, filename)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(findings, f, ensure_ascii=False, indent=2)
+        # com dados extras (ex.: analytics) o relatório vira {"findings": [...], ...}
+        data = {"findings": findings, **extras} if extras else findings
+        with _atomic_open(path) as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
         return path
 
-    def write_csv(self, findings: List[Dict], filename: str) -> str:
+    def write_csv(self, findings: List[Dict], filename: str, model: Optional[ReportModel] = None) -> str:
         path = os.path.join(self.output_dir, filename)
-        sources = sorted({item.get("source_file", "?") for item in findings})
+        sources = model.sources if model else sorted({item.get("source_file", "?") for item in findings})
         if not findings:
-            with open(path, "w", newline="", encoding="utf-8") as f:
+            with _atomic_open(path, newline="") as f:
                 # Cabeçalho informativo com arquivos analisados
                 if sources:
                     f.write("# arquivos_analisados: " + " | ".join(sources) + "\n")
@@ -73,7 +517,7 @@ class ReportWriter:
                 writer.writerow(["rule_id", "severity", "description", "source_file", "recommendation", "event"])
             return path
         keys = ["rule_id", "severity", "description", "source_file", "recommendation", "event"]
-        with open(path, "w", newline="", encoding="utf-8") as f:
+        with _atomic_open(path, newline="") as f:
             # Cabeçalho informativo com arquivos analisados
             if sources:
                 f.write("# arquivos_analisados: " + " | ".join(sources) + "\n")
@@ -85,14 +529,22 @@ class ReportWriter:
                 writer.writerow(row)
         return path
 
-    def write_markdown(self, findings: List[Dict], filename: str) -> str:
+    def write_markdown(
+        self,
+        findings: List[Dict],
+        filename: str,
+        traffic: Optional[Dict] = None,
+        model: Optional[ReportModel] = None,
+    ) -> str:
         path = os.path.join(self.output_dir, filename)
-        generated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        sev_summary = _summarize_by_severity(findings)
-        groups = _aggregate_by_rule(findings)
-        total = len(findings)
-        sources = sorted({item.get("source_file", "?") for item in findings})
-        with open(path, "w", encoding="utf-8") as md:
+        model = model or build_report_model(findings)
+        generated_at = model.generated_at
+        sev_summary = model.by_severity
+        groups = model.groups
+        interval, buckets = model.timeline()
+        total = model.total
+        sources = model.sources
+        with _atomic_open(path) as md:
             md.write("# Relatório de Análise de Logs - SYNAPSE\n\n")
             md.write(f"Gerado em: {generated_at}  \n")
             md.write(f"Total de ocorrências: **{total}**\n\n")
@@ -103,6 +555,10 @@ class ReportWriter:
                 md.write("\n")
             md.write("## Índice\n\n")
             md.write("- [Resumo por severidade](#resumo-por-severidade)\n")
+            if buckets:
+                md.write("- [Linha do tempo](#linha-do-tempo)\n")
+            if traffic:
+                md.write("- [Tráfego](#tráfego)\n")
             md.write("- [Principais regras](#principais-regras)\n")
             if groups:
                 md.write("- [Detalhes por regra](#detalhes-por-regra)\n")
@@ -117,126 +573,157 @@ class ReportWriter:
                     md.write(f"| {icon} {SEVERITY_LABEL.get(s, s)} | {count} |\n")
             md.write("\n")
 
+            if buckets:
+                md.write("## Linha do tempo\n\n")
+                md.write(f"Ocorrências por {INTERVAL_LABEL[interval]} (UTC):\n\n")
+                md.write("| Início | Ocorrências |\n|---|---:|\n")
+                for start, count in buckets:
+                    md.write(f"| {start} | {count} |\n")
+                md.write("\n")
+
+            if traffic:
+                _write_traffic_markdown(md, traffic)
+
             md.write("## Principais regras\n\n")
             md.write("| Regra | Severidade | Ocorrências | Descrição |\n|---|---|---:|---|\n")
             for g in groups:
-                icon = SEVERITY_EMOJI.get(g['severity'], "")
-                md.write(f"| [`{g['rule_id']}`](#regra-{g['rule_id']}) | {icon} {SEVERITY_LABEL.get(g['severity'], g['severity'])} | {len(g['items'])} | {g['description']} |\n")
+                icon = SEVERITY_EMOJI.get(g.severity, "")
+                md.write(f"| [`{g.rule_id}`](#regra-{g.rule_id}) | {icon} {SEVERITY_LABEL.get(g.severity, g.severity)} | {g.count} | {g.description} |\n")
             md.write("\n")
 
             md.write("## Detalhes por regra\n\n")
             for g in groups:
-                icon = SEVERITY_EMOJI.get(g['severity'], "")
-                md.write(f"<a id=\"regra-{g['rule_id']}\"></a>\n")
-                md.write(f"### {icon} `{g['rule_id']}` — {SEVERITY_LABEL.get(g['severity'], g['severity'])} ({len(g['items'])})\n\n")
-                if g.get("description"):
-                    md.write(f"{g['description']}\n\n")
-                if g.get("recommendation"):
-                    md.write(f"- **Recomendação**: {g['recommendation']}\n\n")
-                if g.get("per_file"):
+                icon = SEVERITY_EMOJI.get(g.severity, "")
+                md.write(f"<a id=\"regra-{g.rule_id}\"></a>\n")
+                md.write(f"### {icon} `{g.rule_id}` — {SEVERITY_LABEL.get(g.severity, g.severity)} ({g.count})\n\n")
+                if g.description:
+                    md.write(f"{g.description}\n\n")
+                if g.recommendation:
+                    md.write(f"- **Recomendação**: {g.recommendation}\n\n")
+                if g.per_file:
                     md.write("Arquivos afetados:\n\n")
                     md.write("| Arquivo | Ocorrências |\n|---|---:|\n")
-                    for fname, cnt in sorted(g["per_file"].items(), key=lambda kv: kv[1], reverse=True):
-                        md.write(f"| `{fname}` | {cnt} |\n")
+                    for fname, cnt in sorted(g.per_file.items(), key=lambda kv: kv[1], reverse=True):
+                        md.write(f"| {_md_code(fname)} | {cnt} |\n")
                     md.write("\n")
-                md.write("Exemplos de eventos (até 5):\n\n")
-                for sample in g["items"][:5]:
+                _stats_markdown(md, g.stats)
+                md.write(f"Exemplos de eventos (amostra de até {SAMPLE_SIZE}):\n\n")
+                for sample in g.samples:
                     pretty = json.dumps(sample.get("event", {}), ensure_ascii=False, indent=2)
-                    md.write("```json\n")
+                    # o evento pode conter ``` e fechar o bloco antes da hora
+                    fence = "`" * max(3, max((len(run) for run in re.findall("`+", pretty)), default=0) + 1)
+                    md.write(f"{fence}json\n")
                     md.write(pretty + "\n")
-                    md.write("```\n\n")
+                    md.write(f"{fence}\n\n")
         return path
 
-    def write_html(self, findings: List[Dict], filename: str) -> str:
+    def write_html(
+        self,
+        findings: List[Dict],
+        filename: str,
+        traffic: Optional[Dict] = None,
+        model: Optional[ReportModel] = None,
+    ) -> str:
         path = os.path.join(self.output_dir, filename)
-        generated_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        sev_summary = _summarize_by_severity(findings)
-        groups = _aggregate_by_rule(findings)
-        total = len(findings)
-        css = (
-            "body{font-family:Segoe UI,Roboto,Arial,sans-serif;margin:20px;}"
-            "h1{margin-bottom:0;} small{color:#555;} table{border-collapse:collapse;width:100%;}"
-            "th,td{border:1px solid #ddd;padding:8px;} th{background:#f5f5f5;text-align:left;}"
-            ".sev-info{background:#eef5ff;} .sev-low{background:#effaf0;} .sev-medium{background:#fff7e6;}"
-            ".sev-high{background:#ffecec;} .sev-critical{background:#ffe1e1;} .badge{padding:2px 6px;border-radius:4px;}"
-            ".b-info{background:#2f86eb;color:#fff;} .b-low{background:#2ecc71;color:#fff;} .b-medium{background:#f39c12;color:#fff;}"
-            ".b-high{background:#e74c3c;color:#fff;} .b-critical{background:#c0392b;color:#fff;} pre{background:#f8f8f8;padding:8px;overflow:auto;}"
-            "details{margin:8px 0;} summary{cursor:pointer;} .grid{display:grid;grid-template-columns:repeat(auto-fit,minmax(160px,1fr));gap:12px;margin:12px 0;}"
-            ".card{border:1px solid #ddd;border-radius:8px;padding:12px;background:#fff;} .muted{color:#666;}"
-            "#filter{padding:8px;border:1px solid #ccc;border-radius:6px;width:100%;max-width:420px;}"
-        )
-        def sev_class(sev: str) -> str:
-            return {
-                "info": "sev-info",
-                "low": "sev-low",
-                "medium": "sev-medium",
-                "high": "sev-high",
-                "critical": "sev-critical",
-            }.get(sev, "")
-
-        def badge(sev: str) -> str:
-            label = SEVERITY_LABEL.get(sev, sev)
-            cls = {
-                "info": "b-info",
-                "low": "b-low",
-                "medium": "b-medium",
-                "high": "b-high",
-                "critical": "b-critical",
-            }.get(sev, "b-medium")
-            return f"<span class='badge {cls}'>{label}</span>"
-
-        with open(path, "w", encoding="utf-8") as html:
-            html.write("<!DOCTYPE html><html lang='pt-br'><head><meta charset='utf-8'>")
-            html.write("<meta name='viewport' content='width=device-width, initial-scale=1'>")
-            html.write("<title>Relatório de Análise de Logs - SYNAPSE</title>")
-            html.write(f"<style>{css}</style></head><body>")
-            html.write("<h1>Relatório de Análise de Logs - SYNAPSE</h1>")
-            html.write(f"<small>Gerado em {generated_at}</small>")
-            html.write(f"<p><strong>Total de ocorrências:</strong> {total}</p>")
-
-            html.write("<h2>Resumo por severidade</h2>")
-            html.write("<div class='grid'>")
-            for s in reversed(SEVERITY_ORDER):
-                count = sev_summary.get(s, 0)
-                if count:
-                    html.write(f"<div class='card {sev_class(s)}'><div>{badge(s)}</div><div style='font-size:28px;font-weight:700'>{count}</div><div class='muted'>ocorrências</div></div>")
-            html.write("</div>")
-
-            html.write("<h2>Principais regras</h2>")
-            html.write("<input id='filter' type='search' placeholder='Filtrar por regra, severidade ou descrição...'>")
-            html.write("<table id='rulesTbl'><thead><tr><th>Regra</th><th>Severidade</th><th>Ocorrências</th><th>Descrição</th></tr></thead><tbody>")
-            for g in groups:
-                html.write(
-                    f"<tr class='{sev_class(g['severity'])}'><td><a href='#rule-{g['rule_id']}'><code>{g['rule_id']}</code></a></td><td>{badge(g['severity'])}</td><td>{len(g['items'])}</td><td>{g['description']}</td></tr>"
-                )
-            html.write("</tbody></table>")
+        model = model or build_report_model(findings)
+        groups = model.groups
+        with _atomic_open(path) as html:
+            _write_html_overview(html, model, traffic)
 
             html.write("<h2>Detalhes por regra</h2>")
             for g in groups:
-                html.write(f"<h3 id='rule-{g['rule_id']}'><code>{g['rule_id']}</code> — {badge(g['severity'])} ({len(g['items'])})</h3>")
-                if g.get("description"):
-                    html.write(f"<p>{g['description']}</p>")
-                if g.get("recommendation"):
-                    html.write(f"<p><strong>Recomendação:</strong> {g['recommendation']}</p>")
-                if g.get("per_file"):
+                html.write(f"<h3 id='rule-{g.rule_id}'><code>{g.rule_id}</code> — {_badge(g.severity)} ({g.count})</h3>")
+                if g.description:
+                    html.write(f"<p>{g.description}</p>")
+                if g.recommendation:
+                    html.write(f"<p><strong>Recomendação:</strong> {g.recommendation}</p>")
+                if g.per_file:
                     html.write("<h4>Arquivos afetados</h4>")
                     html.write("<table><thead><tr><th>Arquivo</th><th>Ocorrências</th></tr></thead><tbody>")
-                    for fname, cnt in sorted(g["per_file"].items(), key=lambda kv: kv[1], reverse=True):
-                        html.write(f"<tr><td><code>{fname}</code></td><td>{cnt}</td></tr>")
+                    for fname, cnt in sorted(g.per_file.items(), key=lambda kv: kv[1], reverse=True):
+                        html.write(f"<tr><td><code>{escape(str(fname))}</code></td><td>{cnt}</td></tr>")
                     html.write("</tbody></table>")
-                html.write("<h4>Exemplos (até 5)</h4>")
-                for sample in g["items"][:5]:
+                _stats_html(html, g.stats)
+                html.write(f"<h4>Exemplos (amostra de até {SAMPLE_SIZE})</h4>")
+                for sample in g.samples:
                     pretty = json.dumps(sample.get("event", {}), ensure_ascii=False, indent=2)
                     html.write("<details><summary>Evento</summary>")
-                    html.write(f"<pre>{pretty}</pre>")
+                    html.write(f"<pre>{escape(pretty)}</pre>")
                     html.write("</details>")
-            html.write("<script>\nconst q=document.getElementById('filter');\nconst rows=[...document.querySelectorAll('#rulesTbl tbody tr')];\nq&&q.addEventListener('input',()=>{const v=q.value.toLowerCase();rows.forEach(r=>{r.style.display=r.innerText.toLowerCase().includes(v)?'':'none';});});\n</script>")
+            html.write(RULES_FILTER_JS)
+        return path
+
+    def write_html_sharded(
+        self,
+        findings: List[Dict],
+        filename: str,
+        traffic: Optional[Dict] = None,
+        model: Optional[ReportModel] = None,
+        page_size: int = SHARD_PAGE_SIZE,
+    ) -> str:
+        """
+        HTML para grandes volumes: a página principal traz só o resumo e a tabela de
+        regras; os achados vão para shards compactados por regra/página
+        (`<nome>_shards/r<regra>-p<página>.js`), carregados sob demanda pelo navegador.
+        """
+        path = os.path.join(self.output_dir, filename)
+        model = model or build_report_model(findings)
+        shard_dirname = os.path.splitext(filename)[0] + "_shards"
+        shard_dir = os.path.join(self.output_dir, shard_dirname)
+        os.makedirs(shard_dir, exist_ok=True)
+        for name in os.listdir(shard_dir):
+            if name.endswith(".js"):
+                os.unlink(os.path.join(shard_dir, name))
+
+        rule_index = {g.rule_id: i for i, g in enumerate(model.groups)}
+        file_index = {name: i for i, name in enumerate(model.sources)}
+        buffers: List[List] = [[] for _ in model.groups]
+        pages = [0] * len(model.groups)
+        for f in findings:
+            i = rule_index[f.get("rule_id", "desconhecida")]
+            buffers[i].append([
+                f.get("timestamp"),
+                file_index[f.get("source_file", "?")],
+                f.get("raw_line") or "",
+                f.get("event", {}),
+            ])
+            if len(buffers[i]) >= page_size:
+                _write_shard(shard_dir, f"r{i}-p{pages[i]}", buffers[i])
+                pages[i] += 1
+                buffers[i] = []
+        for i, rows in enumerate(buffers):
+            if rows:
+                _write_shard(shard_dir, f"r{i}-p{pages[i]}", rows)
+                pages[i] += 1
+
+        manifest = {
+            "dir": shard_dirname,
+            "page_size": page_size,
+            "row_height": SHARD_ROW_HEIGHT,
+            "files": model.sources,
+            "rules": [
+                {"rule_id": g.rule_id, "count": g.count, "pages": pages[i]}
+                for i, g in enumerate(model.groups)
+            ],
+        }
+        manifest_json = json.dumps(manifest, ensure_ascii=False).replace("</", "<\\/")
+        with _atomic_open(path) as html:
+            _write_html_overview(html, model, traffic, extra_css=SHARDED_CSS)
+            html.write("<h2>Ocorrências</h2>")
+            html.write("<p class='muted' id='viewerInfo'>Selecione uma regra na tabela acima.</p>")
+            html.write("<input id='findingFilter' type='search' placeholder='Filtrar ocorrências da regra selecionada...'>")
+            html.write("<div id='viewer'><div id='spacer' style='position:relative'></div></div>")
+            html.write("<h3>Evento</h3><pre id='detail'></pre>")
+            html.write(f"<script type='application/json' id='manifest'>{manifest_json}</script>")
+            html.write(RULES_FILTER_JS)
+            html.write(SHARDED_VIEWER_JS)
+            html.write("</body></html>")
         return path
 
-    def write_txt_simple(self, findings: List[Dict], filename: str) -> str:
+    def write_txt_simple(self, findings: List[Dict], filename: str, model: Optional[ReportModel] = None) -> str:
         path = os.path.join(self.output_dir, filename)
-        with open(path, "w", encoding="utf-8") as f:
-            sources = sorted({item.get("source_file", "?") for item in findings})
+        with _atomic_open(path) as f:
+            sources = model.sources if model else sorted({item.get("source_file", "?") for item in findings})
             if sources:
                 f.write("arquivos_analisados:\n")
                 for s in sources:
@@ -1,9 +1,11 @@
+import hashlib
 import json
 import os
 import re
-from dataclasses import dataclass
-from typing import Dict, List, Pattern
+from dataclasses import dataclass, field
+from typing import Dict, FrozenSet, Iterable, List, Optional, Pattern, Tuple
 
+from .parsers import SOURCE_TYPES
 
 SEVERITY_ORDER = ["info", "low", "medium", "high", "critical"]
 
@@ -15,6 +17,57 @@ class Rule:
     severity: str
     pattern: Pattern[str]
     recommendation: str
+    # tipos de origem em que a regra se aplica (vazio = todos); ver parsers.SOURCE_TYPES
+    sources: Tuple[str, ...] = ()
+    # condições sobre o enriquecimento do IP (ex.: {"ip_zone": {"dmz"}}); todas precisam casar
+    where: Dict[str, FrozenSet[str]] = field(default_factory=dict)
+    # tipos de origem informados que não existem (ignorados; ver regex_guard.audit_rules)
+    unknown_sources: Tuple[str, ...] = ()
+
+    def applies_to(self, source_type: str) -> bool:
+        return not self.sources or source_type in self.sources
+
+    def accepts(self, labels: Dict[str, str]) -> bool:
+        return all(labels.get(name) in values for name, values in self.where.items())
+
+
+def parse_where(value) -> Dict[str, FrozenSet[str]]:
+    """{"campo": "valor" | ["valores"]} -> {campo: frozenset}; ValueError se malformado."""
+    if not value:
+        return {}
+    if not isinstance(value, dict):
+        raise ValueError("'where' deve ser um objeto {campo: valores}")
+    where: Dict[str, FrozenSet[str]] = {}
+    for name, values in value.items():
+        if isinstance(values, str):
+            values = [values]
+        if not isinstance(values, list) or not values or not all(isinstance(v, str) for v in values):
+            raise ValueError(f"'where.{name}' deve ser um texto ou uma lista de textos")
+        where[str(name)] = frozenset(v.strip() for v in values)
+    return where
+
+
+def parse_sources(value) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """
+    "apache" | ["apache", "syslog"] -> (tipos conhecidos, tipos desconhecidos).
+    Um texto sozinho vale como lista de um item (e não como lista de caracteres).
+    """
+    if not value:
+        return (), ()
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, (list, tuple)) or not all(isinstance(v, str) for v in value):
+        raise ValueError("'sources' deve ser um texto ou uma lista de textos")
+    known: List[str] = []
+    unknown: List[str] = []
+    for item in value:
+        name = item.strip().lower()
+        if not name:
+            continue
+        target = known if name in SOURCE_TYPES else unknown
+        if name not in target:
+            target.append(name)
+    return tuple(known), tuple(unknown)
 
 
 def load_rules_from_json(path: str) -> List[Rule]:
@@ -22,9 +75,16 @@ def load_rules_from_json(path: str) -> List[Rule]:
         return default_rules()
     with open(path, "r", encoding="utf-8") as f:
         data = json.load(f)
+    rules = rules_from_records(data)
+    return rules if rules else default_rules()
+
+
+def rules_from_records(records: Iterable[Dict]) -> List[Rule]:
+    """Compila regras a partir de registros no formato do rules.json (ignora inválidas)."""
     rules: List[Rule] = []
-    for item in data:
+    for item in records:
         try:
+            sources, unknown_sources = parse_sources(item.get("sources"))
             rules.append(
                 Rule(
                     id=item["id"],
@@ -32,11 +92,45 @@ def load_rules_from_json(path: str) -> List[Rule]:
                     severity=item.get("severity", "medium"),
                     pattern=re.compile(item["regex"], re.IGNORECASE),
                     recommendation=item.get("recommendation", "Sem recomendação."),
+                    sources=sources,
+                    where=parse_where(item.get("where")),
+                    unknown_sources=unknown_sources,
                 )
             )
         except Exception:
             continue
-    return rules if rules else default_rules()
+    return rules
+
+
+def bytes_pattern(rule: Rule, multiline: bool = False) -> Optional[Pattern[bytes]]:
+    """
+    A regex da regra compilada sobre bytes, para casar linhas ASCII sem decodificar.
+    None se o padrão não for ASCII (a regra continua só no modo texto).
+    `multiline` faz ^/$ casarem em cada linha (busca no arquivo inteiro).
+    """
+    flags = rule.pattern.flags & ~re.UNICODE
+    if multiline:
+        flags |= re.MULTILINE
+    try:
+        source = rule.pattern.pattern.encode("ascii")
+        return re.compile(source, flags)
+    except (UnicodeEncodeError, re.error):
+        return None
+
+
+def ruleset_fingerprint(rules: List[Rule]) -> str:
+    """Hash estável do conjunto de regras (muda se qualquer regra mudar)."""
+    h = hashlib.sha256()
+    for rule in rules:
+        item = [
+            rule.id, rule.description, rule.severity, rule.pattern.pattern, rule.pattern.flags,
+            rule.recommendation, list(rule.sources),
+        ]
+        if rule.where:
+            item.append({name: sorted(values) for name, values in sorted(rule.where.items())})
+        h.update(json.dumps(item, ensure_ascii=False).encode("utf-8"))
+        h.update(b"\n")
+    return h.hexdigest()
 
 
 def default_rules() -> List[Rule]:
@@ -0,0 +1,226 @@
+import base64
+import hashlib
+import math
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+class SpaceSaving:
+    """
+    Top-K aproximado (algoritmo Space-Saving, Metwally et al.).
+
+    Mantém no máximo `capacity` contadores: quando um item novo chega com a
+    tabela cheia, ele herda o contador do menor item (que é descartado) e esse
+    valor fica registrado como erro máximo da contagem. Itens com frequência
+    acima de N/capacity sempre aparecem. O estado é mesclável entre workers.
+    """
+
+    def __init__(self, capacity: int = 64) -> None:
+        self.capacity = max(1, capacity)
+        self.total = 0
+        self.counts: Dict[Hashable, int] = {}
+        self.errors: Dict[Hashable, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def add(self, item: Hashable, count: int = 1) -> None:
+        self.total += count
+        if item in self.counts:
+            self.counts[item] += count
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+            return
+        victim = min(self.counts, key=self.counts.__getitem__)
+        floor = self.counts.pop(victim)
+        del self.errors[victim]
+        self.counts[item] = floor + count
+        self.errors[item] = floor
+
+    def _min_count(self) -> int:
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """Combina outro sketch neste (Agarwal et al., "Mergeable Summaries")."""
+        own_floor = self._min_count()
+        other_floor = other._min_count()
+        counts: Dict[Hashable, int] = {}
+        errors: Dict[Hashable, int] = {}
+        for item in set(self.counts) | set(other.counts):
+            # item ausente de um lado pode ter até o mínimo daquele lado
+            counts[item] = self.counts.get(item, own_floor) + other.counts.get(item, other_floor)
+            errors[item] = self.errors.get(item, own_floor) + other.errors.get(item, other_floor)
+        keep = sorted(counts, key=counts.__getitem__, reverse=True)[: self.capacity]
+        self.counts = {item: counts[item] for item in keep}
+        self.errors = {item: errors[item] for item in keep}
+        self.total += other.total
+        return self
+
+    def top(self, n: int = 10) -> List[Tuple[Hashable, int, int]]:
+        """Os `n` itens mais frequentes como (item, contagem estimada, erro máximo)."""
+        ranked = sorted(self.counts.items(), key=lambda kv: kv[1], reverse=True)[:n]
+        return [(item, count, self.errors[item]) for item, count in ranked]
+
+    def to_dict(self) -> Dict:
+        return {
+            "capacity": self.capacity,
+            "total": self.total,
+            "items": [[item, count, self.errors[item]] for item, count in self.counts.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "SpaceSaving":
+        sketch = cls(capacity=data["capacity"])
+        sketch.total = data["total"]
+        for item, count, error in data["items"]:
+            sketch.counts[item] = count
+            sketch.errors[item] = error
+        return sketch
+
+
+class HyperLogLog:
+    """
+    Contagem aproximada de distintos (HyperLogLog com correção para cardinalidades baixas).
+
+    Usa 2**precision registradores de um byte: com a precisão padrão (12) são
+    4 KiB por sketch e erro padrão de ~1,6%, independentemente do volume.
+    A mesclagem é o máximo registrador a registrador.
+    """
+
+    def __init__(self, precision: int = 12) -> None:
+        if not 4 <= precision <= 16:
+            raise ValueError("precision deve estar entre 4 e 16")
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+
+    @staticmethod
+    def _hash(item: Hashable) -> int:
+        data = item if isinstance(item, bytes) else str(item).encode("utf-8", "surrogatepass")
+        return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+    def add(self, item: Hashable) -> None:
+        h = self._hash(item)
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        # posição do primeiro bit 1 nos bits restantes (1-based)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.precision != self.precision:
+            raise ValueError("não é possível mesclar HyperLogLog com precisões diferentes")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self) -> int:
+        m = self.size
+        if m >= 128:
+            alpha = 0.7213 / (1 + 1.079 / m)
+        else:
+            alpha = {16: 0.673, 32: 0.697, 64: 0.709}[m]
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # linear counting é mais preciso enquanto há registradores vazios
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def to_dict(self) -> Dict:
+        return {
+            "precision": self.precision,
+            "registers": base64.b64encode(bytes(self.registers)).decode("ascii"),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "HyperLogLog":
+        sketch = cls(precision=data["precision"])
+        registers = base64.b64decode(data["registers"])
+        if len(registers) != sketch.size:
+            raise ValueError("registradores do HyperLogLog com tamanho inválido")
+        sketch.registers = bytearray(registers)
+        return sketch
+
+
+class RuleSketches:
+    """
+    Top IPs/paths/user agents e IPs distintos de uma regra, com memória fixa;
+    e top de cada rótulo de enriquecimento (ASN, país, zona...) presente nos achados.
+    """
+
+    def __init__(self, capacity: int = 128, precision: int = 12) -> None:
+        self.capacity = capacity
+        self.ips = SpaceSaving(capacity)
+        self.paths = SpaceSaving(capacity)
+        self.user_agents = SpaceSaving(capacity)
+        self.unique_ips = HyperLogLog(precision)
+        self.labels: Dict[str, SpaceSaving] = {}
+
+    def add(
+        self,
+        ip: Optional[str],
+        path: Optional[str],
+        user_agent: Optional[str],
+        labels: Optional[Dict[str, str]] = None,
+    ) -> None:
+        if ip:
+            self.ips.add(ip)
+            self.unique_ips.add(ip)
+        if path:
+            self.paths.add(path)
+        if user_agent:
+            self.user_agents.add(user_agent)
+        if labels:
+            for name, value in labels.items():
+                sketch = self.labels.get(name)
+                if sketch is None:
+                    sketch = self.labels[name] = SpaceSaving(self.capacity)
+                sketch.add(value)
+
+    def merge(self, other: "RuleSketches") -> "RuleSketches":
+        self.ips.merge(other.ips)
+        self.paths.merge(other.paths)
+        self.user_agents.merge(other.user_agents)
+        self.unique_ips.merge(other.unique_ips)
+        for name, sketch in other.labels.items():
+            if name in self.labels:
+                self.labels[name].merge(sketch)
+            else:
+                self.labels[name] = SpaceSaving.from_dict(sketch.to_dict())
+        return self
+
+    def summary(self, n: int = 10) -> Dict:
+        def rows(sketch: SpaceSaving) -> List[Dict]:
+            return [{"value": item, "count": count, "error": error} for item, count, error in sketch.top(n)]
+
+        return {
+            "unique_ips": self.unique_ips.count(),
+            "top_ips": rows(self.ips),
+            "top_paths": rows(self.paths),
+            "top_user_agents": rows(self.user_agents),
+            "top_labels": {name: rows(sketch) for name, sketch in sorted(self.labels.items())},
+        }
+
+    def to_dict(self) -> Dict:
+        return {
+            "ips": self.ips.to_dict(),
+            "paths": self.paths.to_dict(),
+            "user_agents": self.user_agents.to_dict(),
+            "unique_ips": self.unique_ips.to_dict(),
+            "labels": {name: sketch.to_dict() for name, sketch in self.labels.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "RuleSketches":
+        sketches = cls.__new__(cls)
+        sketches.ips = SpaceSaving.from_dict(data["ips"])
+        sketches.paths = SpaceSaving.from_dict(data["paths"])
+        sketches.user_agents = SpaceSaving.from_dict(data["user_agents"])
+        sketches.unique_ips = HyperLogLog.from_dict(data["unique_ips"])
+        sketches.capacity = sketches.ips.capacity
+        sketches.labels = {name: SpaceSaving.from_dict(item) for name, item in data.get("labels", {}).items()}
+        return sketches
@@ -0,0 +1,203 @@
+"""
+Supressões: achados de scanners internos, health checks e IPs conhecidos que
+não devem virar alerta. Aplicadas pelo analisador antes de montar o achado
+(sem serialização nem gravação do que seria descartado).
+
+Cada registro tem as condições `cidr` (IP ou rede), `path` e `user_agent` (regex)
+e, opcionalmente, `rule` (vazio = todas as regras); suprime quando todas as
+condições informadas casam. Registros só com `cidr` vão para um índice de
+intervalos ordenados (busca binária, O(log n)); os demais são exceções por regra.
+"""
+import bisect
+import hashlib
+import ipaddress
+import json
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+from .parsers import IP_FIELDS, PATH_FIELDS, UA_FIELDS, first_field
+
+ALL_RULES = ""
+
+
+@lru_cache(maxsize=65536)
+def ip_key(value: str) -> Optional[Tuple[int, int]]:
+    """(versão, inteiro) de um IP; IPv4 mapeado em IPv6 vira IPv4. None se inválido."""
+    try:
+        address = ipaddress.ip_address(value.strip())
+    except ValueError:
+        return None
+    if address.version == 6 and address.ipv4_mapped is not None:
+        address = address.ipv4_mapped
+    return address.version, int(address)
+
+
+class IntervalIndex:
+    """Intervalos inteiros [início, fim] fundidos e ordenados; pertinência por bisect."""
+
+    def __init__(self, intervals: Iterable[Tuple[int, int]]):
+        merged: List[List[int]] = []
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self.starts = [start for start, _end in merged]
+        self.ends = [end for _start, end in merged]
+
+    def __contains__(self, value: int) -> bool:
+        i = bisect.bisect_right(self.starts, value) - 1
+        return i >= 0 and value <= self.ends[i]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+
+@dataclass
+class Suppression:
+    rule: str = ALL_RULES
+    # (versão, primeiro, último) da rede
+    network: Optional[Tuple[int, int, int]] = None
+    path: Optional[Pattern[str]] = None
+    user_agent: Optional[Pattern[str]] = None
+    comment: str = ""
+
+
+class EventAttributes:
+    """IP, path e user agent de um evento, extraídos só quando alguma supressão pede."""
+
+    __slots__ = ("event", "_ip", "_path", "_user_agent")
+    _MISSING = object()
+
+    def __init__(self, event: Dict):
+        self.event = event
+        self._ip = self._path = self._user_agent = self._MISSING
+
+    @property
+    def ip(self) -> Optional[Tuple[int, int]]:
+        if self._ip is self._MISSING:
+            # só campos de IP: no texto livre o primeiro endereço pode ser o de destino
+            value = first_field(self.event, IP_FIELDS)
+            self._ip = ip_key(value) if value is not None else None
+        return self._ip
+
+    @property
+    def path(self) -> Optional[str]:
+        if self._path is self._MISSING:
+            self._path = first_field(self.event, PATH_FIELDS)
+        return self._path
+
+    @property
+    def user_agent(self) -> Optional[str]:
+        if self._user_agent is self._MISSING:
+            self._user_agent = first_field(self.event, UA_FIELDS)
+        return self._user_agent
+
+
+def _matches(suppression: Suppression, attributes: EventAttributes) -> bool:
+    if suppression.network is not None:
+        ip = attributes.ip
+        version, first, last = suppression.network
+        if ip is None or ip[0] != version or not first <= ip[1] <= last:
+            return False
+    if suppression.path is not None:
+        path = attributes.path
+        if path is None or not suppression.path.search(path):
+            return False
+    if suppression.user_agent is not None:
+        user_agent = attributes.user_agent
+        if user_agent is None or not suppression.user_agent.search(user_agent):
+            return False
+    return True
+
+
+class SuppressionSet:
+    def __init__(self, suppressions: List[Suppression]):
+        self.suppressions = suppressions
+        intervals: Dict[Tuple[str, int], List[Tuple[int, int]]] = {}
+        self._exceptions: Dict[str, List[Suppression]] = {}
+        for suppression in suppressions:
+            if suppression.path is None and suppression.user_agent is None:
+                version, first, last = suppression.network
+                intervals.setdefault((suppression.rule, version), []).append((first, last))
+            else:
+                self._exceptions.setdefault(suppression.rule, []).append(suppression)
+        # (regra, versão do IP) -> índice
+        self._networks: Dict[Tuple[str, int], IntervalIndex] = {
+            key: IntervalIndex(ranges) for key, ranges in intervals.items()
+        }
+        self._rules = {rule for rule, _version in self._networks} | set(self._exceptions)
+        self.digest = self._fingerprint()
+
+    def __len__(self) -> int:
+        return len(self.suppressions)
+
+    def _fingerprint(self) -> str:
+        h = hashlib.sha256()
+        for s in self.suppressions:
+            item = [
+                s.rule, list(s.network) if s.network else None,
+                s.path.pattern if s.path else None, s.user_agent.pattern if s.user_agent else None,
+            ]
+            h.update(json.dumps(item, ensure_ascii=False).encode("utf-8"))
+            h.update(b"\n")
+        return h.hexdigest()
+
+    def applies_to(self, rule_id: str) -> bool:
+        return ALL_RULES in self._rules or rule_id in self._rules
+
+    def suppresses(self, rule_id: str, attributes: EventAttributes) -> bool:
+        for scope in (rule_id, ALL_RULES):
+            if scope not in self._rules:
+                continue
+            ip = None
+            if (scope, 4) in self._networks or (scope, 6) in self._networks:
+                ip = attributes.ip
+            if ip is not None:
+                index = self._networks.get((scope, ip[0]))
+                if index is not None and ip[1] in index:
+                    return True
+            for suppression in self._exceptions.get(scope, ()):
+                if _matches(suppression, attributes):
+                    return True
+        return False
+
+
+def suppressions_from_records(records: Iterable[Dict]) -> SuppressionSet:
+    """
+    Compila supressões no formato {rule, cidr, path, user_agent, comment}; ignora
+    registros inválidos (CIDR ou regex inválidos, ou sem nenhuma condição).
+    """
+    suppressions: List[Suppression] = []
+    for item in records:
+        try:
+            network = None
+            if item.get("cidr"):
+                net = ipaddress.ip_network(item["cidr"].strip(), strict=False)
+                network = (net.version, int(net.network_address), int(net.broadcast_address))
+            path = re.compile(item["path"], re.IGNORECASE) if item.get("path") else None
+            user_agent = re.compile(item["user_agent"], re.IGNORECASE) if item.get("user_agent") else None
+        except (ValueError, TypeError, AttributeError, re.error):
+            continue
+        if network is None and path is None and user_agent is None:
+            continue
+        suppressions.append(
+            Suppression(
+                rule=(item.get("rule") or ALL_RULES).strip(),
+                network=network,
+                path=path,
+                user_agent=user_agent,
+                comment=item.get("comment") or "",
+            )
+        )
+    return SuppressionSet(suppressions)
+
+
+def load_suppressions_from_json(path: str) -> SuppressionSet:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, list):
+        raise ValueError("arquivo de supressões deve conter uma lista de registros")
+    return suppressions_from_records(data)
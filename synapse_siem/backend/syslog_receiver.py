@@ -0,0 +1,237 @@
+"""
+Receptor syslog em asyncio (UDP e TCP com enquadramento RFC 6587).
+
+As mensagens recebidas ficam numa fila limitada e são entregues em lotes a um
+`sink` (ex.: o buffer de ingestão do Django). Com a fila cheia, datagramas UDP
+são descartados (e contados) e conexões TCP param de ser lidas até a fila esvaziar,
+empurrando a pressão para o remetente.
+"""
+import asyncio
+import socket
+import time
+from typing import Callable, List, Optional, Set
+
+# Tamanho máximo de mensagem (octet-counting e non-transparent)
+MAX_MESSAGE_BYTES = 64 * 1024
+
+# SO_RCVBUF pedido para o socket UDP
+UDP_RCVBUF = 8 * 1024 * 1024
+
+# MSG-LEN tem no máximo estes dígitos antes do espaço
+MAX_LENGTH_DIGITS = 10
+
+
+class FramingError(Exception):
+    pass
+
+
+class SyslogFramer:
+    """
+    Enquadramento TCP da RFC 6587, decidido quadro a quadro: começando por dígito é
+    octet-counting (`MSG-LEN SP SYSLOG-MSG`); senão, non-transparent (terminado em LF).
+    """
+
+    def __init__(self, max_message_bytes: int = MAX_MESSAGE_BYTES):
+        self.max_message_bytes = max_message_bytes
+        self._buf = bytearray()
+
+    def feed(self, data: bytes) -> List[bytes]:
+        buf = self._buf
+        buf += data
+        messages: List[bytes] = []
+        pos = 0
+        size = len(buf)
+        while pos < size:
+            first = buf[pos]
+            if 48 <= first <= 57:
+                space = buf.find(b" ", pos, pos + MAX_LENGTH_DIGITS + 1)
+                if space < 0:
+                    if size - pos > MAX_LENGTH_DIGITS:
+                        raise FramingError("MSG-LEN inválido")
+                    break
+                digits = bytes(buf[pos:space])
+                if not digits.isdigit():
+                    raise FramingError("MSG-LEN inválido")
+                length = int(digits)
+                if length > self.max_message_bytes:
+                    raise FramingError(f"mensagem de {length} bytes excede o limite")
+                end = space + 1 + length
+                if end > size:
+                    break
+                messages.append(bytes(buf[space + 1:end]))
+                pos = end
+            elif first in (10, 13, 0):
+                # separadores soltos entre quadros
+                pos += 1
+            else:
+                newline = buf.find(b"\n", pos)
+                if newline < 0:
+                    if size - pos > self.max_message_bytes:
+                        raise FramingError("mensagem sem fim de linha excede o limite")
+                    break
+                messages.append(bytes(buf[pos:newline]))
+                pos = newline + 1
+        del buf[:pos]
+        return messages
+
+    def finish(self) -> List[bytes]:
+        """Resto sem LF no fim da conexão (non-transparent)"""
+        tail = bytes(self._buf).strip(b"\r\n\x00")
+        self._buf.clear()
+        if tail and not tail[:1].isdigit():
+            return [tail]
+        return []
+
+
+def normalize_message(data: bytes) -> str:
+    """Uma mensagem vira exatamente uma linha (quebras internas viram espaço)."""
+    text = data.decode("utf-8", errors="replace").strip("\r\n\x00")
+    return " ".join(text.splitlines())
+
+
+class _UdpProtocol(asyncio.DatagramProtocol):
+    def __init__(self, receiver: "SyslogReceiver"):
+        self.receiver = receiver
+
+    def datagram_received(self, data, addr):
+        self.receiver.accept(data)
+
+
+class _TcpProtocol(asyncio.Protocol):
+    def __init__(self, receiver: "SyslogReceiver"):
+        self.receiver = receiver
+        self.framer = SyslogFramer(receiver.max_message_bytes)
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.receiver.connections.add(transport)
+
+    def data_received(self, data):
+        try:
+            messages = self.framer.feed(data)
+        except FramingError:
+            self.receiver.framing_errors += 1
+            self.transport.close()
+            return
+        for message in messages:
+            self.receiver.accept(message, self.transport)
+
+    def connection_lost(self, exc):
+        for message in self.framer.finish():
+            self.receiver.accept(message)
+        self.receiver.connections.discard(self.transport)
+        self.receiver.paused.discard(self.transport)
+
+
+class SyslogReceiver:
+    """
+    Recebe syslog e entrega lotes de linhas a `sink(lines) -> bool`; False indica
+    destino cheio e o lote fica na fila para a próxima tentativa.
+    """
+
+    def __init__(
+        self,
+        sink: Callable[[List[str]], bool],
+        max_pending: int = 100_000,
+        batch_size: int = 5000,
+        flush_interval: float = 0.1,
+        max_message_bytes: int = MAX_MESSAGE_BYTES,
+    ):
+        self.sink = sink
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_message_bytes = max_message_bytes
+        self.pending: List[str] = []
+        self.connections: Set[asyncio.BaseTransport] = set()
+        self.paused: Set[asyncio.BaseTransport] = set()
+        self.received = 0
+        self.forwarded = 0
+        self.dropped = 0
+        self.framing_errors = 0
+
+    def accept(self, data: bytes, transport: Optional[asyncio.Transport] = None) -> None:
+        # UDP descarta com a fila cheia; TCP passa do limite no máximo pelo que já foi
+        # lido da conexão, que em seguida deixa de ser lida
+        if transport is None and len(self.pending) >= self.max_pending:
+            self.dropped += 1
+            return
+        message = normalize_message(data)
+        if not message.strip():
+            return
+        self.pending.append(message)
+        self.received += 1
+        if transport is not None and len(self.pending) >= self.max_pending and transport not in self.paused:
+            # TCP: para de ler esta conexão em vez de descartar
+            transport.pause_reading()
+            self.paused.add(transport)
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "forwarded": self.forwarded,
+            "dropped": self.dropped,
+            "framing_errors": self.framing_errors,
+            "pending": len(self.pending),
+            "connections": len(self.connections),
+        }
+
+    def forward(self) -> None:
+        """Entrega a fila ao sink em lotes, até acabar ou o sink recusar."""
+        while self.pending:
+            batch = self.pending[: self.batch_size]
+            if not self.sink(batch):
+                break
+            del self.pending[: len(batch)]
+            self.forwarded += len(batch)
+        if self.paused and len(self.pending) < self.max_pending // 2:
+            for transport in self.paused:
+                if not transport.is_closing():
+                    transport.resume_reading()
+            self.paused.clear()
+
+    async def serve(
+        self,
+        host: str,
+        udp_port: int,
+        tcp_port: int,
+        stop: asyncio.Event,
+        shutdown_timeout: float = 30.0,
+        udp_rcvbuf: int = UDP_RCVBUF,
+    ) -> None:
+        """Escuta até `stop`; depois fecha as portas e entrega o que ainda está na fila."""
+        loop = asyncio.get_running_loop()
+        udp_transport = None
+        tcp_server = None
+        if udp_port:
+            sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_DGRAM)
+            # rajadas ficam no buffer do kernel enquanto o loop trabalha (o SO pode limitar o valor)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, udp_rcvbuf)
+            sock.bind((host, udp_port))
+            udp_transport, _ = await loop.create_datagram_endpoint(lambda: _UdpProtocol(self), sock=sock)
+        if tcp_port:
+            tcp_server = await loop.create_server(lambda: _TcpProtocol(self), host, tcp_port)
+        try:
+            while not stop.is_set():
+                try:
+                    await asyncio.wait_for(stop.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self.forward()
+        finally:
+            if udp_transport is not None:
+                udp_transport.close()
+            if tcp_server is not None:
+                tcp_server.close()
+                for transport in list(self.connections):
+                    transport.close()
+                await tcp_server.wait_closed()
+            # lotes em andamento: entrega o que couber no prazo; o resto conta como descarte
+            deadline = time.monotonic() + shutdown_timeout
+            self.forward()
+            while self.pending and time.monotonic() < deadline:
+                await asyncio.sleep(self.flush_interval)
+                self.forward()
+            self.dropped += len(self.pending)
+            self.pending.clear()
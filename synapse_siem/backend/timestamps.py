@@ -0,0 +1,231 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+MONTHS = {
+    "Jan": 1, "Feb": 2, "Mar": 3, "Apr": 4, "May": 5, "Jun": 6,
+    "Jul": 7, "Aug": 8, "Sep": 9, "Oct": 10, "Nov": 11, "Dec": 12,
+}
+
+# campos de data mais comuns em logs estruturados (JSON/JSONL/CSV)
+TIME_FIELDS = ("@timestamp", "timestamp", "time", "ts", "datetime", "date", "event_time", "eventTime")
+
+MINUTE = 60
+HOUR = 3600
+INTERVALS = {"minute": MINUTE, "hour": HOUR}
+
+
+def _offset(text: str) -> Optional[timezone]:
+    """Fuso no formato Z, +HHMM ou +HH:MM (vazio = UTC)."""
+    if text in ("", "Z", "z"):
+        return timezone.utc
+    if len(text) not in (5, 6) or text[0] not in "+-":
+        return None
+    digits = text[1:].replace(":", "")
+    if len(digits) != 4 or not digits.isdigit():
+        return None
+    delta = timedelta(hours=int(digits[:2]), minutes=int(digits[2:]))
+    return timezone(-delta if text[0] == "-" else delta)
+
+
+def to_iso(epoch: Optional[float]) -> Optional[str]:
+    if epoch is None:
+        return None
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).isoformat()
+
+
+def to_datetime(epoch: Optional[float]) -> Optional[datetime]:
+    if epoch is None:
+        return None
+    return datetime.fromtimestamp(epoch, tz=timezone.utc)
+
+
+def bucket_start(epoch: float, interval: str = "minute") -> int:
+    step = INTERVALS[interval]
+    return int(epoch) // step * step
+
+
+class TimestampNormalizer:
+    """
+    Converte os formatos de data dos parsers em epoch (segundos, UTC).
+
+    `strptime` em toda linha é caro; como linhas vizinhas quase sempre estão
+    no mesmo minuto, o epoch do prefixo "data + hora:minuto + fuso" é
+    memorizado e só os segundos são somados a cada linha.
+    """
+
+    def __init__(self, default_year: Optional[int] = None, max_cache: int = 4096) -> None:
+        # syslog BSD não tem ano: usa o ano corrente (UTC)
+        self.default_year = default_year or datetime.now(timezone.utc).year
+        self.max_cache = max_cache
+        self._minutes: Dict[Tuple[str, str], Optional[int]] = {}
+        self._by_source: Dict[str, Callable[[Dict], Optional[float]]] = {
+            "apache": self._from_apache_event,
+            "syslog": self._from_syslog_event,
+            "json": self._from_fields,
+            "jsonl": self._from_fields,
+            "csv": self._from_fields,
+            "plaintext": self._from_plaintext,
+        }
+
+    def _minute(self, kind: str, prefix: str, build: Callable[[], Optional[datetime]]) -> Optional[int]:
+        key = (kind, prefix)
+        try:
+            return self._minutes[key]
+        except KeyError:
+            pass
+        if len(self._minutes) >= self.max_cache:
+            self._minutes.clear()
+        try:
+            dt = build()
+        except (ValueError, KeyError, OverflowError):
+            dt = None
+        value = int(dt.timestamp()) if dt is not None else None
+        self._minutes[key] = value
+        return value
+
+    # --- formatos -------------------------------------------------------
+
+    def apache(self, value: str) -> Optional[float]:
+        """`10/Oct/2025:13:55:36 -0700`"""
+        if len(value) < 20 or value[2] != "/" or value[17] != ":":
+            return None
+        seconds = value[18:20]
+        if not seconds.isdigit():
+            return None
+        prefix = value[:17] + value[20:]
+
+        def build() -> Optional[datetime]:
+            tz = _offset(value[20:].strip())
+            if tz is None:
+                return None
+            return datetime(
+                int(value[7:11]), MONTHS[value[3:6]], int(value[0:2]),
+                int(value[12:14]), int(value[15:17]), tzinfo=tz,
+            )
+
+        base = self._minute("apache", prefix, build)
+        return None if base is None else base + int(seconds)
+
+    def iso(self, value: str) -> Optional[float]:
+        """`2025-10-10T13:55:36.123+03:00`, `2025-10-10 13:55:36`, `...Z`, `2025-10-10`"""
+        if len(value) == 10:
+            # só a data: meia-noite UTC
+            value += "T00:00"
+        if len(value) < 16 or value[4] != "-" or value[7] != "-" or value[10] not in "T t" or value[13] != ":":
+            return None
+        seconds = 0.0
+        rest = value[16:]
+        if rest[:1] == ":":
+            end = 3
+            while end < len(rest) and (rest[end].isdigit() or rest[end] in ".,"):
+                end += 1
+            try:
+                seconds = float(rest[1:end].replace(",", "."))
+            except ValueError:
+                return None
+            rest = rest[end:]
+        tz_text = rest.strip()
+        prefix = value[:16]
+
+        def build() -> Optional[datetime]:
+            tz = _offset(tz_text)
+            if tz is None:
+                return None
+            return datetime(
+                int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                int(value[11:13]), int(value[14:16]), tzinfo=tz,
+            )
+
+        base = self._minute("iso", prefix + tz_text, build)
+        return None if base is None else base + seconds
+
+    def syslog_bsd(self, value: str) -> Optional[float]:
+        """`Oct 10 13:55:36` (sem ano nem fuso: ano corrente, UTC)"""
+        if len(value) < 15 or value[3] != " " or value[12] != ":":
+            return None
+        seconds = value[13:15]
+        if not seconds.isdigit():
+            return None
+
+        def build() -> Optional[datetime]:
+            return datetime(
+                self.default_year, MONTHS[value[0:3]], int(value[4:6]),
+                int(value[7:9]), int(value[10:12]), tzinfo=timezone.utc,
+            )
+
+        base = self._minute("bsd", value[:12], build)
+        return None if base is None else base + int(seconds)
+
+    @staticmethod
+    def epoch(value: Any) -> Optional[float]:
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            return None
+        if number != number or number <= 0:
+            return None
+        # milissegundos / microssegundos
+        while number > 1e11:
+            number /= 1000
+        return number
+
+    def parse(self, value: Any) -> Optional[float]:
+        """Tenta todos os formatos conhecidos."""
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return self.epoch(value)
+        if not isinstance(value, str) or not value:
+            return None
+        value = value.strip()
+        head = value[:1]
+        if head.isdigit():
+            if value[2:3] == "/":
+                return self.apache(value)
+            if value.replace(".", "", 1).isdigit():
+                return self.epoch(value)
+            return self.iso(value)
+        if head == "[":
+            return self.parse(value[1:].split("]", 1)[0])
+        if value[:3] in MONTHS:
+            return self.syslog_bsd(value)
+        return None
+
+    # --- eventos ----------------------------------------------------------
+
+    def _from_apache_event(self, event: Dict) -> Optional[float]:
+        value = event.get("time")
+        return self.apache(value) if isinstance(value, str) else None
+
+    def _from_syslog_event(self, event: Dict) -> Optional[float]:
+        return self.parse(event.get("time"))
+
+    def _from_fields(self, event: Dict) -> Optional[float]:
+        for name in TIME_FIELDS:
+            if name in event:
+                result = self.parse(event[name])
+                if result is not None:
+                    return result
+        return None
+
+    def _from_plaintext(self, event: Dict) -> Optional[float]:
+        # texto livre: só considera data logo no início da linha
+        message = event.get("message")
+        if not isinstance(message, str) or not message:
+            return None
+        head = message.lstrip()[:40]
+        if head[:1] == "[":
+            return self.parse(head[1:].split("]", 1)[0])
+        if head[:3] in MONTHS:
+            return self.syslog_bsd(head)
+        # ISO no início, cortando no primeiro espaço depois do horário
+        if len(head) >= 19 and head[10:11] in ("T", " "):
+            end = head.find(" ", 19)
+            return self.iso(head if end < 0 else head[:end])
+        return None
+
+    def normalize(self, event: Dict, source_type: str) -> Optional[float]:
+        """Epoch UTC do evento conforme o tipo de origem (None se não houver data reconhecível)."""
+        extract = self._by_source.get(source_type)
+        if extract is None:
+            return None
+        return extract(event)
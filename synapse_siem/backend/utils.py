@@ -1,26 +1,167 @@
 import os
+import json
+import fnmatch
 import shutil
+import stat
 import hashlib
-from typing import Iterable, List
+import tempfile
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem reflink
+    fcntl = None  # type: ignore
 
 
 LOG_EXTENSIONS = {".log", ".txt", ".json", ".jsonl", ".csv"}
 
 
-def find_log_files(paths: Iterable[str]) -> List[str]:
-    files: List[str] = []
+@dataclass
+class LogFileInfo:
+    path: str
+    size: int
+    mtime: float
+
+
+def _matches(patterns: Sequence[str], name: str, relpath: str) -> bool:
+    return any(fnmatch.fnmatch(name, p) or fnmatch.fnmatch(relpath, p) for p in patterns)
+
+
+class _Walker:
+    """Varredura de diretórios com os.scandir, um diretório por tarefa no pool."""
+
+    def __init__(
+        self,
+        include: Sequence[str],
+        exclude: Sequence[str],
+        max_depth: Optional[int],
+        modified_since: Optional[float],
+        follow_symlinks: bool,
+        fold_case: bool = False,
+    ) -> None:
+        self.include = include
+        self.fold_case = fold_case
+        self.exclude = exclude
+        self.max_depth = max_depth
+        self.modified_since = modified_since
+        self.follow_symlinks = follow_symlinks
+        self._visited: set = set()
+        self._lock = threading.Lock()
+
+    def first_visit(self, path: str) -> bool:
+        """Registra o diretório por (dev, inode): evita ciclos de symlink e varrer duas vezes."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return False
+        key = (st.st_dev, st.st_ino)
+        with self._lock:
+            if key in self._visited:
+                return False
+            self._visited.add(key)
+        return True
+
+    def scan(self, root: str, directory: str, depth: int) -> Tuple[List[LogFileInfo], List[Tuple[str, str, int]]]:
+        files: List[LogFileInfo] = []
+        subdirs: List[Tuple[str, str, int]] = []
+        try:
+            entries = os.scandir(directory)
+        except OSError:
+            return files, subdirs
+        with entries:
+            for entry in entries:
+                relpath = os.path.relpath(entry.path, root).replace(os.sep, "/")
+                if self.exclude and _matches(self.exclude, entry.name, relpath):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=self.follow_symlinks):
+                        if self.max_depth is None or depth < self.max_depth:
+                            # seguindo symlinks, todo diretório é registrado para detectar ciclos
+                            if not self.follow_symlinks or self.first_visit(entry.path):
+                                subdirs.append((root, entry.path, depth + 1))
+                        continue
+                    # symlink para arquivo sempre vale (como no os.walk); a opção só
+                    # controla a descida em symlinks de diretório
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                name = entry.name.lower() if self.fold_case else entry.name
+                if not _matches(self.include, name, relpath):
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                if self.modified_since is not None and st.st_mtime < self.modified_since:
+                    continue
+                files.append(LogFileInfo(os.path.abspath(entry.path), st.st_size, st.st_mtime))
+        return files, subdirs
+
+
+def discover_log_files(
+    paths: Iterable[str],
+    include: Optional[Sequence[str]] = None,
+    exclude: Optional[Sequence[str]] = None,
+    max_depth: Optional[int] = None,
+    modified_since: Optional[float] = None,
+    follow_symlinks: bool = False,
+    workers: int = 8,
+) -> List[LogFileInfo]:
+    """
+    Descobre arquivos de log com tamanho e mtime.
+
+    - `include`/`exclude`: globs comparados com o nome e com o caminho relativo
+      à raiz (ex.: "*.log", "archive/*"); diretórios excluídos não são varridos.
+      Sem `include`, valem as extensões de LOG_EXTENSIONS.
+    - `max_depth`: 0 = só a raiz; `modified_since`: epoch mínimo do mtime.
+    - Diretórios são varridos em paralelo (útil em NFS, onde cada listagem é
+      uma ida ao servidor); symlinks de diretório só são seguidos com
+      `follow_symlinks` e nunca duas vezes para o mesmo (dev, inode).
+      Symlinks de arquivo sempre entram, como no os.walk.
+
+    Arquivos passados diretamente entram sempre, sem filtros.
+    """
+    # extensões padrão ignoram maiúsculas/minúsculas (ex.: APP.LOG)
+    fold_case = not include
+    include = list(include) if include else [f"*{ext}" for ext in sorted(LOG_EXTENSIONS)]
+    walker = _Walker(include, list(exclude or []), max_depth, modified_since, follow_symlinks, fold_case)
+    found: Dict[str, LogFileInfo] = {}
+    roots: List[Tuple[str, str, int]] = []
     for p in paths:
         if os.path.isfile(p):
-            files.append(os.path.abspath(p))
-        elif os.path.isdir(p):
-            for root, _dirs, filenames in os.walk(p):
-                for name in filenames:
-                    ext = os.path.splitext(name)[1].lower()
-                    if ext in LOG_EXTENSIONS:
-                        files.append(os.path.abspath(os.path.join(root, name)))
-        else:
-            continue
-    return sorted(set(files))
+            st = os.stat(p)
+            path = os.path.abspath(p)
+            found[path] = LogFileInfo(path, st.st_size, st.st_mtime)
+        elif os.path.isdir(p) and walker.first_visit(p):
+            root = os.path.abspath(p)
+            roots.append((root, root, 0))
+    if roots:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            running = {pool.submit(walker.scan, *task) for task in roots}
+            while running:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    files, subdirs = future.result()
+                    for info in files:
+                        found[info.path] = info
+                    running.update(pool.submit(walker.scan, *task) for task in subdirs)
+    return [found[path] for path in sorted(found)]
+
+
+def find_log_files(paths: Iterable[str], **options) -> List[str]:
+    return [info.path for info in discover_log_files(paths, **options)]
+
+
+def sha256_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
 
 
 def _hash_path(path: str) -> str:
@@ -28,31 +169,210 @@ def _hash_path(path: str) -> str:
     return h[:8]
 
 
-def copy_logs_to_directory(paths: Iterable[str], destination_directory: str) -> List[str]:
+IMPORT_MANIFEST = ".synapse_import.json"
+IMPORT_MODES = ("auto", "reflink", "copy")
+# ioctl FICLONE (Linux): clona o arquivo com copy-on-write em btrfs/XFS/overlay etc.
+FICLONE = 0x40049409
+
+
+def _load_manifest(directory: str) -> Dict:
+    try:
+        with open(os.path.join(directory, IMPORT_MANIFEST), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    manifest.setdefault("sources", {})
+    manifest.setdefault("objects", {})
+    return manifest
+
+
+def _save_manifest(directory: str, manifest: Dict) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".import.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(directory, IMPORT_MANIFEST))
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+
+def _reflink(src: str, dst: str) -> bool:
+    if fcntl is None:
+        return False
+    try:
+        with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+    except OSError:
+        if os.path.exists(dst):
+            os.unlink(dst)
+        return False
+    shutil.copystat(src, dst)
+    return True
+
+
+def _materialize(src: str, dst: str, mode: str) -> str:
+    """Cria `dst` com o conteúdo de `src`: reflink, hardlink (modo auto) ou cópia. Retorna o método usado."""
+    if mode in ("auto", "reflink") and _reflink(src, dst):
+        return "reflink"
+    if mode == "auto":
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            pass
+    shutil.copy2(src, dst)
+    return "copy"
+
+
+def _materialize_any(sources: List[str], dst: str, mode: str) -> bool:
+    """Tenta criar `dst` a partir de cada origem (mesmo conteúdo) até uma dar certo."""
+    for src in sources:
+        _discard_partial(dst)
+        try:
+            _materialize(src, dst, mode)
+            return True
+        except OSError:
+            continue
+    _discard_partial(dst)
+    return False
+
+
+def _discard_partial(path: str) -> None:
+    # cópia interrompida no meio deixa um arquivo incompleto no destino
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def _object_name(src: str, directory: str, taken: set) -> str:
+    name, ext = os.path.splitext(os.path.basename(src))
+    candidate = f"{name}_{_hash_path(src)}{ext}"
+    counter = 2
+    while candidate in taken or os.path.exists(os.path.join(directory, candidate)):
+        candidate = f"{name}_{_hash_path(src)}-{counter}{ext}"
+        counter += 1
+    taken.add(candidate)
+    return candidate
+
+
+def copy_logs_to_directory(
+    paths: Iterable[str],
+    destination_directory: str,
+    mode: str = "auto",
+    workers: int = 8,
+) -> List[str]:
     """
-    Copia arquivos de log para um diretório de destino, evitando colisões de nomes
-    ao anexar um hash curto baseado no caminho de origem.
+    Importa arquivos de log para um diretório de destino sem duplicar conteúdo.
+
+    - Um manifesto no destino guarda (tamanho, mtime) de cada origem: reimportar
+      um arquivo inalterado não lê nem copia nada.
+    - O hash de conteúdo só é calculado quando há outro arquivo (novo ou já
+      importado) com o mesmo tamanho; conteúdo idêntico vindo de caminhos
+      diferentes vira um único arquivo no destino.
+    - Arquivos novos são materializados em paralelo por reflink, hardlink
+      (mesmo sistema de arquivos, modo "auto") ou cópia.
 
-    Retorna a lista de caminhos de destino copiados.
+    Retorna a lista de caminhos de destino, sem repetição, na ordem de entrada.
     """
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"modo de importação inválido: {mode}")
     os.makedirs(destination_directory, exist_ok=True)
-    copied: List[str] = []
-    for src in paths:
-        if not os.path.isfile(src):
+    manifest = _load_manifest(destination_directory)
+    sources: Dict[str, Dict] = manifest["sources"]
+    objects: Dict[str, Dict] = manifest["objects"]
+    for name in list(objects):
+        try:
+            size = os.stat(os.path.join(destination_directory, name)).st_size
+        except OSError:
+            # objeto apagado à mão deixa de existir no manifesto
+            del objects[name]
             continue
-        base = os.path.basename(src)
-        name, ext = os.path.splitext(base)
-        suffix = _hash_path(src)
-        dst_name = f"{name}_{suffix}{ext}"
-        dst_path = os.path.join(destination_directory, dst_name)
+        if size != objects[name]["size"]:
+            # hardlink cuja origem cresceu: o hash guardado não vale mais
+            objects[name] = {"size": size, "sha256": None}
+
+    stats: Dict[str, os.stat_result] = {}
+    for src in dict.fromkeys(os.path.abspath(p) for p in paths):
         try:
-            shutil.copy2(src, dst_path)
-            copied.append(os.path.abspath(dst_path))
-        except Exception:
-            # ignora arquivos que falharem na cópia
+            st = os.stat(src)
+        except OSError:
             continue
-    return copied
+        if stat.S_ISREG(st.st_mode):
+            stats[src] = st
+
+    resolved: Dict[str, str] = {}
+    pending: List[str] = []
+    for src, st in stats.items():
+        known = sources.get(src)
+        if known and known["size"] == st.st_size and known["mtime_ns"] == st.st_mtime_ns and known["object"] in objects:
+            resolved[src] = known["object"]
+        else:
+            pending.append(src)
+
+    # só tamanhos repetidos (entre novos e já importados) precisam de hash
+    by_size: Dict[int, List[str]] = {}
+    for src in pending:
+        by_size.setdefault(stats[src].st_size, []).append(src)
+    existing_by_size: Dict[int, List[str]] = {}
+    for name, info in objects.items():
+        existing_by_size.setdefault(info["size"], []).append(name)
+    to_hash = [
+        src for size, group in by_size.items()
+        if len(group) > 1 or size in existing_by_size
+        for src in group
+    ]
+    stale_objects = [
+        name for size in by_size if size in existing_by_size
+        for name in existing_by_size[size] if not objects[name].get("sha256")
+    ]
+    digests: Dict[str, str] = {}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        digests.update(zip(to_hash, pool.map(sha256_file, to_hash)))
+        object_paths = [os.path.join(destination_directory, n) for n in stale_objects]
+        for name, digest in zip(stale_objects, pool.map(sha256_file, object_paths)):
+            objects[name]["sha256"] = digest
 
+        by_digest = {info["sha256"]: name for name, info in objects.items() if info.get("sha256")}
+        taken: set = set(objects)
+        jobs: List[Tuple[str, str]] = []
+        for src in pending:
+            digest = digests.get(src)
+            if digest is not None and digest in by_digest:
+                resolved[src] = by_digest[digest]
+                continue
+            name = _object_name(src, destination_directory, taken)
+            objects[name] = {"size": stats[src].st_size, "sha256": digest}
+            if digest is not None:
+                by_digest[digest] = name
+            resolved[src] = name
+            jobs.append((src, name))
 
+        futures = {
+            pool.submit(_materialize, src, os.path.join(destination_directory, name), mode): (src, name)
+            for src, name in jobs
+        }
+        for future, (src, name) in futures.items():
+            try:
+                future.result()
+            except OSError:
+                # origens com o mesmo conteúdo já foram resolvidas para este objeto:
+                # tenta materializá-lo a partir delas antes de desistir
+                del resolved[src]
+                twins = [other for other, target in resolved.items() if target == name]
+                if not _materialize_any(twins, os.path.join(destination_directory, name), mode):
+                    # ignora arquivos que falharem na cópia; o conteúdo não fica registrado
+                    for other in twins:
+                        del resolved[other]
+                    digest = objects.pop(name)["sha256"]
+                    if digest is not None and by_digest.get(digest) == name:
+                        del by_digest[digest]
 
+    for src, name in resolved.items():
+        st = stats[src]
+        sources[src] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "object": name}
+    _save_manifest(destination_directory, manifest)
 
+    imported = dict.fromkeys(resolved[src] for src in stats if src in resolved)
+    return [os.path.abspath(os.path.join(destination_directory, name)) for name in imported]
@@ -12,6 +12,14 @@ export const apiClient = {
     return response.data;
   },
 
+  // Catálogo paginado de arquivos (somente metadados)
+  getFileCatalog: async (page = 1, pageSize = 50) => {
+    const response = await api.get('/logs/files/', {
+      params: { page, page_size: pageSize },
+    });
+    return response.data;
+  },
+
   // Executa análise nos arquivos selecionados
   runAnalysis: async (fileIds = []) => {
     const response = await api.post('/logs/', { file_ids: fileIds });